@@ -10,7 +10,10 @@ a = Analysis(
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
-    excludes=[],
+    # Modules the application never imports; leaving them out keeps the bundle that is unpacked on every launch small
+    excludes=['pandas', 'scipy', 'tkinter', '_tkinter', 'IPython', 'jinja2', 'PyQt5', 'PySide2', 'PySide6',
+              'matplotlib.backends.backend_tkagg', 'matplotlib.backends.backend_gtk3agg',
+              'matplotlib.backends.backend_wxagg', 'matplotlib.backends.backend_webagg', 'PIL.ImageTk'],
     noarchive=False,
     optimize=0,
 )
@@ -26,7 +29,7 @@ exe = EXE(
     debug=False,
     bootloader_ignore_signals=False,
     strip=False,
-    upx=True,
+    upx=False,  # Decompressing UPX-packed libraries slows down every launch
     upx_exclude=[],
     runtime_tmpdir=None,
     console=False,
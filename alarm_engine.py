@@ -0,0 +1,260 @@
+import json
+import numpy as np
+from csv_logger import format_timestamps
+
+# Rules used when no alarm configuration is given: a subsystem above 80 °C for a second, and a fan running at (nearly)
+# its maximum RPM for five seconds
+DEFAULT_RULES = [
+    {"name": "overheat", "group": "temp", "channels": "all", "above": 80.0, "hysteresis": 5.0, "min_duration": 1.0},
+    {"name": "fan pinned", "group": "speed", "channels": "all", "above": 0.99, "relative": True, "hysteresis": 0.02,
+     "min_duration": 5.0},
+]
+# Kinds of event in the event log
+EVENT_START = 0
+EVENT_END = 1
+
+EVENT_DTYPE = np.dtype([("time", "<f8"), ("rule", "<i4"), ("channel", "<i4"), ("kind", "u1"), ("value", "<f8"),
+                        ("duration", "<f8")])
+
+
+"""Description: Append-only log of alarm events. Events are stored in a growable structured array in time order, so a
+time range is found with a binary search, and every (group, channel) keeps the list of its event rows, so the events of
+one channel are found without scanning the others. Appending is amortized O(1)."""
+class EventLog:
+    def __init__(self, rules, capacity=1024):
+        self.rules = rules
+        self.events = np.zeros(capacity, dtype=EVENT_DTYPE)
+        self.count = 0
+        self._channel_rows = {}
+
+    """
+    Description: Appends one event.
+    Parameters: time (float), rule (int, index into the rules), channel (int), kind (EVENT_START or EVENT_END),
+    value (float, the channel's value at the event), duration (float, seconds since the excursion started)
+    """
+    def append(self, time, rule, channel, kind, value, duration=0.0):
+        if self.count == len(self.events):
+            self.events = np.concatenate([self.events, np.zeros(len(self.events), dtype=EVENT_DTYPE)])
+        self.events[self.count] = (time, rule, channel, kind, value, duration)
+        self._channel_rows.setdefault((self.rules[rule]["group"], channel), []).append(self.count)
+        self.count += 1
+
+    """
+    Description: Returns the events matching all the given filters, oldest first. A channel is looked up through its
+    own index and a time range by binary search, so queries stay fast on long logs.
+    Parameters: rule (str name or int index, or None), group (str or None, taken from the rule when one is given),
+    channel (int or None), start (float or None, elapsed seconds), end (float or None), kind (int or None)
+    Returns: numpy structured array with the fields of EVENT_DTYPE
+    """
+    def query(self, rule=None, group=None, channel=None, start=None, end=None, kind=None):
+        if isinstance(rule, str):
+            rule = self.rule_index(rule)
+        if rule is not None:
+            group = self.rules[rule]["group"]
+        events = self.events[:self.count]
+        if channel is not None:
+            if group is None:
+                raise ValueError("A channel query needs a rule or a group.")
+            events = events[np.array(self._channel_rows.get((group, channel), []), dtype=np.intp)]
+        times = events["time"]
+        first = 0 if start is None else np.searchsorted(times, start, side="left")
+        last = len(times) if end is None else np.searchsorted(times, end, side="right")
+        events = events[first:last]
+        mask = np.ones(len(events), dtype=bool)
+        if rule is not None:
+            mask &= events["rule"] == rule
+        elif group is not None:
+            mask &= np.isin(events["rule"], [index for index, item in enumerate(self.rules) if item["group"] == group])
+        if kind is not None:
+            mask &= events["kind"] == kind
+        return events[mask]
+
+    """
+    Description: Returns the index of the rule with the given name.
+    Parameters: name (str)
+    Returns: int
+    """
+    def rule_index(self, name):
+        for index, rule in enumerate(self.rules):
+            if rule["name"] == name:
+                return index
+        raise ValueError(f"Unknown alarm rule: {name}.")
+
+    """
+    Description: Writes the events to a CSV file.
+    Parameters: filename (str)
+    Returns: str
+    """
+    def write_csv(self, filename):
+        events = self.events[:self.count]
+        timestamps = format_timestamps(events["time"])
+        with open(filename, "w", newline="", encoding="utf-8") as file:
+            file.write("Time (HH:MM:SS),Rule,Group,Channel,Event,Value,Duration (s)\n")
+            for timestamp, event in zip(timestamps, events.tolist()):
+                _, rule, channel, kind, value, duration = event
+                file.write(f"{timestamp},{self.rules[rule]['name']},{self.rules[rule]['group']},{channel + 1},"
+                           f"{'start' if kind == EVENT_START else 'end'},{value},{duration}\n")
+        return filename
+
+    def __len__(self):
+        return self.count
+
+
+"""Description: Threshold alarm engine. Each rule watches a set of channels of one channel group ("temp" or "speed")
+for values above (or below) a threshold, optionally relative to a per-channel scale such as the fans' maximum RPMs.
+An alarm starts once a channel has stayed past the threshold for `min_duration` seconds, and ends only once it is back
+past the threshold by more than the hysteresis band. Every (rule, channel) pair is one element of flat state arrays, so
+all rules and channels are evaluated together in one vectorized pass per update. Start and end events go to an
+EventLog at the time they are detected, with the time the channel had been past the threshold as their duration (so
+an end event holds the length of the whole excursion). With `clip`, the channels a rule lists that do not exist are
+left out instead of rejected, so rules keep their listed channels across resizes and watch them again once they are
+back."""
+class AlarmEngine:
+    def __init__(self, channels, rules=None, scales=None, log=None, clip=False):
+        self.rules = [dict(rule) for rule in (DEFAULT_RULES if rules is None else rules)]
+        self.channels = dict(channels)  # Number of channels of each group
+        self.scales = dict(scales or {})  # Per-channel divisors of the groups used by relative rules
+        self.log = EventLog(self.rules) if log is None else log
+        self.last_time = None
+
+        pair_rules, pair_channels = [], []
+        for index, rule in enumerate(self.rules):
+            if rule.get("group") not in self.channels:
+                raise ValueError(f"Alarm rule {rule.get('name', index)}: group must be one of "
+                                 f"{', '.join(self.channels)}.")
+            if ("above" in rule) == ("below" in rule):
+                raise ValueError(f"Alarm rule {rule.get('name', index)}: exactly one of above or below must be given.")
+            rule.setdefault("name", f"rule {index + 1}")
+            selected = self._indices(rule.get("channels", "all"), self.channels[rule["group"]], rule["name"], clip)
+            pair_rules.append(np.full(len(selected), index))
+            pair_channels.append(selected)
+        self.pair_rules = np.concatenate(pair_rules) if pair_rules else np.zeros(0, dtype=int)
+        self.pair_channels = np.concatenate(pair_channels) if pair_channels else np.zeros(0, dtype=int)
+
+        # "Below" rules are negated so every comparison is a "greater than"
+        sign = np.array([1.0 if "above" in rule else -1.0 for rule in self.rules])
+        threshold = np.array([float(rule.get("above", rule.get("below", 0.0))) for rule in self.rules])
+        hysteresis = np.array([float(rule.get("hysteresis", 0.0)) for rule in self.rules])
+        min_duration = np.array([float(rule.get("min_duration", 0.0)) for rule in self.rules])
+        self._sign = sign[self.pair_rules]
+        self._threshold = (sign * threshold)[self.pair_rules]
+        self._clear = (sign * threshold - hysteresis)[self.pair_rules]
+        self._min_duration = min_duration[self.pair_rules]
+        self._group_pairs = {group: np.flatnonzero([self.rules[rule]["group"] == group for rule in self.pair_rules])
+                             for group in self.channels}
+        self._relative = np.array([bool(self.rules[rule].get("relative", False)) for rule in self.pair_rules],
+                                  dtype=bool)
+
+        self.active = np.zeros(len(self.pair_rules), dtype=bool)
+        self.since = np.full(len(self.pair_rules), np.nan)  # Start of the current excursion, NaN when there is none
+        self._values = np.zeros(len(self.pair_rules))
+
+    """
+    Description: Creates an alarm engine from a JSON configuration file or an already loaded configuration. The file
+    holds a "rules" list; each rule has a "name", a "group" ("temp" or "speed"), "channels" (list of 0-based indices,
+    or "all"), either "above" or "below" (the threshold), and optionally "relative" (compare fan speeds as a fraction
+    of each fan's maximum RPM), "hysteresis" (how far back past the threshold a channel must go to clear the alarm)
+    and "min_duration" (seconds past the threshold before the alarm starts).
+    Parameters: config (str path or dict), channels (dict of group to channel count), scales (dict or None)
+    Returns: AlarmEngine
+    """
+    @classmethod
+    def from_config(cls, config, channels, scales=None):
+        if isinstance(config, str):
+            with open(config) as file:
+                config = json.load(file)
+        return cls(channels, config.get("rules"), scales)
+
+    """
+    Description: Converts a rule's channel selection into an array of indices.
+    Parameters: selection (list of int or "all"), count (int), name (str, used in error messages), clip (bool, leave
+    out the indices of channels that do not exist, which may leave none)
+    Returns: numpy array of int
+    """
+    @staticmethod
+    def _indices(selection, count, name, clip=False):
+        if selection == "all":
+            return np.arange(count)
+        indices = np.asarray(selection, dtype=int)
+        if clip and indices.size and indices.min() >= 0:
+            return indices[indices < count]
+        if indices.size == 0 or indices.min() < 0 or indices.max() >= count:
+            raise ValueError(f"Alarm rule {name}: channel indices must be non-empty and between 0 and {count - 1}.")
+        return indices
+
+    """
+    Description: Evaluates every rule on every channel and logs the alarms that started or ended.
+    Parameters: elapsed_time (float), values (keyword arrays, one per channel group)
+    Returns: int (number of events logged)
+    """
+    def update(self, elapsed_time, **values):
+        self.last_time = elapsed_time
+        for group, pairs in self._group_pairs.items():
+            if len(pairs):
+                gathered = values[group][self.pair_channels[pairs]]
+                if group in self.scales:
+                    gathered = np.where(self._relative[pairs], gathered / self.scales[group][self.pair_channels[pairs]],
+                                        gathered)
+                self._values[pairs] = gathered
+        signed = self._sign * self._values
+
+        exceeding = signed > self._threshold
+        self.since = np.where(exceeding | self.active, self.since, np.nan)
+        self.since = np.where(exceeding & np.isnan(self.since), elapsed_time, self.since)
+        started = exceeding & ~self.active & (elapsed_time - self.since >= self._min_duration)
+        ended = self.active & (signed < self._clear)
+        if not (started.any() or ended.any()):
+            return 0
+
+        for pair in np.flatnonzero(started):
+            self.log.append(elapsed_time, self.pair_rules[pair], self.pair_channels[pair], EVENT_START,
+                            self._values[pair], elapsed_time - self.since[pair])
+        for pair in np.flatnonzero(ended):
+            self.log.append(elapsed_time, self.pair_rules[pair], self.pair_channels[pair], EVENT_END,
+                            self._values[pair], elapsed_time - self.since[pair])
+        self.active = (self.active | started) & ~ended
+        self.since = np.where(ended, np.nan, self.since)
+        return int(np.count_nonzero(started) + np.count_nonzero(ended))
+
+    """
+    Description: Returns the alarms that are currently active.
+    Returns: list of dict ("rule", "group", "channel", "since", "value")
+    """
+    def active_alarms(self):
+        return [{"rule": self.rules[self.pair_rules[pair]]["name"], "group": self.rules[self.pair_rules[pair]]["group"],
+                 "channel": int(self.pair_channels[pair]), "since": float(self.since[pair]),
+                 "value": float(self._values[pair])}
+                for pair in np.flatnonzero(self.active)]
+
+    """
+    Description: Returns which channels of a group have at least one active alarm.
+    Parameters: group (str)
+    Returns: numpy array of bool, one per channel
+    """
+    def active_channels(self, group):
+        alarmed = np.zeros(self.channels[group], dtype=bool)
+        pairs = self._group_pairs[group]
+        alarmed[self.pair_channels[pairs][self.active[pairs]]] = True
+        return alarmed
+
+    """
+    Description: Ends every active alarm, e.g. before the channels change.
+    Parameters: elapsed_time (float or None, defaults to the time of the last update)
+    """
+    def close_all(self, elapsed_time=None):
+        elapsed_time = self.last_time if elapsed_time is None else elapsed_time
+        for pair in np.flatnonzero(self.active):
+            self.log.append(elapsed_time, self.pair_rules[pair], self.pair_channels[pair], EVENT_END,
+                            self._values[pair], elapsed_time - self.since[pair])
+        self.active[:] = False
+        self.since[:] = np.nan
+
+    """
+    Description: Returns an alarm engine with the same rules and event log for different channel counts. Rules on
+    "all" channels follow the new counts, and rules that list channels only watch those that still exist (none, if they
+    were all removed) until they come back. The active alarms of this engine should be closed first.
+    Parameters: channels (dict of group to channel count), scales (dict or None)
+    Returns: AlarmEngine
+    """
+    def resized(self, channels, scales=None):
+        return AlarmEngine(channels, self.rules, self.scales if scales is None else scales, self.log, clip=True)
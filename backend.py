@@ -1,20 +1,66 @@
+import threading
 import numpy as np
-import pandas as pd
 import time
+from alarm_engine import AlarmEngine
+from channel_stats import ChannelStats
+from control_engine import ControlEngine
+from csv_logger import StreamingCsvLogger, reserve_filename, write_csv
+from decimation import MinMaxPyramid
+from sensor_trace import TraceRecorder, control_config
+from telemetry_archive import TelemetryArchiveWriter
+from telemetry_buffer import TelemetryBuffer
+
+# Interval between two control ticks (in seconds), used to size the telemetry history.
+SAMPLE_INTERVAL = 0.1
+# Rolling window of the channel statistics (in seconds) and the length of the blocks it advances by
+STATS_WINDOW = 60
+STATS_BLOCK = 1
+# Histogram ranges of the channel statistics' percentiles, with 0.5 °C and 20 RPM bins
+STATS_TEMP_RANGE = (-50, 200, 500)
+STATS_SPEED_RANGE = (0, 10000, 500)
 
 """Description: Backend class to handle the logic of the system. It is initialized with the number of fans, 
 number of subsystems, and the maximum RPMs of the fans. It holds the fan speeds, subsystem temperatures, and logs the 
-data for CSV export as well as data for the GUI graphs."""
+data for CSV export as well as data for the GUI graphs. The history is kept in a fixed-capacity ring buffer holding
+the last `retention` seconds of samples; its capacity defaults to the number of control ticks in that window plus some
+headroom for timer jitter. Timestamps come from `clock`, which defaults to wall-clock time and can be replaced by a
+simulated clock to run the control loop faster than real time. Fan speeds are computed by `control_engine`, which
+defaults to a single zone applying the 25-75 °C curve to every fan. Unless `stats` is False, `stats` holds incremental
+lifetime and rolling statistics of every channel, one ChannelStats per channel group. Every logged sample is also checked
+by `alarm_engine`, which defaults to the overheat and pinned-fan rules of alarm_engine.DEFAULT_RULES. The history, its
+decimation pyramid, the statistics and the alarm state are updated under `lock` (the telemetry buffer's lock), which
+another thread must hold while it reads them."""
 class Backend:
-    def __init__(self, num_fans, num_subsystems, max_rpms):
+    def __init__(self, num_fans, num_subsystems, max_rpms, retention=300, capacity=None, clock=time.time,
+                 control_engine=None, stats=True, alarm_engine=None):
         self.num_fans = num_fans
         self.num_subsystems = num_subsystems
         self.max_rpms = np.array(max_rpms)
         self.fan_speeds = np.zeros(num_fans)
         self.subsystem_temperatures = np.zeros(num_subsystems)
-        self.temp_log = []
-        self.speed_log = []
-        self.start_time = time.time()
+        if capacity is None:
+            capacity = int(retention / SAMPLE_INTERVAL * 1.25) + 1
+        self.telemetry = TelemetryBuffer({"temp": num_subsystems, "speed": num_fans}, capacity, retention)
+        self.decimation = MinMaxPyramid(self.telemetry)
+        self.lock = self.telemetry.lock
+        self.stats = None
+        if stats:
+            block_rows = max(int(round(STATS_BLOCK / SAMPLE_INTERVAL)), 1)
+            self.stats = {
+                "temp": ChannelStats(num_subsystems, *STATS_TEMP_RANGE, STATS_WINDOW // STATS_BLOCK, block_rows),
+                "speed": ChannelStats(num_fans, *STATS_SPEED_RANGE, STATS_WINDOW // STATS_BLOCK, block_rows),
+            }
+        self.clock = clock
+        self.start_time = clock()
+        self.control_engine = control_engine or ControlEngine(num_fans, num_subsystems)
+        self.alarm_engine = alarm_engine or AlarmEngine({"temp": num_subsystems, "speed": num_fans},
+                                                        scales={"speed": self.max_rpms})
+        self.last_control_time = None
+        self.log_sinks = []  # Replaced rather than mutated, so the control thread can iterate it without a lock
+        self.csv_logger = None
+        self.archive_writer = None
+        self.trace_recorder = None
+        self.instrumentation = None  # Optional Instrumentation that times the control and log stages
 
     """
     Description: Sets the temperatures of the subsystems.
@@ -27,53 +73,237 @@ class Backend:
             raise ValueError("Number of temperatures must match the number of subsystems.")
 
     """
-    Description: Updates the fan speeds based on the maximum temperature of the subsystems.
+    Description: Updates the fan speeds from the subsystem temperatures using the control engine's zones.
     """
     def update_fan_speeds(self):
-        max_temp = np.max(self.subsystem_temperatures)
-        if max_temp <= 25:
-            fan_speed_percentage = 0.20
-        elif max_temp >= 75:
-            fan_speed_percentage = 1.0
-        else:
-            fan_speed_percentage = 0.20 + (max_temp - 25) * (0.80 / 50)
+        now = self.clock()
+        dt = SAMPLE_INTERVAL if self.last_control_time is None else now - self.last_control_time
+        self.last_control_time = now
+        started = time.perf_counter()
+        fan_speed_percentage = self.control_engine.update(self.subsystem_temperatures, dt)
         self.fan_speeds = self.max_rpms * fan_speed_percentage
+        controlled = time.perf_counter()
+        self._log_data(now)
+        if self.instrumentation is not None:
+            self.instrumentation.record("control", controlled - started)
+            self.instrumentation.record("log", time.perf_counter() - controlled)
+
+    """
+    Description: Logs the data for the current time step, timestamped with the time of the control update when given.
+    Parameters: now (float or None)
+    """
+    def _log_data(self, now=None):
+        elapsed_time = (self.clock() if now is None else now) - self.start_time
+        with self.lock:
+            self.telemetry.append(elapsed_time, temp=self.subsystem_temperatures, speed=self.fan_speeds)
+            self.decimation.append(elapsed_time, temp=self.subsystem_temperatures, speed=self.fan_speeds)
+            if self.stats is not None:
+                self.stats["temp"].append(self.subsystem_temperatures)
+                self.stats["speed"].append(self.fan_speeds)
+            if self.alarm_engine is not None:
+                self.alarm_engine.update(elapsed_time, temp=self.subsystem_temperatures, speed=self.fan_speeds)
+        for sink in self.log_sinks:
+            sink.append(elapsed_time, self.subsystem_temperatures, self.fan_speeds)
+
+    """
+    Description: Stores temperatures and fan speeds computed elsewhere and logs them, for a backend that mirrors the
+    channels of another backend (e.g. one robot of a fleet).
+    Parameters: temperatures (numpy array), fan_speeds (numpy array)
+    """
+    def record(self, temperatures, fan_speeds):
+        self.sample_temperatures(temperatures)
+        self.fan_speeds = np.array(fan_speeds)
         self._log_data()
 
     """
-    Description: Logs the data for the current time step.
+    Description: Validates a new configuration and builds the control and alarm engines for it, without changing
+    anything, so a caller that resizes other objects along with the backend (such as ControlLoop.reconfigure) can do so
+    only once it knows the backend's reconfiguration will go through. Arguments left out default as in reconfigure.
+    Parameters: num_fans (int or None), num_subsystems (int or None), max_rpms (list of floats or None),
+    control_engine (ControlEngine or None), alarm_engine (AlarmEngine or None)
+    Returns: tuple of (num_fans, num_subsystems, max_rpms, control_engine, alarm_engine)
+    """
+    def prepare_reconfigure(self, num_fans=None, num_subsystems=None, max_rpms=None, control_engine=None,
+                            alarm_engine=None):
+        num_fans = self.num_fans if num_fans is None else num_fans
+        num_subsystems = self.num_subsystems if num_subsystems is None else num_subsystems
+        if max_rpms is None:
+            max_rpms = np.concatenate([self.max_rpms[:num_fans],
+                                       np.full(max(num_fans - self.num_fans, 0), self.max_rpms[-1])])
+        max_rpms = np.array(max_rpms)
+        if len(max_rpms) != num_fans:
+            raise ValueError("Number of maximum RPMs must match the number of fans.")
+        resized = (num_fans, num_subsystems) != (self.num_fans, self.num_subsystems)
+        if control_engine is None and resized:
+            control_engine = self.control_engine.resized(num_fans, num_subsystems)
+        if alarm_engine is None and self.alarm_engine is not None:
+            alarm_engine = self.alarm_engine
+            if resized:
+                alarm_engine = alarm_engine.resized({"temp": num_subsystems, "speed": num_fans}, {"speed": max_rpms})
+        return num_fans, num_subsystems, max_rpms, control_engine, alarm_engine
+
+    """
+    Description: Changes the number of fans and subsystems and the maximum RPMs in place, without losing the history:
+    the telemetry buffer, its decimation pyramid and the channel statistics keep the columns of the channels that
+    remain, and channels added start with an empty (NaN) history. Fans added without a maximum RPM get the one of the
+    last fan. When the counts change, the active alarms are ended, the control and alarm engines are rebuilt with the
+    same zones and rules (unless another control engine is given; the event log is kept), and the sinks with a fixed
+    channel count are closed: continuous CSV logging goes on in a new file with the new header, while the archive and
+    the trace are stopped. Everything is validated before anything is changed (see prepare_reconfigure), and the caller
+    must make sure the control loop is not running meanwhile.
+    Parameters: num_fans (int or None), num_subsystems (int or None), max_rpms (list of floats or None),
+    control_engine (ControlEngine or None), alarm_engine (AlarmEngine or None, as returned by prepare_reconfigure)
+    Returns: list of str (the files that were closed)
+    """
+    def reconfigure(self, num_fans=None, num_subsystems=None, max_rpms=None, control_engine=None, alarm_engine=None):
+        num_fans, num_subsystems, max_rpms, control_engine, alarm_engine = self.prepare_reconfigure(
+            num_fans, num_subsystems, max_rpms, control_engine, alarm_engine)
+        resized = (num_fans, num_subsystems) != (self.num_fans, self.num_subsystems)
+
+        closed = []
+        csv_logger = self.csv_logger
+        if resized:
+            closed += self.stop_csv_logging()
+            closed += [path for path in (self.stop_archive(), self.stop_trace()) if path is not None]
+        with self.lock:
+            if resized:
+                self.telemetry.resize_group("temp", num_subsystems)
+                self.telemetry.resize_group("speed", num_fans)
+                self.decimation.resize_group("temp", num_subsystems)
+                self.decimation.resize_group("speed", num_fans)
+                if self.stats is not None:
+                    self.stats["temp"].resize(num_subsystems)
+                    self.stats["speed"].resize(num_fans)
+                self.subsystem_temperatures = np.concatenate([self.subsystem_temperatures[:num_subsystems],
+                                                              np.zeros(max(num_subsystems - self.num_subsystems, 0))])
+                self.fan_speeds = np.concatenate([self.fan_speeds[:num_fans],
+                                                  np.zeros(max(num_fans - self.num_fans, 0))])
+                self.num_fans = num_fans
+                self.num_subsystems = num_subsystems
+            self.max_rpms = max_rpms
+            if alarm_engine is not self.alarm_engine:
+                if self.alarm_engine is not None:
+                    self.alarm_engine.close_all()
+                self.alarm_engine = alarm_engine
+            elif alarm_engine is not None:
+                alarm_engine.scales["speed"] = max_rpms
+        if control_engine is not None:
+            self.control_engine = control_engine
+        if resized and csv_logger is not None:
+            self.start_csv_logging(csv_logger.directory, csv_logger.max_bytes, csv_logger.max_seconds,
+                                   csv_logger.flush_interval)
+        return closed
+
+    """
+    Description: Requests CSV files with the logged data. If continuous logging is running, its files already hold every
+    tick since logging was started (or restarted with new columns by a reconfiguration), split into one part per
+    rotation, so the logger is asked to flush and every part is returned. Otherwise the retained window is copied and
+    written to a new 'temp_speed_log_<part>.csv', which never overwrites an earlier export. In both cases the files are
+    written on a background thread by default, so they may still be incomplete when this returns.
+    Parameters: background (bool)
+    Returns: list of str (empty if there is no data to write)
+    """
+    def request_csv(self, background=True):
+        if self.csv_logger is not None and self.csv_logger.filenames:
+            self.csv_logger.flush()
+            return list(self.csv_logger.filenames)
+        with self.lock:
+            times, temp_data = self.telemetry.view("temp")
+            _, speed_data = self.telemetry.view("speed")
+            times, temp_data, speed_data = times.copy(), temp_data.copy(), speed_data.copy()
+        if len(times) == 0:
+            return []
+        filename = reserve_filename(".", "temp_speed_log")
+        if background:
+            threading.Thread(target=write_csv, args=(filename, times, temp_data, speed_data), daemon=True).start()
+        else:
+            write_csv(filename, times, temp_data, speed_data)
+        return [filename]
+
+    """
+    Description: Starts continuous logging: every control tick from now on is appended to a CSV file by a background
+    writer, which rotates to a new file once the size or age limit is reached and never overwrites existing files.
+    Parameters: directory (str), max_bytes (int or None), max_seconds (float or None), flush_interval (float)
+    Returns: StreamingCsvLogger
+    """
+    def start_csv_logging(self, directory=".", max_bytes=None, max_seconds=None, flush_interval=1.0):
+        if self.csv_logger is None:
+            self.csv_logger = StreamingCsvLogger(self.num_subsystems, self.num_fans, directory,
+                                                 flush_interval=flush_interval, max_bytes=max_bytes,
+                                                 max_seconds=max_seconds)
+            self.log_sinks = self.log_sinks + [self.csv_logger]
+        return self.csv_logger
+
+    """
+    Description: Stops continuous logging and closes its file.
+    Returns: list of str (the files written)
+    """
+    def stop_csv_logging(self):
+        if self.csv_logger is None:
+            return []
+        self.log_sinks = [sink for sink in self.log_sinks if sink is not self.csv_logger]
+        self.csv_logger.close()
+        filenames = self.csv_logger.filenames
+        self.csv_logger = None
+        return filenames
+
+    """
+    Description: Starts archiving the full history of every channel to a chunked binary archive, which can be read
+    back with telemetry_archive.TelemetryArchive or converted to CSV.
+    Parameters: path (str, archive directory), chunk_rows (int), dtype (str, dtype of the temperature and fan columns)
+    Returns: TelemetryArchiveWriter
+    """
+    def start_archive(self, path, chunk_rows=4096, dtype="float32"):
+        if self.archive_writer is None:
+            self.archive_writer = TelemetryArchiveWriter(path, self.num_subsystems, self.num_fans, chunk_rows, dtype)
+            self.log_sinks = self.log_sinks + [self.archive_writer]
+        return self.archive_writer
+
+    """
+    Description: Stops archiving and writes the remaining rows.
+    Returns: str or None (the archive directory)
     """
-    def _log_data(self):
-        elapsed_time = time.time() - self.start_time
-        self.temp_log.append((elapsed_time, self.subsystem_temperatures.copy()))
-        self.speed_log.append((elapsed_time, self.fan_speeds.copy()))
-        self.temp_log = [log for log in self.temp_log if log[0] > elapsed_time - 300]
-        self.speed_log = [log for log in self.speed_log if log[0] > elapsed_time - 300]
+    def stop_archive(self):
+        if self.archive_writer is None:
+            return None
+        self.log_sinks = [sink for sink in self.log_sinks if sink is not self.archive_writer]
+        self.archive_writer.close()
+        path = self.archive_writer.path
+        self.archive_writer = None
+        return path
 
     """
-    Description: Requests a CSV file with the logged data.
-    Returns: str
+    Description: Starts recording every sample the backend takes, with its exact temperatures, into a binary trace that
+    trace_replay.TraceReplayer can feed back into a backend. The seed of the simulation, when there is one, is stored
+    in the trace so the run can also be regenerated.
+    Parameters: path (str, trace file, must not exist yet), seed (int or None)
+    Returns: TraceRecorder
     """
-    def request_csv(self):
-        if not self.temp_log or not self.speed_log:
-            return "No data to write."
-        timestamps = [log[0] for log in self.temp_log]
-        timestamps = [f"{int(t // 3600):02}:{int((t % 3600) // 60):02}:{int(t % 60):02}.{int((t % 1) * 1000):03}" for t in timestamps]
-        temp_data = np.array([log[1] for log in self.temp_log])
-        speed_data = np.array([log[1] for log in self.speed_log])
-        temp_columns = [f"Temp{i + 1} (°C)" for i in range(self.num_subsystems)]
-        speed_columns = [f"Fan{i + 1} Speed (RPM)" for i in range(self.num_fans)]
-        df = pd.DataFrame({"Time (HH:MM:SS)": timestamps})
-        temp_df = pd.DataFrame(temp_data, columns=temp_columns)
-        speed_df = pd.DataFrame(speed_data, columns=speed_columns)
-        df = pd.concat([df, temp_df, speed_df], axis=1)
-        filename = "temp_speed_log.csv"
-        df.to_csv(filename, index=False)
-        return filename
+    def start_trace(self, path, seed=None):
+        if self.trace_recorder is None:
+            metadata = {"max_rpms": self.max_rpms.tolist(), "control_config": control_config(self.control_engine),
+                        "sample_interval": SAMPLE_INTERVAL, "seed": seed}
+            self.trace_recorder = TraceRecorder(path, self.num_subsystems, self.num_fans, metadata)
+            self.log_sinks = self.log_sinks + [self.trace_recorder]
+        return self.trace_recorder
+
+    """
+    Description: Stops recording the trace and writes the remaining samples.
+    Returns: str or None (the trace file)
+    """
+    def stop_trace(self):
+        if self.trace_recorder is None:
+            return None
+        self.log_sinks = [sink for sink in self.log_sinks if sink is not self.trace_recorder]
+        self.trace_recorder.close()
+        path = self.trace_recorder.path
+        self.trace_recorder = None
+        return path
 
     """
     Description: Returns the current data of the subsystem temperatures and fan speeds.
     Returns: tuple of numpy arrays
     """
     def get_current_data(self):
-        return self.subsystem_temperatures, self.fan_speeds
\ No newline at end of file
+        return self.subsystem_temperatures, self.fan_speeds
+
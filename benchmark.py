@@ -0,0 +1,375 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import numpy as np
+from backend import Backend, SAMPLE_INTERVAL
+from headless import SimulatedClock
+from subsystem_simulation import SubsystemBank, SubsystemSimulation
+from thermal_model import CouplingMatrix, ThermalModel
+
+# Default fan/subsystem counts and history lengths (in seconds) the benchmarks are run over
+DEFAULT_COUNTS = [1, 10, 100, 1000]
+DEFAULT_HISTORIES = [60, 300]
+# Default tolerance before a slowdown against the baseline is reported as a regression
+DEFAULT_TOLERANCE = 0.25
+# Baseline kept in the repository that runs are compared against unless another one is given (it covers the headless
+# groups; benchmarks missing from a baseline are not compared)
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark_baseline.json")
+# Fields of the run metadata that must match the baseline's for absolute timings to be comparable
+COMPARED_META = ("python", "numpy", "platform", "processor")
+# Cold-start targets (in seconds, from launching the process until the menu is shown) of the application run from
+# source and of the PyInstaller build
+STARTUP_TARGETS = {"source": 0.3, "frozen": 2.0}
+# Number of launches the startup time is measured over
+STARTUP_RUNS = 5
+
+
+"""
+Description: Times a function and returns per-call statistics. The function is called in batches sized to take about
+`target` seconds each, and the median and minimum per-call time over `repeat` batches are reported.
+Parameters: function (callable), repeat (int), target (float, seconds per batch)
+Returns: dict with the median and minimum per-call time in microseconds and the number of calls per batch
+"""
+def measure(function, repeat=5, target=0.05):
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            function()
+        elapsed = time.perf_counter() - start
+        if elapsed >= target / 10 or number >= 1 << 20:
+            break
+        number *= 10
+    number = max(int(number * target / max(elapsed, 1e-9)), 1)
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            function()
+        samples.append((time.perf_counter() - start) / number * 1e6)
+    return {"median_us": float(np.median(samples)), "min_us": float(np.min(samples)), "calls": number}
+
+
+"""
+Description: Creates a backend driven by a simulated clock and fills its history with the given number of seconds of
+reproducible samples.
+Parameters: count (int, number of fans and of subsystems), history (float, seconds)
+Returns: tuple of (Backend, SimulatedClock)
+"""
+def filled_backend(count, history):
+    clock = SimulatedClock()
+    backend = Backend(count, count, [2000] * count, clock=clock)
+    rng = np.random.default_rng(0)
+    temperatures = rng.uniform(20, 80, (64, count))
+    for step in range(int(history / SAMPLE_INTERVAL)):
+        clock.advance(SAMPLE_INTERVAL)
+        backend.sample_temperatures(temperatures[step % 64])
+        backend.update_fan_speeds()
+    return backend, clock
+
+
+"""
+Description: Benchmarks the control update (Backend.update_fan_speeds, which includes logging) and the live
+reconfiguration of a backend with a full history (Backend.reconfigure) for each count.
+Parameters: args (argparse.Namespace with the counts and histories)
+Returns: dict of results
+"""
+def bench_control(args):
+    results = {}
+    for count in args.counts:
+        backend, clock = filled_backend(count, 0)
+        backend.sample_temperatures(np.random.default_rng(1).uniform(20, 80, count))
+
+        def step():
+            clock.advance(SAMPLE_INTERVAL)
+            backend.update_fan_speeds()
+        results[f"control/update_fan_speeds/n={count}"] = measure(step)
+
+        # Live reconfiguration of a backend with a full history, alternating between one fan more and one fewer
+        backend, clock = filled_backend(count, backend.telemetry.retention)
+        sizes = [count + 1, count]
+
+        def reconfigure():
+            sizes.reverse()
+            backend.reconfigure(sizes[0], sizes[0])
+        results[f"control/reconfigure/n={count}"] = measure(reconfigure, repeat=3)
+    return results
+
+
+"""
+Description: Benchmarks Backend._log_data and the queries of the channel statistics it updates for each count and
+history length; none of them should depend on the history.
+Parameters: args (argparse.Namespace with the counts and histories)
+Returns: dict of results
+"""
+def bench_log(args):
+    results = {}
+    for count in args.counts:
+        for history in args.histories:
+            backend, clock = filled_backend(count, history)
+
+            def step():
+                clock.advance(SAMPLE_INTERVAL)
+                backend._log_data()
+            results[f"log/log_data/n={count}/history={history}"] = measure(step)
+            stats = backend.stats["temp"]
+            results[f"log/stats_window/n={count}/history={history}"] = measure(stats.window)
+            results[f"log/stats_lifetime/n={count}/history={history}"] = measure(stats.lifetime)
+    return results
+
+
+"""
+Description: Benchmarks a synchronous CSV export of the retained window for each count and history length.
+Parameters: args (argparse.Namespace with the counts and histories)
+Returns: dict of results
+"""
+def bench_export(args):
+    results = {}
+    directory = tempfile.mkdtemp(prefix="fan_benchmark_")
+    previous = os.getcwd()
+    os.chdir(directory)
+    try:
+        for count in args.counts:
+            for history in args.histories:
+                backend, _ = filled_backend(count, history)
+
+                def export(backend=backend):
+                    # Every export goes to a new file, so remove it to keep the directory from filling up
+                    for filename in backend.request_csv(background=False):
+                        os.remove(filename)
+
+                results[f"export/request_csv/n={count}/history={history}"] = measure(export, repeat=3, target=0.2)
+    finally:
+        os.chdir(previous)
+    return results
+
+
+"""
+Description: Benchmarks one simulation step of every subsystem, per object (SubsystemSimulation), vectorized
+(SubsystemBank) and with a banded sparse coupling matrix (ThermalModel), for each count.
+Parameters: args (argparse.Namespace with the counts and histories)
+Returns: dict of results
+"""
+def bench_simulation(args):
+    results = {}
+    fan_speeds = np.full(5, 1200.0)
+    for count in args.counts:
+        subsystems = [SubsystemSimulation() for _ in range(count)]
+        for subsystem in subsystems:
+            subsystem.set_fan_speeds(fan_speeds)
+        results[f"simulation/output_temperature/n={count}"] = measure(
+            lambda: [subsystem.output_temperature() for subsystem in subsystems])
+        bank = SubsystemBank(count, seed=0)
+        bank.set_fan_speeds(fan_speeds)
+        results[f"simulation/bank_output_temperatures/n={count}"] = measure(bank.output_temperatures)
+        # Banded coupling: every subsystem is cooled by the fan in front of it and its two neighbours
+        fans = count
+        subsystems = np.repeat(np.arange(count), 3)
+        coupling = CouplingMatrix(count, fans, subsystems, (subsystems + np.tile([-1, 0, 1], count)) % fans,
+                                  np.tile([0.05, 0.15, 0.05], count))
+        model = ThermalModel(count, fans, coupling, heat_load=0.1, ambient=25, ambient_coefficient=0.01, seed=0)
+        speeds = np.full(fans, 1200.0)
+        results[f"simulation/thermal_set_fan_speeds/n={count}"] = measure(lambda: model.set_fan_speeds(speeds))
+        results[f"simulation/thermal_output_temperatures/n={count}"] = measure(model.output_temperatures)
+    return results
+
+
+"""
+Description: Benchmarks LogPlotWidget.update_plot on an offscreen Qt platform for each history length, and the refresh
+of a data table (staging the current values in its ChannelTableModel and repainting the view) for each count. It is
+skipped when PyQt6 or matplotlib is not installed.
+Parameters: args (argparse.Namespace with the counts and histories)
+Returns: dict of results
+"""
+def bench_render(args):
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    try:
+        from PyQt6.QtWidgets import QApplication, QTableView
+        from ui import ChannelTableModel, LogPlotWidget
+    except ImportError as e:
+        print(f"Skipping render benchmarks: {e}")
+        return {}
+    app = QApplication.instance() or QApplication([])
+    results = {}
+    for history in args.histories:
+        backend, clock = filled_backend(1, history)
+        widget = LogPlotWidget(backend.decimation, "temp", 0, 0, 100, "Temperature (°C)")
+        widget.resize(800, 400)
+        widget.show()
+        app.processEvents()
+
+        def render():
+            clock.advance(SAMPLE_INTERVAL)
+            backend.update_fan_speeds()
+            widget.update_plot()
+            app.processEvents()
+        results[f"render/update_plot/history={history}"] = measure(render, target=0.2)
+        widget.close()
+
+    for count in args.counts:
+        backend, clock = filled_backend(count, 1)
+        model = ChannelTableModel("Fan", ["Fan", "Current RPM"], count, [3])
+        table = QTableView()
+        table.setModel(model)
+        table.resize(800, 600)
+        table.show()
+        app.processEvents()
+        temperatures = np.random.default_rng(0).uniform(20, 80, (64, count))
+        steps = iter(range(1 << 62))
+
+        def refresh():
+            clock.advance(SAMPLE_INTERVAL)
+            backend.sample_temperatures(temperatures[next(steps) % 64])
+            backend.update_fan_speeds()
+            model.set_column(1, backend.fan_speeds)
+            model.commit()
+            app.processEvents()
+        results[f"render/table_refresh/n={count}"] = measure(refresh, target=0.2)
+        table.close()
+    return results
+
+
+"""
+Description: Measures how long the application takes from launching the process until its menu is shown, from source
+and, when the path of a PyInstaller build is given, frozen. Each launch uses main.py's --exit-after-startup flag on an
+offscreen Qt platform; the first launch is reported separately as it is the closest to a cold start.
+Parameters: args (argparse.Namespace with the frozen build path)
+Returns: dict of results
+"""
+def bench_startup(args):
+    commands = {"source": [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "main.py")]}
+    if args.frozen is not None:
+        commands["frozen"] = [os.path.abspath(args.frozen)]
+    environment = dict(os.environ, QT_QPA_PLATFORM="offscreen")
+    results = {}
+    for build, command in commands.items():
+        samples = []
+        for _ in range(STARTUP_RUNS):
+            start = time.perf_counter()
+            subprocess.run(command + ["--exit-after-startup"], env=environment, check=True,
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            samples.append(time.perf_counter() - start)
+        median = float(np.median(samples))
+        results[f"startup/{build}"] = {"median_us": median * 1e6, "min_us": float(np.min(samples)) * 1e6,
+                                       "first_us": samples[0] * 1e6, "calls": 1,
+                                       "target_us": STARTUP_TARGETS[build] * 1e6,
+                                       "within_target": median <= STARTUP_TARGETS[build]}
+    return results
+
+
+BENCHMARKS = {
+    "control": bench_control,
+    "log": bench_log,
+    "export": bench_export,
+    "simulation": bench_simulation,
+    "render": bench_render,
+    "startup": bench_startup,
+}
+
+
+"""
+Description: Compares results against a baseline and returns the benchmarks that got slower than the tolerance allows.
+Parameters: results (dict), baseline (dict), tolerance (float, allowed relative slowdown)
+Returns: list of (name, baseline median, current median, ratio) tuples
+"""
+def find_regressions(results, baseline, tolerance):
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        ratio = result["median_us"] / baseline[name]["median_us"]
+        if ratio > 1 + tolerance:
+            regressions.append((name, baseline[name]["median_us"], result["median_us"], ratio))
+    return regressions
+
+
+"""
+Description: Returns the fields of the run metadata that differ from the baseline's, since timings taken on another
+machine, operating system or interpreter cannot be compared.
+Parameters: meta (dict), baseline_meta (dict)
+Returns: list of (field, baseline value, current value) tuples
+"""
+def meta_mismatches(meta, baseline_meta):
+    return [(field, baseline_meta.get(field), meta[field]) for field in COMPARED_META
+            if baseline_meta.get(field) != meta[field]]
+
+
+"""
+Description: Entry point of the benchmark suite.
+Parameters: argv (list of str or None)
+Returns: int (exit code; 1 if a regression against the baseline was found or a startup target was missed)
+"""
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the control, logging, export, simulation and rendering "
+                                                 "hot paths.")
+    parser.add_argument("--only", nargs="+", choices=sorted(BENCHMARKS), default=sorted(BENCHMARKS),
+                        help="benchmark groups to run")
+    parser.add_argument("--counts", type=int, nargs="+", default=DEFAULT_COUNTS,
+                        help="numbers of fans and subsystems to benchmark with")
+    parser.add_argument("--histories", type=int, nargs="+", default=DEFAULT_HISTORIES,
+                        help="history lengths to benchmark with (whole seconds, at least 1)")
+    parser.add_argument("--frozen", default=None, help="PyInstaller build to measure the startup time of")
+    parser.add_argument("--output", default=None, help="write the results to this JSON file")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE,
+                        help="compare against the results in this JSON file (default: the baseline in the repository)")
+    parser.add_argument("--no-baseline", action="store_true", help="do not compare against any baseline")
+    parser.add_argument("--save-baseline", default=None, help="write the results as a new baseline to this JSON file")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="relative slowdown allowed before a benchmark is reported as a regression")
+    args = parser.parse_args(argv)
+    if min(args.histories) < 1:
+        parser.error("history lengths must be at least 1 second")
+    if args.no_baseline or (args.baseline == DEFAULT_BASELINE and not os.path.exists(DEFAULT_BASELINE)):
+        args.baseline = None
+
+    results = {}
+    for group in args.only:
+        group_results = BENCHMARKS[group](args)
+        for name, result in group_results.items():
+            print(f"{name:60} {result['median_us']:12.1f} us (min {result['min_us']:.1f} us)")
+        results.update(group_results)
+    over_target = [name for name, result in results.items() if not result.get("within_target", True)]
+    for name in over_target:
+        print(f"OVER TARGET {name}: {results[name]['median_us'] / 1e6:.3f} s > {results[name]['target_us'] / 1e6:.3f} s")
+
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "processor": platform.processor(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results": results,
+    }
+    for path in (args.output, args.save_baseline):
+        if path is not None:
+            with open(path, "w") as file:
+                json.dump(report, file, indent=2)
+
+    if args.baseline is not None:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+        mismatches = meta_mismatches(report["meta"], baseline.get("meta", {}))
+        if mismatches:
+            for field, before, after in mismatches:
+                print(f"Baseline {field} {before!r} does not match this run's {after!r}.")
+            print(f"Skipping the comparison against {args.baseline}: its timings were taken in another environment. "
+                  f"Regenerate it here with --save-baseline to compare.")
+            return 1 if over_target else 0
+        regressions = find_regressions(results, baseline["results"], args.tolerance)
+        for name, before, after, ratio in regressions:
+            print(f"REGRESSION {name}: {before:.1f} us -> {after:.1f} us ({ratio:.2f}x)")
+        if regressions:
+            return 1
+        print(f"No regressions against {args.baseline} (tolerance {args.tolerance:.0%}).")
+    return 1 if over_target else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
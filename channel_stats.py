@@ -0,0 +1,184 @@
+import numpy as np
+
+# Percentiles reported by ChannelStats, estimated from its histograms
+PERCENTILES = (50, 95, 99)
+
+"""Description: Incremental statistics of every channel of a channel group (e.g. the subsystem temperatures), both over
+the whole run (lifetime) and over a rolling window. Each append() is a fixed number of vectorized operations across the
+channels, independent of the history length:
+- lifetime count, mean and variance (Welford's algorithm), minimum and maximum;
+- the rolling window is made of `window_blocks` complete blocks of `block_rows` rows plus the block being filled, each
+  block keeping its count, sum, sum of squares, minimum and maximum, so window queries only combine the blocks and an
+  expiring block is dropped as a whole;
+- percentiles come from fixed-width histograms over [low, high) with `bins` bins per channel, one for the lifetime and
+  one for the window. The window histogram forgets a block by subtracting the bin of each of its rows, so it is never
+  rebuilt. Values outside the range fall into the first or last bin, and estimates are clamped to the exact minimum
+  and maximum."""
+class ChannelStats:
+    def __init__(self, channels, low, high, bins=500, window_blocks=60, block_rows=10):
+        self.low = low
+        self.high = high
+        self.bins = bins
+        self.bin_width = (high - low) / bins
+        self.window_blocks = window_blocks
+        self.block_rows = block_rows
+        self.rows = 0
+        self.channels = 0
+        self.count = np.zeros(0, dtype=np.int64)
+        self.mean = np.zeros(0)
+        self.min = np.zeros(0)
+        self.max = np.zeros(0)
+        self._m2 = np.zeros(0)
+        # Histograms have an extra last bin that absorbs the rows of channels added by resize() before they existed
+        self._histogram = np.zeros((0, bins + 1), dtype=np.int64)
+        self._window_histogram = np.zeros((0, bins + 1), dtype=np.int64)
+        slots = window_blocks + 1
+        self._block_count = np.zeros((slots, 0), dtype=np.int64)
+        self._block_sum = np.zeros((slots, 0))
+        self._block_sumsq = np.zeros((slots, 0))
+        self._block_min = np.zeros((slots, 0))
+        self._block_max = np.zeros((slots, 0))
+        self._block_bins = np.zeros((slots, block_rows, 0), dtype=np.intp)
+        self.resize(channels)
+
+    """
+    Description: Changes the number of channels, keeping the statistics of the channels that remain. Added channels
+    start without samples.
+    Parameters: channels (int)
+    """
+    def resize(self, channels):
+        kept = min(self.channels, channels)
+
+        def resized(array, fill, axis=-1):
+            shape = list(array.shape)
+            shape[axis] = channels
+            result = np.full(shape, fill, dtype=array.dtype)
+            index = [slice(None)] * array.ndim
+            index[axis] = slice(0, kept)
+            result[tuple(index)] = array[tuple(index)]
+            return result
+
+        self.count = resized(self.count, 0)
+        self.mean = resized(self.mean, 0.0)
+        self._m2 = resized(self._m2, 0.0)
+        self.min = resized(self.min, np.inf)
+        self.max = resized(self.max, -np.inf)
+        self._histogram = resized(self._histogram, 0, axis=0)
+        self._window_histogram = resized(self._window_histogram, 0, axis=0)
+        self._block_count = resized(self._block_count, 0)
+        self._block_sum = resized(self._block_sum, 0.0)
+        self._block_sumsq = resized(self._block_sumsq, 0.0)
+        self._block_min = resized(self._block_min, np.inf)
+        self._block_max = resized(self._block_max, -np.inf)
+        self._block_bins = resized(self._block_bins, self.bins)
+        self._offsets = np.arange(channels) * (self.bins + 1)
+        self.channels = channels
+
+    """
+    Description: Adds one row with a value for every channel.
+    Parameters: values (numpy array)
+    """
+    def append(self, values):
+        slot = (self.rows // self.block_rows) % (self.window_blocks + 1)
+        row = self.rows % self.block_rows
+        if row == 0:
+            self._expire(slot)
+        self.rows += 1
+
+        # Lifetime moments (Welford), extremes and histogram
+        self.count += 1
+        delta = values - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (values - self.mean)
+        np.minimum(self.min, values, out=self.min)
+        np.maximum(self.max, values, out=self.max)
+        bins = np.clip(((values - self.low) / self.bin_width).astype(np.intp), 0, self.bins - 1)
+        flat = self._offsets + bins
+        self._histogram.ravel()[flat] += 1
+
+        # Current block of the rolling window
+        self._block_count[slot] += 1
+        self._block_sum[slot] += values
+        self._block_sumsq[slot] += values * values
+        np.minimum(self._block_min[slot], values, out=self._block_min[slot])
+        np.maximum(self._block_max[slot], values, out=self._block_max[slot])
+        self._block_bins[slot, row] = bins
+        self._window_histogram.ravel()[flat] += 1
+
+    """
+    Description: Drops a block from the rolling window before its slot is reused.
+    Parameters: slot (int)
+    """
+    def _expire(self, slot):
+        window = self._window_histogram.ravel()
+        for bins in self._block_bins[slot]:
+            window[self._offsets + bins] -= 1
+        self._window_histogram[:, self.bins] = 0
+        self._block_bins[slot] = self.bins
+        self._block_count[slot] = 0
+        self._block_sum[slot] = 0.0
+        self._block_sumsq[slot] = 0.0
+        self._block_min[slot] = np.inf
+        self._block_max[slot] = -np.inf
+
+    """
+    Description: Returns the statistics of the requested channels (all by default) over the whole run.
+    Parameters: channels (slice or array of int)
+    Returns: dict of numpy arrays ("count", "min", "max", "mean", "std" and "p<percentile>"; NaN without samples)
+    """
+    def lifetime(self, channels=slice(None)):
+        count = self.count[channels]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            std = np.sqrt(self._m2[channels] / count)
+        return self._summary(count, self.mean[channels], std, self.min[channels], self.max[channels],
+                             self._histogram[channels])
+
+    """
+    Description: Returns the statistics of the requested channels (all by default) over the rolling window, i.e. the
+    last `window_blocks` complete blocks and the block being filled.
+    Parameters: channels (slice or array of int)
+    Returns: dict of numpy arrays ("count", "min", "max", "mean", "std" and "p<percentile>"; NaN without samples)
+    """
+    def window(self, channels=slice(None)):
+        count = self._block_count[:, channels].sum(axis=0)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = self._block_sum[:, channels].sum(axis=0) / count
+            std = np.sqrt(np.maximum(self._block_sumsq[:, channels].sum(axis=0) / count - mean * mean, 0.0))
+        return self._summary(count, mean, std, self._block_min[:, channels].min(axis=0),
+                             self._block_max[:, channels].max(axis=0), self._window_histogram[channels])
+
+    """
+    Description: Assembles a statistics dict and estimates the percentiles from a histogram as bin midpoints.
+    Parameters: count, mean, std, minimum, maximum (numpy arrays), histogram (2-D numpy array)
+    Returns: dict of numpy arrays
+    """
+    def _summary(self, count, mean, std, minimum, maximum, histogram):
+        empty = count == 0
+        summary = {"count": count.copy(), "min": np.where(empty, np.nan, minimum),
+                   "max": np.where(empty, np.nan, maximum), "mean": np.where(empty, np.nan, mean),
+                   "std": np.where(empty, np.nan, std)}
+        # Shifting each channel's cumulative counts past the previous channel's makes the whole array sorted, so all
+        # channels are searched with a single searchsorted
+        cumulative = np.cumsum(histogram[:, :self.bins], axis=1)
+        shift = np.arange(len(count)) * (int(count.max(initial=0)) + 1)
+        flat = (cumulative + shift[:, None]).ravel()
+        for percentile in PERCENTILES:
+            rank = np.maximum(np.ceil(percentile / 100 * count), 1).astype(np.int64)
+            index = np.searchsorted(flat, rank + shift) - np.arange(len(count)) * self.bins
+            estimate = np.clip(self.low + (index + 0.5) * self.bin_width, minimum, maximum)
+            summary[f"p{percentile}"] = np.where(empty, np.nan, estimate)
+        return summary
+
+
+"""
+Description: Formats the statistics of a channel group as a fixed-width text table with one line per channel.
+Parameters: summary (dict returned by ChannelStats.lifetime or window), names (list of str, one per channel)
+Returns: str
+"""
+def format_stats(summary, names):
+    columns = ["min", "mean", "max", "std"] + [f"p{percentile}" for percentile in PERCENTILES]
+    width = max([len(name) for name in names] + [7]) + 2
+    lines = [f"{'Channel':<{width}}" + "".join(f"{column:>11}" for column in columns)]
+    for channel, name in enumerate(names):
+        lines.append(f"{name:<{width}}" + "".join(f"{summary[column][channel]:>11.3f}" for column in columns))
+    return "\n".join(lines)
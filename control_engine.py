@@ -0,0 +1,148 @@
+import json
+import numpy as np
+
+# Fan curve used when no zones are configured: 20% at or below 25 °C, 100% at or above 75 °C, linear in between
+DEFAULT_CURVE = [(25, 0.20), (75, 1.0)]
+# Temperature grid of the precomputed curve lookup tables (in °C); curves are flat outside of it
+LUT_MIN = -50.0
+LUT_MAX = 200.0
+LUT_STEP = 0.1
+
+"""Description: Zone-based fan control engine. Each zone maps a set of subsystems to a set of fans and drives them from
+the hottest of its subsystems, either through a piecewise-linear fan curve or a PID loop, with optional hysteresis so
+the fans only slow down once the zone has cooled by more than the hysteresis band. A fan that belongs to several zones
+runs at the highest speed any of them asks for. All zones are evaluated together in one vectorized pass per update:
+curves are precomputed into lookup tables and the zone/fan memberships into gather and reduce indices, so the cost per
+update stays flat as the number of fans and zones grows."""
+class ControlEngine:
+    def __init__(self, num_fans, num_subsystems, zones=None, unassigned_output=1.0):
+        if zones is None:
+            zones = [{"fans": "all", "subsystems": "all", "curve": DEFAULT_CURVE}]
+        if not zones:
+            raise ValueError("At least one zone must be configured.")
+        self.num_fans = num_fans
+        self.num_subsystems = num_subsystems
+        self.unassigned_output = unassigned_output
+        self.zones = zones
+        num_zones = len(zones)
+
+        # Gather indices of each zone's subsystems, reduced with np.maximum.reduceat
+        zone_subsystems = [self._indices(zone.get("subsystems", "all"), num_subsystems, "subsystem") for zone in zones]
+        self._subsystem_gather = np.concatenate(zone_subsystems)
+        self._subsystem_starts = np.cumsum([0] + [len(indices) for indices in zone_subsystems[:-1]])
+
+        # (fan, zone) pairs sorted by fan, reduced with np.maximum.reduceat into the fans that belong to a zone
+        zone_fans = [self._indices(zone.get("fans", "all"), num_fans, "fan") for zone in zones]
+        pair_fans = np.concatenate(zone_fans)
+        pair_zones = np.concatenate([np.full(len(indices), zone) for zone, indices in enumerate(zone_fans)])
+        order = np.argsort(pair_fans, kind="stable")
+        pair_fans = pair_fans[order]
+        self._pair_zones = pair_zones[order]
+        self._assigned_fans, self._fan_starts = np.unique(pair_fans, return_index=True)
+
+        self.hysteresis = np.array([float(zone.get("hysteresis", 0.0)) for zone in zones])
+        self.reference = np.full(num_zones, -np.inf)
+        self.output = np.zeros(num_zones)
+
+        # Curve zones share one lookup table with a row per distinct curve
+        self._curve_zones = np.array([zone for zone in range(num_zones) if "pid" not in zones[zone]], dtype=int)
+        grid = np.arange(LUT_MIN, LUT_MAX + LUT_STEP / 2, LUT_STEP)
+        curve_rows = {}
+        self._curve_rows = np.empty(len(self._curve_zones), dtype=int)
+        for position, zone in enumerate(self._curve_zones):
+            points = np.array(zones[zone].get("curve", DEFAULT_CURVE), dtype=float)
+            if points.ndim != 2 or points.shape[1] != 2 or np.any(np.diff(points[:, 0]) <= 0):
+                raise ValueError(f"Zone {zone}: curve must be a list of [temperature, output] points with increasing "
+                                 f"temperatures.")
+            row, _ = curve_rows.setdefault(points.tobytes(), (len(curve_rows), points))
+            self._curve_rows[position] = row
+        self._lut = np.empty((len(curve_rows), len(grid)))
+        for row, points in curve_rows.values():
+            self._lut[row] = np.interp(grid, points[:, 0], points[:, 1])
+
+        # PID zones keep their gains and state in parallel arrays
+        self._pid_zones = np.array([zone for zone in range(num_zones) if "pid" in zones[zone]], dtype=int)
+        pids = [zones[zone]["pid"] for zone in self._pid_zones]
+        self._setpoint = np.array([float(pid["setpoint"]) for pid in pids])
+        self._kp = np.array([float(pid.get("kp", 0.0)) for pid in pids])
+        self._ki = np.array([float(pid.get("ki", 0.0)) for pid in pids])
+        self._kd = np.array([float(pid.get("kd", 0.0)) for pid in pids])
+        self._pid_min = np.array([float(pid.get("min", 0.2)) for pid in pids])
+        self._pid_max = np.array([float(pid.get("max", 1.0)) for pid in pids])
+        self._integral = np.zeros(len(pids))
+        self._previous_error = None
+
+    """
+    Description: Creates a control engine from a JSON configuration file or an already loaded configuration. The file
+    holds a "zones" list; each zone has "fans" and "subsystems" (lists of 0-based indices, or "all"), either a "curve"
+    (list of [temperature, output] points) or a "pid" object ("setpoint", "kp", "ki", "kd", "min", "max"), and an
+    optional "hysteresis" in °C. Outputs are fractions of each fan's maximum RPM.
+    Parameters: config (str path or dict), num_fans (int), num_subsystems (int)
+    Returns: ControlEngine
+    """
+    @classmethod
+    def from_config(cls, config, num_fans, num_subsystems):
+        if isinstance(config, str):
+            with open(config) as file:
+                config = json.load(file)
+        return cls(num_fans, num_subsystems, config.get("zones"), config.get("unassigned_output", 1.0))
+
+    """
+    Description: Returns a control engine with the same zones for a different number of fans and subsystems. Zones that
+    select "all" follow the new counts, zones that list indices must still fit them. The controller state (hysteresis
+    references and PID integrals) starts over.
+    Parameters: num_fans (int), num_subsystems (int)
+    Returns: ControlEngine
+    """
+    def resized(self, num_fans, num_subsystems):
+        return ControlEngine(num_fans, num_subsystems, self.zones, self.unassigned_output)
+
+    """
+    Description: Converts a zone's fan or subsystem selection into an array of indices.
+    Parameters: selection (list of int or "all"), count (int), kind (str, used in error messages)
+    Returns: numpy array of int
+    """
+    @staticmethod
+    def _indices(selection, count, kind):
+        if selection == "all":
+            return np.arange(count)
+        indices = np.asarray(selection, dtype=int)
+        if indices.size == 0 or indices.min() < 0 or indices.max() >= count:
+            raise ValueError(f"Zone {kind} indices must be non-empty and between 0 and {count - 1}.")
+        return indices
+
+    """
+    Description: Computes the output of every fan from the subsystem temperatures.
+    Parameters: temperatures (numpy array), dt (float, seconds since the previous update)
+    Returns: numpy array of floats (fraction of each fan's maximum RPM)
+    """
+    def update(self, temperatures, dt):
+        zone_temperatures = np.maximum.reduceat(temperatures[self._subsystem_gather], self._subsystem_starts)
+
+        # Follow rising temperatures immediately, falling ones only once they leave the hysteresis band
+        moved = (zone_temperatures > self.reference) | (zone_temperatures < self.reference - self.hysteresis)
+        self.reference = np.where(moved, zone_temperatures, self.reference)
+
+        if len(self._curve_zones):
+            position = np.clip((self.reference[self._curve_zones] - LUT_MIN) / LUT_STEP, 0, self._lut.shape[1] - 1)
+            lower = position.astype(int)
+            upper = np.minimum(lower + 1, self._lut.shape[1] - 1)
+            fraction = position - lower
+            self.output[self._curve_zones] = (self._lut[self._curve_rows, lower] * (1 - fraction) +
+                                              self._lut[self._curve_rows, upper] * fraction)
+
+        if len(self._pid_zones):
+            error = self.reference[self._pid_zones] - self._setpoint
+            derivative = np.zeros_like(error) if self._previous_error is None or dt <= 0 else \
+                (error - self._previous_error) / dt
+            integral = self._integral + error * dt
+            output = self._kp * error + self._ki * integral + self._kd * derivative
+            # Only keep integrating while the output is not saturated, to avoid wind-up
+            saturated = ((output > self._pid_max) & (error > 0)) | ((output < self._pid_min) & (error < 0))
+            self._integral = np.where(saturated, self._integral, integral)
+            self._previous_error = error
+            self.output[self._pid_zones] = np.clip(output, self._pid_min, self._pid_max)
+
+        fan_outputs = np.full(self.num_fans, self.unassigned_output)
+        fan_outputs[self._assigned_fans] = np.maximum.reduceat(self.output[self._pair_zones], self._fan_starts)
+        return fan_outputs
@@ -0,0 +1,62 @@
+import time
+
+# Interval between two simulation ticks (in seconds)
+TICK_INTERVAL = 0.01
+# Number of simulation ticks per control update
+CONTROL_DIVIDER = 10
+
+"""Description: Control loop shared by the GUI and the headless runner. Each tick advances the subsystem simulation by one
+step; every CONTROL_DIVIDER ticks the backend samples the temperatures, updates the fan speeds and logs the data, and the
+new fan speeds are fed back into the simulation. An optional Instrumentation times the simulation and sample stages,
+and is handed to the backend for the control and log stages."""
+class ControlLoop:
+    def __init__(self, backend, subsystems, instrumentation=None):
+        self.backend = backend
+        self.subsystems = subsystems
+        self.cycles = 0
+        self.tick_count = 0
+        self.instrumentation = instrumentation
+        backend.instrumentation = instrumentation
+
+    """
+    Description: Runs one simulation tick, and a control update every CONTROL_DIVIDER ticks.
+    Returns: bool (True if the backend was updated during this tick)
+    """
+    def tick(self):
+        started = time.perf_counter()
+        new_temperatures = self.subsystems.output_temperatures()
+        if self.instrumentation is not None:
+            self.instrumentation.record("simulation", time.perf_counter() - started)
+        self.tick_count += 1
+        self.cycles += 1
+        if self.cycles < CONTROL_DIVIDER:
+            return False
+        self.cycles = 0
+        started = time.perf_counter()
+        self.backend.sample_temperatures(new_temperatures)
+        if self.instrumentation is not None:
+            self.instrumentation.record("sample", time.perf_counter() - started)
+        self.backend.update_fan_speeds()
+        self.subsystems.set_fan_speeds(self.backend.fan_speeds)
+        return True
+
+    """
+    Description: Changes the number of fans and subsystems and the maximum RPMs of the backend and the simulation in
+    place, keeping the history (see Backend.reconfigure). The new configuration is validated and the control and alarm
+    engines are built for it first (Backend.prepare_reconfigure); the simulation, which validates its new size before
+    changing anything, is only resized after that, and the backend last, so a rejected configuration leaves both as
+    they were. It must not be called while the loop is ticking, e.g. only while its SimulationWorker is stopped.
+    Parameters: num_fans (int or None), num_subsystems (int or None), max_rpms (list of floats or None),
+    control_engine (ControlEngine or None)
+    Returns: list of str (the log files that were closed)
+    """
+    def reconfigure(self, num_fans=None, num_subsystems=None, max_rpms=None, control_engine=None):
+        num_fans, num_subsystems, max_rpms, control_engine, alarm_engine = self.backend.prepare_reconfigure(
+            num_fans, num_subsystems, max_rpms, control_engine)
+        resized = (num_fans, num_subsystems) != (self.backend.num_fans, self.backend.num_subsystems)
+        if resized:
+            self.subsystems.resize(num_subsystems, num_fans)
+        closed = self.backend.reconfigure(num_fans, num_subsystems, max_rpms, control_engine, alarm_engine)
+        if resized and self.backend.last_control_time is not None:
+            self.subsystems.set_fan_speeds(self.backend.fan_speeds)
+        return closed
@@ -0,0 +1,211 @@
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+import numpy as np
+
+# Queue marker asking the writer thread to flush the current file
+_FLUSH = "flush"
+# Queue marker asking the writer thread to finish
+_STOP = "stop"
+
+
+"""
+Description: Formats elapsed times (in seconds) as HH:MM:SS.mmm strings without a Python-level loop.
+Parameters: times (numpy array of floats)
+Returns: numpy array of str
+"""
+def format_timestamps(times):
+    hours = (times // 3600).astype(int)
+    minutes = ((times % 3600) // 60).astype(int)
+    seconds = (times % 60).astype(int)
+    millis = ((times % 1) * 1000).astype(int)
+    parts = [np.char.zfill(hours.astype(str), 2), ":", np.char.zfill(minutes.astype(str), 2), ":",
+             np.char.zfill(seconds.astype(str), 2), ".", np.char.zfill(millis.astype(str), 3)]
+    formatted = parts[0]
+    for part in parts[1:]:
+        formatted = np.char.add(formatted, part)
+    return formatted
+
+
+"""
+Description: Returns the CSV header line for the given number of subsystems and fans.
+Parameters: num_subsystems (int), num_fans (int)
+Returns: str
+"""
+def csv_header(num_subsystems, num_fans):
+    temp_columns = [f"Temp{i + 1} (°C)" for i in range(num_subsystems)]
+    speed_columns = [f"Fan{i + 1} Speed (RPM)" for i in range(num_fans)]
+    return ",".join(["Time (HH:MM:SS)"] + temp_columns + speed_columns) + "\n"
+
+
+"""
+Description: Formats rows of logged data as CSV lines. Values are written with the shortest representation that
+round-trips in their own dtype, so float32 archives do not gain spurious digits.
+Parameters: times (numpy array of floats), data (2-D numpy array, temperatures followed by fan speeds for each row)
+Returns: str
+"""
+def format_rows(times, data):
+    timestamps = format_timestamps(times)
+    cells = data.astype(str).tolist()
+    return "".join(f"{timestamp},{','.join(row)}\n" for timestamp, row in zip(timestamps, cells))
+
+
+"""
+Description: Writes logged data to a CSV file. The data is written to a temporary file first and then moved into place,
+so a concurrent export never leaves a half-written file behind.
+Parameters: filename (str), times (numpy array of floats), temperatures (2-D numpy array), fan_speeds (2-D numpy array)
+"""
+def write_csv(filename, times, temperatures, fan_speeds):
+    temporary = f"{filename}.{threading.get_ident()}.tmp"
+    with open(temporary, "w", newline="", encoding="utf-8") as file:
+        file.write(csv_header(temperatures.shape[1], fan_speeds.shape[1]))
+        file.write(format_rows(times, np.hstack([temperatures, fan_speeds])))
+    os.replace(temporary, filename)
+
+
+"""
+Description: Returns the first path of the form <prefix>_<part>.csv in the given directory that does not exist yet,
+starting from the given part number.
+Parameters: directory (str), prefix (str), part (int)
+Returns: tuple of (str, int)
+"""
+def unique_filename(directory, prefix, part=1):
+    filename = os.path.join(directory, f"{prefix}_{part:03}.csv")
+    while os.path.exists(filename):
+        part += 1
+        filename = os.path.join(directory, f"{prefix}_{part:03}.csv")
+    return filename, part
+
+
+"""
+Description: Creates an empty file at the first unused path of the form <prefix>_<part>.csv in the given directory and
+returns its path, so an export written to it later in the background can neither overwrite an earlier file nor be
+given the same name as a concurrent export.
+Parameters: directory (str), prefix (str)
+Returns: str
+"""
+def reserve_filename(directory, prefix):
+    part = 1
+    while True:
+        filename, part = unique_filename(directory, prefix, part)
+        try:
+            open(filename, "x").close()
+            return filename
+        except FileExistsError:
+            part += 1
+
+
+"""Description: Append-only CSV logger that writes every control tick to disk on a background thread. Rows are queued by
+append(), which never touches the file, and the writer thread formats them in batches, flushes at most every
+`flush_interval` seconds and rotates to a new, never-overwritten file once the current one reaches `max_bytes` or has
+been open for `max_seconds`."""
+class StreamingCsvLogger:
+    def __init__(self, num_subsystems, num_fans, directory=".", prefix="temp_speed_log", flush_interval=1.0,
+                 max_bytes=None, max_seconds=None):
+        self.num_subsystems = num_subsystems
+        self.num_fans = num_fans
+        self.directory = directory
+        self.prefix = f"{prefix}_{datetime.now().strftime('%Y%m%d-%H%M%S')}"
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self.max_seconds = max_seconds
+        self.filenames = []
+        self.rows_written = 0
+        self._queue = queue.SimpleQueue()
+        self._file = None
+        self._opened_at = None
+        self._bytes = 0
+        self._part = 1
+        os.makedirs(directory, exist_ok=True)
+        self._thread = threading.Thread(target=self._run, name="StreamingCsvLogger", daemon=True)
+        self._thread.start()
+
+    """
+    Description: Queues one row of logged data for writing.
+    Parameters: elapsed_time (float), temperatures (numpy array), fan_speeds (numpy array)
+    """
+    def append(self, elapsed_time, temperatures, fan_speeds):
+        self._queue.put(np.concatenate(([elapsed_time], temperatures, fan_speeds)))
+
+    """
+    Description: Asks the writer thread to flush the rows queued so far without waiting for it.
+    """
+    def flush(self):
+        self._queue.put(_FLUSH)
+
+    """
+    Description: Writes the remaining rows, closes the current file and stops the writer thread.
+    """
+    def close(self):
+        self._queue.put(_STOP)
+        self._thread.join()
+
+    """
+    Description: Returns the file currently being written to.
+    Returns: str or None
+    """
+    def current_filename(self):
+        return self.filenames[-1] if self.filenames else None
+
+    """
+    Description: Body of the writer thread. It collects queued rows into batches and writes them until close() is called.
+    """
+    def _run(self):
+        last_flush = time.monotonic()
+        running = True
+        while running:
+            batch = []
+            flush = False
+            try:
+                item = self._queue.get(timeout=self.flush_interval)
+                while True:
+                    if isinstance(item, str):
+                        flush = True
+                        running = item != _STOP
+                        if not running:
+                            break
+                    else:
+                        batch.append(item)
+                    item = self._queue.get_nowait()
+            except queue.Empty:
+                pass
+            if batch:
+                self._write(np.vstack(batch))
+            if self._file is not None and (flush or time.monotonic() - last_flush >= self.flush_interval):
+                self._file.flush()
+                last_flush = time.monotonic()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    """
+    Description: Writes a batch of rows, opening or rotating the file first if needed.
+    Parameters: rows (2-D numpy array, time followed by temperatures and fan speeds for each row)
+    """
+    def _write(self, rows):
+        if self._file is not None and self._needs_rotation():
+            self._file.close()
+            self._file = None
+        if self._file is None:
+            filename, self._part = unique_filename(self.directory, self.prefix, self._part)
+            self._file = open(filename, "w", newline="", encoding="utf-8", buffering=1 << 20)
+            header = csv_header(self.num_subsystems, self.num_fans)
+            self._file.write(header)
+            self._bytes = len(header)
+            self._opened_at = time.monotonic()
+            self.filenames.append(filename)
+        text = format_rows(rows[:, 0], rows[:, 1:])
+        self._file.write(text)
+        self._bytes += len(text)
+        self.rows_written += len(rows)
+
+    """
+    Description: Returns whether the current file has reached its size or age limit.
+    Returns: bool
+    """
+    def _needs_rotation(self):
+        if self.max_bytes is not None and self._bytes >= self.max_bytes:
+            return True
+        return self.max_seconds is not None and time.monotonic() - self._opened_at >= self.max_seconds
@@ -0,0 +1,111 @@
+import math
+import numpy as np
+from telemetry_buffer import TelemetryBuffer
+
+"""Description: Multi-resolution min/max summary of a TelemetryBuffer, used to plot long histories with a bounded number
+of points. Level L holds one bucket per `factor`**L raw rows with the minimum and maximum of every channel over that
+bucket, so spikes stay visible at every zoom level. Levels are updated incrementally as rows are appended: level L only
+does work when a level L-1 bucket completes, so the amortized cost per row is about 4/3 of one vectorized min/max per
+channel group. Each level keeps the same time span as the raw buffer."""
+class MinMaxPyramid:
+    def __init__(self, telemetry, factor=4):
+        self.telemetry = telemetry
+        self.factor = factor
+        groups = {name: data.shape[1] for name, data in telemetry._data.items()}
+        self.levels = []
+        size = factor
+        while size <= telemetry.capacity:
+            level_groups = {}
+            for name, channels in groups.items():
+                level_groups[f"{name}_min"] = channels
+                level_groups[f"{name}_max"] = channels
+            self.levels.append(TelemetryBuffer(level_groups, math.ceil(telemetry.capacity / size) + 2, math.inf))
+            size *= factor
+        self._pending_min = [{name: np.zeros(channels) for name, channels in groups.items()} for _ in self.levels]
+        self._pending_max = [{name: np.zeros(channels) for name, channels in groups.items()} for _ in self.levels]
+        self._pending_count = [0] * len(self.levels)
+        self._pending_start = [0.0] * len(self.levels)
+
+    """
+    Description: Adds one raw row to the summaries. It must be called once for every row appended to the telemetry
+    buffer, right after it.
+    Parameters: elapsed_time (float), values (keyword arrays, one per channel group)
+    """
+    def append(self, elapsed_time, **values):
+        if self.levels:
+            self._accumulate(0, elapsed_time, values, values)
+
+    """
+    Description: Changes the number of channels of a group in every level, keeping the summaries of the channels that
+    remain. It must be called together with TelemetryBuffer.resize_group on the raw buffer.
+    Parameters: name (str), channels (int)
+    """
+    def resize_group(self, name, channels):
+        for level, buffer in enumerate(self.levels):
+            buffer.resize_group(f"{name}_min", channels)
+            buffer.resize_group(f"{name}_max", channels)
+            for pending in (self._pending_min[level], self._pending_max[level]):
+                kept = pending[name][:channels]
+                pending[name] = np.concatenate([kept, np.full(channels - len(kept), np.nan)])
+
+    """
+    Description: Folds a completed bucket of the level below (or a raw row) into a level's pending bucket, and stores
+    and propagates the pending bucket once it is complete.
+    Parameters: level (int, index into self.levels), start_time (float), mins (dict of arrays), maxs (dict of arrays)
+    """
+    def _accumulate(self, level, start_time, mins, maxs):
+        pending_min = self._pending_min[level]
+        pending_max = self._pending_max[level]
+        if self._pending_count[level] == 0:
+            self._pending_start[level] = start_time
+            for name in pending_min:
+                np.copyto(pending_min[name], mins[name])
+                np.copyto(pending_max[name], maxs[name])
+        else:
+            for name in pending_min:
+                np.minimum(pending_min[name], mins[name], out=pending_min[name])
+                np.maximum(pending_max[name], maxs[name], out=pending_max[name])
+        self._pending_count[level] += 1
+        if self._pending_count[level] == self.factor:
+            self._pending_count[level] = 0
+            summary = {}
+            for name in pending_min:
+                summary[f"{name}_min"] = pending_min[name]
+                summary[f"{name}_max"] = pending_max[name]
+            self.levels[level].append(self._pending_start[level], **summary)
+            if level + 1 < len(self.levels):
+                self._accumulate(level + 1, self._pending_start[level], pending_min, pending_max)
+
+    """
+    Description: Returns the points to plot for one channel over the requested window, using at most about
+    `max_points` points. The coarsest level needed is used for the bulk of the window and finer levels fill in the rows
+    its last complete bucket does not cover yet. Each bucket contributes its minimum and maximum at its start time. The
+    points are read under the telemetry buffer's lock and returned as copies, so they can be used from another thread.
+    Parameters: group (str), channel (int), max_points (int), seconds (float or None)
+    Returns: tuple of numpy arrays (times, values)
+    """
+    def query(self, group, channel, max_points, seconds=None):
+        with self.telemetry.lock:
+            first = self.telemetry.first_row(seconds)
+            rows = self.telemetry.count - first
+            level = 0
+            while level < len(self.levels) and 2 * rows / self.factor ** level > max_points:
+                level += 1
+            if level == 0:
+                times, values = self.telemetry.view(group, seconds)
+                return times.copy(), values[:, channel].copy()
+
+            times_parts = []
+            values_parts = []
+            for index in range(level, 0, -1):
+                size = self.factor ** index
+                buffer = self.levels[index - 1]
+                times, mins = buffer.view_rows(f"{group}_min", first // size)
+                _, maxs = buffer.view_rows(f"{group}_max", first // size)
+                times_parts.append(np.repeat(times, 2))
+                values_parts.append(np.column_stack([mins[:, channel], maxs[:, channel]]).ravel())
+                first = max(first, buffer.count * size)
+            times, values = self.telemetry.view_rows(group, first)
+            times_parts.append(times)
+            values_parts.append(values[:, channel])
+            return np.concatenate(times_parts), np.concatenate(values_parts)
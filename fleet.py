@@ -0,0 +1,311 @@
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import threading
+import time
+import numpy as np
+from multiprocessing import shared_memory
+from backend import Backend, SAMPLE_INTERVAL
+from control_engine import ControlEngine, DEFAULT_CURVE
+from control_loop import ControlLoop, CONTROL_DIVIDER, TICK_INTERVAL
+from decimation import MinMaxPyramid
+from headless import SimulatedClock
+from subsystem_simulation import SubsystemBank
+from telemetry_buffer import TelemetryBuffer
+
+# Number of robots simulated together by one vectorized backend/simulation group. Groups, not worker processes, are the
+# unit of the random streams, so a seeded fleet gives the same results whatever the number of workers.
+GROUP_SIZE = 16
+
+
+"""
+Description: Repeats the control zones of one robot for each robot of a group, offsetting their fan and subsystem
+indices so each robot's fans only respond to its own subsystems.
+Parameters: zones (list of dict or None, the zones of one robot), copies (int), num_fans (int, per robot),
+num_subsystems (int, per robot)
+Returns: list of dict
+"""
+def replicate_zones(zones, copies, num_fans, num_subsystems):
+    if zones is None:
+        zones = [{"fans": "all", "subsystems": "all", "curve": DEFAULT_CURVE}]
+    replicated = []
+    for copy in range(copies):
+        for zone in zones:
+            zone = dict(zone)
+            for key, count in (("fans", num_fans), ("subsystems", num_subsystems)):
+                selection = zone.get(key, "all")
+                indices = range(count) if selection == "all" else selection
+                zone[key] = [copy * count + index for index in indices]
+            replicated.append(zone)
+    return replicated
+
+
+"""Description: One group of robots inside a fleet worker: a Backend holding every channel of the group, driven by one
+control zone set per robot, and a SubsystemBank stepping all of their subsystems in a single call."""
+class FleetGroup:
+    def __init__(self, first_robot, robots, num_fans, num_subsystems, max_rpms, clock, seed, control_config=None):
+        self.first_robot = first_robot
+        self.robots = robots
+        self.num_fans = num_fans
+        self.num_subsystems = num_subsystems
+        config = control_config or {}
+        zones = replicate_zones(config.get("zones"), robots, num_fans, num_subsystems)
+        control_engine = ControlEngine(robots * num_fans, robots * num_subsystems, zones,
+                                       config.get("unassigned_output", 1.0))
+        self.backend = Backend(robots * num_fans, robots * num_subsystems, list(max_rpms) * robots, clock=clock,
+                               control_engine=control_engine, stats=False)  # The fleet aggregates its own figures
+        self.backend.alarm_engine = None
+        self.subsystems = SubsystemBank(robots * num_subsystems, seed=seed, groups=robots)
+        self.control_loop = ControlLoop(self.backend, self.subsystems)
+
+    """
+    Description: Returns copies of one robot's retained history.
+    Parameters: robot (int, index within the fleet)
+    Returns: tuple of numpy arrays (times, temperatures (rows, subsystems), fan speeds (rows, fans))
+    """
+    def history(self, robot):
+        local = robot - self.first_robot
+        times, temperatures = self.backend.telemetry.view("temp")
+        _, fan_speeds = self.backend.telemetry.view("speed")
+        return (times.copy(), temperatures[:, local * self.num_subsystems:(local + 1) * self.num_subsystems].copy(),
+                fan_speeds[:, local * self.num_fans:(local + 1) * self.num_fans].copy())
+
+
+"""
+Description: Body of a fleet worker process. It builds its groups, then steps them on request and writes every robot's
+latest temperatures and fan speeds into the shared arrays, so only a short acknowledgement goes back over the pipe.
+Parameters: connection (multiprocessing Connection), shared (dict of name -> (shared memory name, shape)),
+groups (list of (first robot, robots, seed) tuples), num_fans (int), num_subsystems (int), max_rpms (list),
+control_config (dict or None)
+"""
+def _fleet_worker(connection, shared, groups, num_fans, num_subsystems, max_rpms, control_config):
+    memories = {name: shared_memory.SharedMemory(name=memory) for name, (memory, _) in shared.items()}
+    arrays = {name: np.ndarray(shape, dtype=np.float64, buffer=memories[name].buf)
+              for name, (_, shape) in shared.items()}
+    clock = SimulatedClock()
+    fleet_groups = [FleetGroup(first, robots, num_fans, num_subsystems, max_rpms, clock, seed, control_config)
+                    for first, robots, seed in groups]
+    try:
+        while True:
+            command, argument = connection.recv()
+            if command == "step":
+                for _ in range(argument):
+                    clock.advance(TICK_INTERVAL)
+                    for group in fleet_groups:
+                        group.control_loop.tick()
+                for group in fleet_groups:
+                    robots = slice(group.first_robot, group.first_robot + group.robots)
+                    arrays["temp"][robots] = group.backend.subsystem_temperatures.reshape(group.robots, -1)
+                    arrays["speed"][robots] = group.backend.fan_speeds.reshape(group.robots, -1)
+                connection.send(clock())
+            elif command == "history":
+                group = next(group for group in fleet_groups
+                             if group.first_robot <= argument < group.first_robot + group.robots)
+                connection.send(group.history(argument))
+            else:
+                break
+    finally:
+        del arrays
+        for memory in memories.values():
+            memory.close()
+
+
+"""Description: Simulates a fleet of identical robots across a pool of worker processes. Robots are split into groups of
+GROUP_SIZE, each stepped by one vectorized backend and simulation, and the groups are sharded over the workers. Every
+step runs all robots in lockstep for the same number of ticks; the workers write the latest temperatures and fan speeds
+of their robots into shared-memory arrays, which the manager reduces into fleet-wide aggregates with a short history for
+graphs. One robot at a time can be selected for drill-down: its retained history is fetched from its worker once and
+then mirrored every step into a local Backend, which the regular data tracking screen can display. tick(), backend and
+tick_count give the manager the interface of a ControlLoop, so a SimulationWorker can drive it behind the GUI."""
+class FleetManager:
+    def __init__(self, num_robots, num_fans, num_subsystems, max_rpms, workers=None, seed=None, control_config=None,
+                 retention=300):
+        if isinstance(control_config, str):
+            with open(control_config) as file:
+                control_config = json.load(file)
+        self.num_robots = num_robots
+        self.num_fans = num_fans
+        self.num_subsystems = num_subsystems
+        self.max_rpms = list(max_rpms)
+        self.retention = retention
+        self.clock = SimulatedClock()
+        self.tick_count = 0
+        self.step_count = 0
+        self.instrumentation = None
+        self._lock = threading.Lock()
+
+        self._memories = {}
+        shared = {}
+        for name, channels in (("temp", num_subsystems), ("speed", num_fans)):
+            memory = shared_memory.SharedMemory(create=True, size=max(num_robots * channels * 8, 1))
+            self._memories[name] = memory
+            shared[name] = (memory.name, (num_robots, channels))
+        self.temperatures = np.ndarray((num_robots, num_subsystems), dtype=np.float64, buffer=self._memories["temp"].buf)
+        self.fan_speeds = np.ndarray((num_robots, num_fans), dtype=np.float64, buffer=self._memories["speed"].buf)
+        self.temperatures[:] = 0.0
+        self.fan_speeds[:] = 0.0
+
+        # Contiguous runs of groups per worker, so each worker's robots form one block of the shared arrays
+        starts = list(range(0, num_robots, GROUP_SIZE))
+        seeds = np.random.SeedSequence(seed).spawn(len(starts))
+        groups = [(start, min(GROUP_SIZE, num_robots - start), seeds[index]) for index, start in enumerate(starts)]
+        workers = min(workers or os.cpu_count() or 1, len(groups))
+        bounds = np.linspace(0, len(groups), workers + 1).astype(int)
+        self._first_robots = [groups[bound][0] for bound in bounds[:-1]]
+        context = multiprocessing.get_context("spawn")
+        self._connections = []
+        self._processes = []
+        for worker in range(workers):
+            parent, child = context.Pipe()
+            process = context.Process(target=_fleet_worker, name=f"FleetWorker-{worker}", daemon=True,
+                                      args=(child, shared, groups[bounds[worker]:bounds[worker + 1]], num_fans,
+                                            num_subsystems, self.max_rpms, control_config))
+            process.start()
+            self._connections.append(parent)
+            self._processes.append(process)
+
+        # Fleet-wide aggregates: hottest and mean subsystem temperature, and mean fan speed
+        capacity = int(retention / SAMPLE_INTERVAL * 1.25) + 1
+        self.aggregates = TelemetryBuffer({"temp": 2, "speed": 1}, capacity, retention)
+        self.decimation = MinMaxPyramid(self.aggregates)
+        self.robot_max_temperatures = np.zeros(num_robots)
+        self.robot_mean_fan_speeds = np.zeros(num_robots)
+        self.summary = {"max_temperature": 0.0, "mean_temperature": 0.0, "mean_fan_speed": 0.0, "hottest_robot": 0}
+
+        self.selected_robot = None
+        self.backend = None
+        self.select(0)
+
+    """
+    Description: Steps every robot of the fleet in lockstep by the given number of ticks, then updates the aggregates
+    and the mirror of the selected robot.
+    Parameters: ticks (int)
+    Returns: float (simulated time of the fleet, in seconds)
+    """
+    def step(self, ticks=CONTROL_DIVIDER):
+        with self._lock:
+            for connection in self._connections:
+                connection.send(("step", ticks))
+            now = max(connection.recv() for connection in self._connections)
+            self.clock.now = now
+            self.tick_count += ticks
+            self.step_count += 1
+
+            robot_max_temperatures = self.temperatures.max(axis=1)
+            robot_mean_fan_speeds = self.fan_speeds.mean(axis=1)
+            hottest = int(np.argmax(robot_max_temperatures))
+            summary = {"max_temperature": float(robot_max_temperatures[hottest]),
+                       "mean_temperature": float(self.temperatures.mean()),
+                       "mean_fan_speed": float(robot_mean_fan_speeds.mean()), "hottest_robot": hottest}
+            temps = np.array([summary["max_temperature"], summary["mean_temperature"]])
+            speeds = np.array([summary["mean_fan_speed"]])
+            with self.aggregates.lock:  # Held by the GUI while it queries the decimation pyramid
+                self.aggregates.append(now, temp=temps, speed=speeds)
+                self.decimation.append(now, temp=temps, speed=speeds)
+            # Replaced rather than mutated, so the GUI thread always sees consistent arrays
+            self.robot_max_temperatures = robot_max_temperatures
+            self.robot_mean_fan_speeds = robot_mean_fan_speeds
+            self.summary = summary
+
+            robot = self.selected_robot
+            self.backend.clock.now = now
+            self.backend.record(self.temperatures[robot], self.fan_speeds[robot])
+        return now
+
+    """
+    Description: Runs one control step of the fleet; lets a SimulationWorker drive the fleet like a ControlLoop, with a
+    tick interval of SAMPLE_INTERVAL.
+    Returns: bool (always True, every step updates the backends)
+    """
+    def tick(self):
+        self.step()
+        return True
+
+    """
+    Description: Selects the robot shown in the drill-down view. Its retained history is fetched from the worker that
+    simulates it and loaded into a new local Backend, which is then kept up to date by every step.
+    Parameters: robot (int)
+    Returns: Backend
+    """
+    def select(self, robot):
+        if not 0 <= robot < self.num_robots:
+            raise ValueError(f"Robot must be between 0 and {self.num_robots - 1}.")
+        with self._lock:
+            worker = int(np.searchsorted(self._first_robots, robot, side="right")) - 1
+            self._connections[worker].send(("history", robot))
+            times, temperatures, fan_speeds = self._connections[worker].recv()
+            backend = Backend(self.num_fans, self.num_subsystems, self.max_rpms, retention=self.retention,
+                              clock=SimulatedClock())
+            for index in range(len(times)):
+                backend.clock.now = times[index]
+                backend.record(temperatures[index], fan_speeds[index])
+            self.selected_robot = robot
+            self.backend = backend
+        return backend
+
+    """
+    Description: Stops the worker processes and releases the shared memory.
+    """
+    def close(self):
+        with self._lock:
+            for connection in self._connections:
+                try:
+                    connection.send(("stop", None))
+                except (BrokenPipeError, OSError):
+                    pass
+            for process in self._processes:
+                process.join(timeout=5)
+                if process.is_alive():
+                    process.terminate()
+            self._connections = []
+            self._processes = []
+            # The shared memory can only be closed once no array refers to it any more
+            self.temperatures = self.fan_speeds = None
+            for memory in self._memories.values():
+                memory.close()
+                memory.unlink()
+            self._memories = {}
+
+
+"""
+Description: Entry point of the headless fleet runner, which reports the fleet's throughput in simulated robot-seconds
+per second.
+Parameters: argv (list of str or None)
+Returns: int (exit code)
+"""
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Simulate a fleet of robots across worker processes.")
+    parser.add_argument("--robots", type=int, default=64, help="number of robots")
+    parser.add_argument("--fans", type=int, default=5, help="fans per robot")
+    parser.add_argument("--subsystems", type=int, default=6, help="subsystems per robot")
+    parser.add_argument("--max-rpm", type=int, default=2000, help="maximum RPM of every fan")
+    parser.add_argument("--workers", type=int, nargs="+", default=[None],
+                        help="numbers of worker processes to run with (default: one per CPU core)")
+    parser.add_argument("--duration", type=float, default=60, help="simulated time to run (in seconds)")
+    parser.add_argument("--seed", type=int, default=None, help="seed for the subsystem simulation")
+    args = parser.parse_args(argv)
+
+    steps = int(round(args.duration / SAMPLE_INTERVAL))
+    for workers in args.workers:
+        fleet = FleetManager(args.robots, args.fans, args.subsystems, [args.max_rpm] * args.fans, workers=workers,
+                             seed=args.seed)
+        try:
+            fleet.step()  # Wait for the workers to start before timing
+            start = time.perf_counter()
+            for _ in range(steps - 1):
+                fleet.step()
+            wall_time = time.perf_counter() - start
+            robot_seconds = args.robots * (steps - 1) * SAMPLE_INTERVAL
+            print(f"{len(fleet._connections)} worker(s): {robot_seconds / wall_time:.0f} robot-seconds per second "
+                  f"({args.robots} robots, {wall_time:.2f} s); max temperature {fleet.summary['max_temperature']:.3f} "
+                  f"°C on robot {fleet.summary['hottest_robot'] + 1}, mean fan speed "
+                  f"{fleet.summary['mean_fan_speed']:.3f} RPM")
+        finally:
+            fleet.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,78 @@
+import time
+
+# Longest interval (in seconds) the scheduler stretches the UI refresh to when rendering is slow
+MAX_FRAME_INTERVAL = 1.0
+# Largest share of the wall time the UI thread may spend rendering; the rest is left to the event loop and to the
+# simulation worker, which shares the interpreter with it
+MAX_RENDER_LOAD = 0.5
+# Weight of each new frame in the smoothed render time once rendering gets faster again (a slower frame is taken at once)
+LOAD_SMOOTHING = 0.2
+# Interval (in seconds) at which the scheduler checks whether a hidden window became visible again
+SUSPENDED_POLL_INTERVAL = 0.25
+# Shortest delay (in seconds) between two frames, so a late frame never starts straight after the previous one
+MIN_FRAME_DELAY = 0.001
+
+
+"""Description: Adaptive scheduler of the UI refreshes. Frames are targeted at the configured frame budget (the
+interval between two refreshes), but the interval is stretched so that rendering never takes more than MAX_RENDER_LOAD
+of the wall time, and stretched further whenever the simulation worker had to skip control ticks since the previous
+frame. The render time is smoothed so that a slow frame throttles the refresh at once and the full rate comes back
+gradually as rendering gets faster. Each frame is scheduled once the previous one has finished, so late frames are
+coalesced into one showing the latest data instead of queueing up. While the window cannot be seen the frames are
+suspended, and the scheduler only polls for the window to come back."""
+class FrameScheduler:
+    def __init__(self, budget=0.1, max_interval=MAX_FRAME_INTERVAL, max_load=MAX_RENDER_LOAD):
+        if budget <= 0:
+            raise ValueError("The frame budget must be positive.")
+        self.budget = budget  # Target interval between two frames (in seconds)
+        self.max_interval = max(max_interval, budget)
+        self.max_load = max_load
+        self.interval = budget  # Current interval between two frames
+        self.render_time = 0.0  # Smoothed render time of a frame
+        self.suspended = True
+        self.resumed = False  # True during the first frame after frames were suspended
+        self.frame_started = None
+        self._skipped_ticks = 0
+
+    """
+    Description: Starts a frame if it can be seen, or suspends the frames until it can.
+    Parameters: visible (bool, whether there is anything on screen to refresh), now (float or None, perf_counter time)
+    Returns: bool (True if the frame should be rendered)
+    """
+    def begin_frame(self, visible, now=None):
+        if not visible:
+            self.suspended = True
+            self.resumed = False
+            return False
+        self.resumed = self.suspended
+        self.suspended = False
+        self.frame_started = time.perf_counter() if now is None else now
+        return True
+
+    """
+    Description: Adapts the interval to how long the frame took to render and to whether the control loop fell behind.
+    Parameters: render_time (float, seconds), skipped_ticks (int, control ticks the worker has skipped so far)
+    Returns: int (number of frames at the target rate that the new interval drops)
+    """
+    def end_frame(self, render_time, skipped_ticks=0):
+        self.render_time = max(render_time, self.render_time + LOAD_SMOOTHING * (render_time - self.render_time))
+        if skipped_ticks > self._skipped_ticks:
+            # The control loop is being starved, so leave it at least twice the time it had
+            self.render_time = max(self.render_time, self.interval * self.max_load) * 2
+        self._skipped_ticks = skipped_ticks
+        self.interval = min(max(self.budget, self.render_time / self.max_load), self.max_interval)
+        return max(round(self.interval / self.budget) - 1, 0)
+
+    """
+    Description: Returns how long to wait before the next frame: the rest of the current interval, or the polling
+    interval while frames are suspended.
+    Parameters: now (float or None, perf_counter time)
+    Returns: int (milliseconds)
+    """
+    def delay_ms(self, now=None):
+        if self.suspended or self.frame_started is None:
+            delay = SUSPENDED_POLL_INTERVAL
+        else:
+            now = time.perf_counter() if now is None else now
+            delay = max(self.frame_started + self.interval - now, MIN_FRAME_DELAY)
+        return max(int(round(delay * 1000)), 1)
@@ -0,0 +1,176 @@
+import argparse
+import sys
+import time
+import numpy as np
+from alarm_engine import AlarmEngine, EVENT_START
+from backend import Backend
+from channel_stats import format_stats
+from control_engine import ControlEngine
+from control_loop import ControlLoop, TICK_INTERVAL
+from instrumentation import Instrumentation
+from subsystem_simulation import SubsystemBank
+from thermal_model import ThermalModel
+
+"""Description: Simulated clock that only moves when it is advanced. It is callable like time.time so it can be injected
+into the Backend in place of the wall clock."""
+class SimulatedClock:
+    def __init__(self, start=0.0):
+        self.now = start
+
+    """
+    Description: Advances the clock by the given number of seconds.
+    Parameters: seconds (float)
+    """
+    def advance(self, seconds):
+        self.now += seconds
+
+    def __call__(self):
+        return self.now
+
+
+"""Description: Runs the same control loop as the GUI without Qt. The Backend is driven by a SimulatedClock, so the
+loop can run as fast as the CPU allows or paced at a chosen multiple of real time."""
+class HeadlessRunner:
+    def __init__(self, num_fans, num_subsystems, max_rpms, seed=None, control_engine=None, instrumentation=None,
+                 thermal_config=None, alarm_engine=None):
+        self.clock = SimulatedClock()
+        self.backend = Backend(num_fans, num_subsystems, max_rpms, clock=self.clock, control_engine=control_engine,
+                               alarm_engine=alarm_engine)
+        if thermal_config is None:
+            self.subsystems = SubsystemBank(num_subsystems, seed=seed)
+        else:
+            self.subsystems = ThermalModel.from_config(thermal_config, num_subsystems, num_fans, seed=seed)
+        self.instrumentation = instrumentation
+        self.control_loop = ControlLoop(self.backend, self.subsystems, instrumentation)
+
+    """
+    Description: Runs the control loop for the given amount of simulated time.
+    Parameters: duration (float, seconds of simulated time), speed (float or None, multiple of real time; None runs as
+    fast as possible), on_control (callable or None, called with the backend after every control update)
+    Returns: dict with the simulated and wall-clock durations and the number of ticks run
+    """
+    def run(self, duration, speed=None, on_control=None):
+        ticks = int(round(duration / TICK_INTERVAL))
+        wall_start = time.perf_counter()
+        for tick in range(1, ticks + 1):
+            self.clock.advance(TICK_INTERVAL)
+            started = time.perf_counter()
+            if self.control_loop.tick() and on_control is not None:
+                on_control(self.backend)
+            if self.instrumentation is not None:
+                self.instrumentation.record("tick", time.perf_counter() - started)
+            if speed:
+                delay = wall_start + tick * TICK_INTERVAL / speed - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+        wall_time = time.perf_counter() - wall_start
+        return {
+            "simulated_time": ticks * TICK_INTERVAL,
+            "wall_time": wall_time,
+            "ticks": ticks,
+            "speedup": ticks * TICK_INTERVAL / wall_time if wall_time > 0 else float("inf"),
+        }
+
+
+"""
+Description: Parses the command line arguments of the headless runner.
+Parameters: argv (list of str or None)
+Returns: argparse.Namespace
+"""
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Run the fan control simulation without the GUI.")
+    parser.add_argument("--fans", type=int, default=5, help="number of fans")
+    parser.add_argument("--subsystems", type=int, default=6, help="number of subsystems")
+    parser.add_argument("--max-rpm", type=int, nargs="+", default=[2000],
+                        help="maximum RPM of each fan (a single value applies to every fan)")
+    parser.add_argument("--duration", type=float, default=3600, help="simulated time to run (in seconds)")
+    parser.add_argument("--speed", type=float, default=0,
+                        help="multiple of real time to run at (0 runs as fast as possible)")
+    parser.add_argument("--seed", type=int, default=None, help="seed for the subsystem simulation")
+    parser.add_argument("--control-config", default=None, help="JSON file with the fan control zones")
+    parser.add_argument("--thermal-config", default=None,
+                        help="JSON file with the fan-to-subsystem thermal coupling of the simulation")
+    parser.add_argument("--alarm-config", default=None, help="JSON file with the alarm rules")
+    parser.add_argument("--events", default=None, help="write the alarm events of the run to this CSV file")
+    parser.add_argument("--csv", action="store_true", help="export the logged data to CSV when the run finishes")
+    parser.add_argument("--log-dir", default=None, help="continuously log every control tick to CSV files in this directory")
+    parser.add_argument("--log-max-bytes", type=int, default=None, help="rotate continuous log files at this size")
+    parser.add_argument("--archive", default=None, help="archive the full history to a binary archive in this directory")
+    parser.add_argument("--record", default=None, help="record the sensor trace of the run to this file")
+    parser.add_argument("--serve", type=int, default=None, metavar="PORT",
+                        help="serve the live telemetry over HTTP/WebSocket on this localhost port during the run")
+    parser.add_argument("--stats", action="store_true",
+                        help="print the lifetime statistics of every channel when the run finishes")
+    parser.add_argument("--timing", default=None, help="time every stage of the control loop and write the statistics to "
+                                                       "this JSON file")
+    return parser.parse_args(argv)
+
+
+"""
+Description: Entry point of the headless runner.
+Parameters: argv (list of str or None)
+Returns: int (exit code)
+"""
+def main(argv=None):
+    args = parse_args(argv)
+    max_rpms = args.max_rpm * args.fans if len(args.max_rpm) == 1 else args.max_rpm
+    if len(max_rpms) != args.fans:
+        print("Number of --max-rpm values must be 1 or match the number of fans.", file=sys.stderr)
+        return 2
+    control_engine = None
+    if args.control_config is not None:
+        control_engine = ControlEngine.from_config(args.control_config, args.fans, args.subsystems)
+    alarm_engine = None
+    if args.alarm_config is not None:
+        alarm_engine = AlarmEngine.from_config(args.alarm_config, {"temp": args.subsystems, "speed": args.fans},
+                                               {"speed": np.array(max_rpms)})
+    instrumentation = Instrumentation() if args.timing is not None else None
+    runner = HeadlessRunner(args.fans, args.subsystems, max_rpms, seed=args.seed, control_engine=control_engine,
+                            instrumentation=instrumentation, thermal_config=args.thermal_config,
+                            alarm_engine=alarm_engine)
+    if args.log_dir is not None:
+        runner.backend.start_csv_logging(args.log_dir, max_bytes=args.log_max_bytes)
+    if args.archive is not None:
+        runner.backend.start_archive(args.archive)
+    if args.record is not None:
+        runner.backend.start_trace(args.record, seed=args.seed)
+    server = None
+    if args.serve is not None:
+        from telemetry_server import TelemetryServer  # asyncio is only imported when serving
+        server = TelemetryServer(port=args.serve)
+        print(f"Telemetry server listening on http://127.0.0.1:{server.start()}")
+        server.attach(runner.backend)
+    result = runner.run(args.duration, speed=args.speed or None)
+    if server is not None:
+        server.stop()
+    if args.log_dir is not None:
+        print(f"Continuous log files written: {', '.join(runner.backend.stop_csv_logging())}")
+    if args.archive is not None:
+        print(f"Archive written: {runner.backend.stop_archive()}")
+    if args.record is not None:
+        print(f"Trace recorded: {runner.backend.stop_trace()}")
+    temperatures, fan_speeds = runner.backend.get_current_data()
+    print(f"Simulated {result['simulated_time']:.1f} s in {result['wall_time']:.2f} s "
+          f"({result['speedup']:.0f}x real time, {result['ticks']} ticks)")
+    print(f"Max temperature: {np.max(temperatures):.3f} °C, mean fan speed: {np.mean(fan_speeds):.3f} RPM")
+    events = runner.backend.alarm_engine.log
+    alarms = ", ".join(f"{rule['name']}: {len(events.query(rule=index, kind=EVENT_START))}"
+                       for index, rule in enumerate(events.rules))
+    print(f"Alarms raised: {alarms or 'no rules'}")
+    if args.events is not None:
+        print(f"Alarm events written: {events.write_csv(args.events)}")
+    if args.stats:
+        stats = runner.backend.stats
+        print(format_stats(stats["temp"].lifetime(), [f"Subsystem {i + 1}" for i in range(args.subsystems)]))
+        print(format_stats(stats["speed"].lifetime(), [f"Fan {i + 1}" for i in range(args.fans)]))
+    if args.csv:
+        filenames = runner.backend.request_csv(background=False)
+        print(f"CSV file created: {', '.join(filenames)}" if filenames else "No data to write.")
+    if instrumentation is not None:
+        print(instrumentation.format_table())
+        print(f"Timing statistics written: {instrumentation.dump_json(args.timing)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,194 @@
+import json
+import math
+import time
+
+# Time budgets (in seconds) of the stages that have one; a sample over its budget counts as an overrun
+DEFAULT_BUDGETS = {"tick": 0.01, "frame": 0.1}
+# Histogram bins are logarithmic from HISTOGRAM_MIN seconds upwards, BINS_PER_DECADE bins per factor of ten, so the
+# percentiles are accurate to about 12% over the whole range
+HISTOGRAM_MIN = 1e-6
+BINS_PER_DECADE = 20
+HISTOGRAM_DECADES = 7
+
+"""Description: Streaming latency histogram with logarithmic bins. Recording a sample is a few arithmetic operations and
+the memory use is fixed, so it can stay enabled for the whole run. It keeps the count, mean and exact maximum, estimates
+percentiles from the bins, and counts the samples that went over its budget."""
+class LatencyHistogram:
+    def __init__(self, budget=None):
+        self.budget = budget
+        self.counts = [0] * (BINS_PER_DECADE * HISTOGRAM_DECADES + 2)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.overruns = 0
+
+    """
+    Description: Records one sample.
+    Parameters: seconds (float)
+    """
+    def record(self, seconds):
+        if seconds <= HISTOGRAM_MIN:
+            index = 0
+        else:
+            index = min(int(math.log10(seconds / HISTOGRAM_MIN) * BINS_PER_DECADE) + 1, len(self.counts) - 1)
+        self.counts[index] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+        if self.budget is not None and seconds > self.budget:
+            self.overruns += 1
+
+    """
+    Description: Estimates a percentile as the upper edge of the bin holding it, capped at the largest sample.
+    Parameters: percent (float, 0 to 100)
+    Returns: float (seconds)
+    """
+    def percentile(self, percent):
+        if self.count == 0:
+            return 0.0
+        rank = percent / 100 * self.count
+        cumulative = 0
+        for index, count in enumerate(self.counts):
+            cumulative += count
+            if cumulative >= rank and count:
+                return min(HISTOGRAM_MIN * 10 ** (index / BINS_PER_DECADE), self.max)
+        return self.max
+
+    """
+    Description: Returns the statistics of the histogram, with times in milliseconds.
+    Returns: dict
+    """
+    def summary(self):
+        return {
+            "count": self.count,
+            "mean_ms": self.total / self.count * 1e3 if self.count else 0.0,
+            "p50_ms": self.percentile(50) * 1e3,
+            "p99_ms": self.percentile(99) * 1e3,
+            "max_ms": self.max * 1e3,
+            "budget_ms": None if self.budget is None else self.budget * 1e3,
+            "overruns": self.overruns,
+        }
+
+
+"""Description: Collects the timing of every stage of the control loop and the UI refresh in one LatencyHistogram per
+stage, plus event counters. The worker thread and the GUI thread record into different stages, so no locking is needed.
+Periodic stages can also be marked once per period to track their jitter, the deviation of each period from the
+nominal interval."""
+class Instrumentation:
+    def __init__(self, budgets=None):
+        self.budgets = dict(DEFAULT_BUDGETS if budgets is None else budgets)
+        self.started = time.time()
+        self.stages = {}
+        self.counters = {}
+        self._last_marks = {}
+
+    """
+    Description: Returns the histogram of a stage, creating it on first use.
+    Parameters: stage (str)
+    Returns: LatencyHistogram
+    """
+    def histogram(self, stage):
+        histogram = self.stages.get(stage)
+        if histogram is None:
+            histogram = self.stages.setdefault(stage, LatencyHistogram(self.budgets.get(stage)))
+        return histogram
+
+    """
+    Description: Records how long one run of a stage took.
+    Parameters: stage (str), seconds (float)
+    """
+    def record(self, stage, seconds):
+        self.histogram(stage).record(seconds)
+
+    """
+    Description: Marks the start of a period of a periodic stage and records how far the period since the previous mark
+    deviated from the nominal interval, in the "<stage> jitter" histogram.
+    Parameters: stage (str), interval (float, nominal period in seconds), now (float or None, perf_counter time),
+    restart (bool, start a new series of periods without recording a jitter, e.g. after the stage was paused)
+    """
+    def mark(self, stage, interval, now=None, restart=False):
+        if now is None:
+            now = time.perf_counter()
+        last = self._last_marks.get(stage)
+        self._last_marks[stage] = now
+        if last is not None and not restart:
+            self.record(f"{stage} jitter", abs(now - last - interval))
+
+    """
+    Description: Adds to an event counter.
+    Parameters: name (str), amount (int)
+    """
+    def increment(self, name, amount=1):
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    """
+    Description: Clears all statistics.
+    """
+    def reset(self):
+        self.started = time.time()
+        self.stages = {}
+        self.counters = {}
+        self._last_marks = {}
+
+    """
+    Description: Returns the statistics of every stage and the counters.
+    Returns: dict
+    """
+    def summary(self):
+        return {
+            "duration_s": time.time() - self.started,
+            "stages": {stage: histogram.summary() for stage, histogram in list(self.stages.items())},
+            "counters": dict(self.counters),
+        }
+
+    """
+    Description: Formats the statistics as a fixed-width text table.
+    Returns: str
+    """
+    def format_table(self):
+        lines = [f"{'Stage':<16}{'Count':>9}{'p50 ms':>9}{'p99 ms':>9}{'Max ms':>9}{'Overruns':>10}"]
+        for stage, stats in sorted(self.summary()["stages"].items()):
+            overruns = "" if stats["budget_ms"] is None else str(stats["overruns"])
+            lines.append(f"{stage:<16}{stats['count']:>9}{stats['p50_ms']:>9.3f}{stats['p99_ms']:>9.3f}"
+                         f"{stats['max_ms']:>9.3f}{overruns:>10}")
+        for name, value in sorted(self.counters.items()):
+            lines.append(f"{name:<16}{value:>9}")
+        return "\n".join(lines)
+
+    """
+    Description: Writes the statistics to a JSON file.
+    Parameters: filename (str)
+    Returns: str
+    """
+    def dump_json(self, filename="timing_stats.json"):
+        with open(filename, "w") as file:
+            json.dump(self.summary(), file, indent=2)
+        return filename
+
+
+"""Description: Records how long each phase of the application's startup takes, from the moment it is created (as early
+as possible in main.py, before the heavy imports) to each call of mark()."""
+class StartupTimer:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases = []
+
+    """
+    Description: Ends the current phase of the startup.
+    Parameters: phase (str)
+    """
+    def mark(self, phase):
+        self.phases.append((phase, time.perf_counter()))
+
+    """
+    Description: Formats the duration of every phase and the cumulative time at its end as a text table.
+    Returns: str
+    """
+    def format_report(self):
+        lines = [f"{'Startup phase':<28}{'ms':>9}{'Total ms':>10}"]
+        previous = self.started
+        for phase, end in self.phases:
+            lines.append(f"{phase:<28}{(end - previous) * 1e3:>9.1f}{(end - self.started) * 1e3:>10.1f}")
+            previous = end
+        return "\n".join(lines)
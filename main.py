@@ -1,66 +1,146 @@
-import sys
 import time
+from instrumentation import StartupTimer
+startup_timer = StartupTimer()  # Created before the other imports so the startup report includes their cost
+import argparse
+import multiprocessing
+import os
+import sys
+import numpy as np
 from PyQt6.QtWidgets import QApplication
 from PyQt6.QtCore import QTimer
-from backend import Backend
-from subsystem_simulation import SubsystemSimulation
-from ui import UI
+startup_timer.mark("import PyQt6")
+from alarm_engine import AlarmEngine
+from backend import Backend, SAMPLE_INTERVAL
+from control_engine import ControlEngine
+from control_loop import ControlLoop
+from fleet import FleetManager
+from frame_scheduler import FrameScheduler
+from instrumentation import DEFAULT_BUDGETS, Instrumentation
+from simulation_worker import SimulationWorker
+from subsystem_simulation import SubsystemBank
+from thermal_model import ThermalModel
+from trace_replay import TraceReplayer
+startup_timer.mark("import backend modules")
+from ui import UI, preload_matplotlib
+startup_timer.mark("import ui")
+
+# Default target interval between two UI refreshes (in milliseconds); the frame scheduler stretches it under load
+UI_REFRESH_INTERVAL = 100
 
 '''
 Description: Main application class that handles the logic of the system. It initializes the backend, subsystems, and UI.
+The simulation and control loop runs on a SimulationWorker thread; a single-shot Qt timer only refreshes the UI from the
+latest snapshot the worker has published, at the times a FrameScheduler picks.
 '''
 class MainApp:
-    def __init__(self):
+    def __init__(self, control_config=None, timing_json=None, record_dir=None, thermal_config=None, alarm_config=None,
+                 serve_port=None, frame_budget=UI_REFRESH_INTERVAL / 1000):
         self.state = "menu"
+        self.control_config = control_config  # Optional JSON file with the fan control zones
+        self.thermal_config = thermal_config  # Optional JSON file with the thermal coupling of the simulation
+        self.alarm_config = alarm_config  # Optional JSON file with the alarm rules
+        self.timing_json = timing_json  # Optional JSON file the timing statistics are written to on quit
+        self.record_dir = record_dir  # Optional directory every run's sensor trace is recorded to
+        self.instrumentation = None
+        self.fleet = None
         self.backend = None
         self.ui = UI(self)
         self.ui.show()
+        self.scheduler = FrameScheduler(frame_budget)
         self.timer = QTimer()
+        self.timer.setSingleShot(True)
         self.timer.timeout.connect(self.update)
-        self.timer.start(10)
-        self.timer10cycles = 0
-        self.subsystems = []
+        self.timer.start(self.scheduler.delay_ms())
+        self.subsystems = None
+        self.control_loop = None
+        self.worker = None
+        self.last_snapshot = None
         self.start_time = None
+        self.telemetry_server = None
+        if serve_port is not None:
+            from telemetry_server import TelemetryServer  # Imported here so asyncio does not slow down every startup
+            self.telemetry_server = TelemetryServer(port=serve_port)
+            print(f"Telemetry server listening on http://127.0.0.1:{self.telemetry_server.start()}")
 
     """
-    Description: Updates the application based on the current state.
+    Description: Updates the application based on the current state, then schedules the next update. Frames are
+    suspended in the menu and while the window cannot be seen (minimized, hidden or fully covered), and the next frame
+    is only scheduled once this one has finished, so frames that are late are coalesced rather than queued.
     """
     def update(self):
-        if self.state == "menu":
-            pass  # Menu state logic handled by UI
-        elif self.state == "data_tracking":
-            self.run_data_tracking()
+        try:
+            visible = self.state != "menu" and self.ui.is_on_screen()
+            interval = self.scheduler.interval
+            if self.scheduler.begin_frame(visible):
+                self.instrumentation.mark("frame", interval, restart=self.scheduler.resumed)
+                if self.state == "data_tracking":
+                    self.run_data_tracking()
+                elif self.state == "fleet":
+                    self.run_fleet_tracking()
+            elif self.state != "menu" and self.instrumentation is not None:
+                self.instrumentation.increment("suspended frames")
+        finally:
+            self.timer.start(self.scheduler.delay_ms())
 
     """
-    Description: Runs the data tracking logic for the application. It samples the temperatures of the subsystems, updates
-    the fan speeds, and logs the data.
+    Description: Runs the data tracking logic for the application. The worker thread samples the temperatures of the
+    subsystems, updates the fan speeds, and logs the data; this refreshes the UI whenever it has published a new snapshot.
     """
     def run_data_tracking(self):
         if self.backend is None:
             print("Backend is not initialized.")
             return
         try:
-            # Update subsystem temperatures
-            new_temperatures = [subsystem.output_temperature() for subsystem in self.subsystems]
-
-            self.timer10cycles += 1
-            if self.timer10cycles == 10:
-                self.timer10cycles = 0
-                self.backend.sample_temperatures(new_temperatures)
-                self.backend.update_fan_speeds()
-
-                # Update the fan speeds in subsystems
-                for subsystem in self.subsystems:
-                    subsystem.set_fan_speeds(self.backend.fan_speeds)
-                # temperatures, fan_speeds = self.backend.get_current_data()
-                # print("Current Temperatures:", temperatures)
-                # print("Current Fan Speeds:", fan_speeds)
-
-                # Update UI
-                self.ui.update_ui()
+            snapshot = self.worker.snapshot
+            if snapshot is not None and snapshot is not self.last_snapshot:
+                self.last_snapshot = snapshot
+                started = time.perf_counter()
+                self.ui.update_ui(snapshot)
+                self.finish_frame(started)
         except Exception as e:
             print(f"Error in run_data_tracking: {e}")
 
+    """
+    Description: Refreshes the fleet overview whenever the fleet has been stepped since the last refresh.
+    """
+    def run_fleet_tracking(self):
+        try:
+            if self.fleet.step_count != self.last_snapshot:
+                self.last_snapshot = self.fleet.step_count
+                started = time.perf_counter()
+                self.ui.update_fleet_ui()
+                self.finish_frame(started)
+        except Exception as e:
+            print(f"Error in run_fleet_tracking: {e}")
+
+    """
+    Description: Records how long a UI refresh took, and lets the frame scheduler adapt the refresh interval to it and
+    to whether the worker had to skip control ticks. Frames the new interval drops against the frame budget are counted.
+    Parameters: started (float, perf_counter time the refresh started)
+    """
+    def finish_frame(self, started):
+        elapsed = time.perf_counter() - started
+        self.instrumentation.record("frame", elapsed)
+        dropped = self.scheduler.end_frame(elapsed, 0 if self.worker is None else self.worker.skipped_ticks)
+        if dropped:
+            self.instrumentation.increment("dropped frames", dropped)
+
+    """
+    Description: Stops the simulation worker thread, if it is running.
+    """
+    def stop_worker(self):
+        if self.worker is not None:
+            self.worker.stop()
+            self.worker = None
+        self.last_snapshot = None
+
+    """
+    Description: Points the telemetry server, if one is running, at the current backend.
+    """
+    def attach_server(self):
+        if self.telemetry_server is not None:
+            self.telemetry_server.attach(self.backend)
+
     """
     Description: Changes the state of the application.
     Parameters: new_state (str)
@@ -71,8 +151,20 @@ class MainApp:
                 print("Changing state to menu")
                 self.state = "menu"
                 self.ui.init_ui()
+                self.stop_worker()
+                if self.fleet is not None:
+                    self.fleet.close()
+                    self.fleet = None
+                if self.backend is not None:
+                    self.backend.stop_csv_logging()
+                    self.backend.stop_archive()
+                    trace = self.backend.stop_trace()
+                    if trace is not None:
+                        print(f"Trace recorded: {trace}")
                 self.backend = None
-                self.subsystems = []
+                self.attach_server()
+                self.subsystems = None
+                self.control_loop = None
             elif new_state == "data_tracking":
                 print("Changing state to data_tracking")
                 if self.backend is None:
@@ -81,30 +173,174 @@ class MainApp:
                 self.state = "data_tracking"
                 self.ui.setup_data_tracking_ui()
                 self.start_time = time.time()
+                self.stop_worker()
+                self.worker = SimulationWorker(self.control_loop)
+                self.worker.start()
                 print("UI setup for data tracking")
         except Exception as e:
             print(f"Error in change_state: {e}")
 
     """
-    Description: Initializes the application with the specified number of fans, subsystems, and maximum RPMs.
-    Parameters: num_fans (int), num_subsystems (int), max_rpms (list of floats
+    Description: Initializes the application with the specified number of fans, subsystems, and maximum RPMs, and with
+    a fleet of identical robots if more than one robot is requested.
+    Parameters: num_fans (int), num_subsystems (int), max_rpms (list of floats), num_robots (int)
     """
-    def initialize(self, num_fans, num_subsystems, max_rpms):
+    def initialize(self, num_fans, num_subsystems, max_rpms, num_robots=1):
+        if num_robots > 1:
+            self.initialize_fleet(num_robots, num_fans, num_subsystems, max_rpms)
+            return
         try:
-            self.backend = Backend(num_fans, num_subsystems, max_rpms)
-            self.subsystems = [SubsystemSimulation() for _ in range(num_subsystems)]
+            control_engine = None
+            if self.control_config is not None:
+                control_engine = ControlEngine.from_config(self.control_config, num_fans, num_subsystems)
+            alarm_engine = None
+            if self.alarm_config is not None:
+                alarm_engine = AlarmEngine.from_config(self.alarm_config, {"temp": num_subsystems, "speed": num_fans},
+                                                       {"speed": np.array(max_rpms)})
+            self.backend = Backend(num_fans, num_subsystems, max_rpms, control_engine=control_engine,
+                                   alarm_engine=alarm_engine)
+            seed = int(np.random.SeedSequence().entropy)  # Fresh for every run, and recorded with its trace
+            if self.thermal_config is not None:
+                self.subsystems = ThermalModel.from_config(self.thermal_config, num_subsystems, num_fans, seed=seed)
+            else:
+                self.subsystems = SubsystemBank(num_subsystems, seed=seed)
+            self.instrumentation = Instrumentation(dict(DEFAULT_BUDGETS, frame=self.scheduler.budget))
+            self.control_loop = ControlLoop(self.backend, self.subsystems, self.instrumentation)
+            if self.record_dir is not None:
+                os.makedirs(self.record_dir, exist_ok=True)
+                self.backend.start_trace(os.path.join(self.record_dir, time.strftime("trace_%Y%m%d-%H%M%S.bin")),
+                                         seed=seed)
             self.ui.backend = self.backend  # Update the UI's backend reference
+            self.attach_server()
             self.change_state("data_tracking")
             print("MainApp fully initialized for the data tracking state.")
         except Exception as e:
             print(f"Error in initialize: {e}")
 
+    """
+    Description: Changes the number of fans and subsystems and the maximum RPMs while data tracking is running. The
+    worker is paused for the change, the backend keeps its history and the data tracking screen only updates the rows
+    that changed, so nothing is rebuilt. Not available for a fleet or a replay, whose channels are fixed.
+    Parameters: num_fans (int), num_subsystems (int), max_rpms (list of floats)
+    """
+    def reconfigure(self, num_fans, num_subsystems, max_rpms):
+        if self.fleet is not None or self.subsystems is None:
+            print("Only a running simulation can be reconfigured.")
+            return
+        try:
+            started = time.perf_counter()
+            self.stop_worker()
+            try:
+                closed = self.control_loop.reconfigure(num_fans, num_subsystems, max_rpms)
+            finally:
+                self.worker = SimulationWorker(self.control_loop)
+                self.worker.start()
+            self.ui.update_data_tracking_ui()
+            elapsed = time.perf_counter() - started
+            self.instrumentation.record("reconfigure", elapsed)
+            for filename in closed:
+                print(f"Log file closed: {filename}")
+            print(f"Reconfigured to {num_fans} fans and {num_subsystems} subsystems in {elapsed * 1e3:.1f} ms")
+        except Exception as e:
+            print(f"Error in reconfigure: {e}")
+
+    """
+    Description: Starts simulating a fleet of identical robots on a pool of worker processes and shows the fleet
+    overview. The fleet is stepped by a SimulationWorker once per control interval.
+    Parameters: num_robots (int), num_fans (int), num_subsystems (int), max_rpms (list of floats)
+    """
+    def initialize_fleet(self, num_robots, num_fans, num_subsystems, max_rpms):
+        try:
+            self.fleet = FleetManager(num_robots, num_fans, num_subsystems, max_rpms,
+                                      control_config=self.control_config)
+            self.instrumentation = Instrumentation({"tick": SAMPLE_INTERVAL, "frame": self.scheduler.budget})
+            self.fleet.instrumentation = self.instrumentation
+            self.control_loop = self.fleet
+            self.backend = self.fleet.backend
+            self.ui.backend = self.backend  # Update the UI's backend reference
+            self.attach_server()
+            self.start_time = time.time()
+            self.stop_worker()
+            self.worker = SimulationWorker(self.fleet, tick_interval=SAMPLE_INTERVAL)
+            self.worker.start()
+            self.show_fleet()
+            print(f"MainApp fully initialized for a fleet of {num_robots} robots.")
+        except Exception as e:
+            print(f"Error in initialize_fleet: {e}")
+
+    """
+    Description: Shows the fleet overview.
+    """
+    def show_fleet(self):
+        self.state = "fleet"
+        self.last_snapshot = None
+        self.ui.setup_fleet_ui()
+
+    """
+    Description: Opens one robot of the fleet in the data tracking view.
+    Parameters: robot (int, 0-based)
+    """
+    def show_robot(self, robot):
+        try:
+            self.backend = self.fleet.select(robot)
+            self.ui.backend = self.backend  # Update the UI's backend reference
+            self.attach_server()
+            self.state = "data_tracking"
+            self.last_snapshot = None
+            self.ui.setup_data_tracking_ui()
+        except Exception as e:
+            print(f"Error in show_robot: {e}")
+
+    """
+    Description: Replays a recorded sensor trace in the data tracking state instead of running the simulation. The
+    worker thread drives the replay at the given multiple of real time.
+    Parameters: path (str), speed (float)
+    """
+    def start_replay(self, path, speed=1.0):
+        try:
+            self.instrumentation = Instrumentation(dict(DEFAULT_BUDGETS, frame=self.scheduler.budget))
+            self.control_loop = TraceReplayer(path, speed=speed, instrumentation=self.instrumentation)
+            self.backend = self.control_loop.backend
+            self.subsystems = None
+            self.ui.backend = self.backend  # Update the UI's backend reference
+            self.attach_server()
+            self.change_state("data_tracking")
+            print(f"Replaying {path} at {speed}x real time.")
+        except Exception as e:
+            print(f"Error in start_replay: {e}")
+
     """
     Description: Quits the application.
     """
     def quit_application(self):
+        self.stop_worker()
+        if self.fleet is not None:
+            self.fleet.close()
+            self.fleet = None
+        if self.backend is not None:
+            trace = self.backend.stop_trace()
+            if trace is not None:
+                print(f"Trace recorded: {trace}")
+        if self.telemetry_server is not None:
+            self.telemetry_server.stop()
+        if self.timing_json is not None and self.instrumentation is not None:
+            print(f"Timing statistics written: {self.instrumentation.dump_json(self.timing_json)}")
         QApplication.quit()
 
+    """
+    Description: Called once the event loop has shown the menu. Prints the startup report if requested and starts
+    warming up matplotlib in the background, so it is ready by the time the data tracking screen needs it.
+    Parameters: startup_timer (StartupTimer), report (bool), exit_after (bool, quit right away to measure the startup)
+    """
+    def startup_finished(self, startup_timer, report=False, exit_after=False):
+        startup_timer.mark("show menu")
+        if report:
+            print(startup_timer.format_report())
+        if exit_after:
+            self.quit_application()
+        else:
+            preload_matplotlib()
+
     """
     Description: Returns the elapsed time since the start of the data tracking state.
     Returns: str
@@ -117,6 +353,33 @@ class MainApp:
 
 # Main entry point of the application
 if __name__ == "__main__":
-    app = QApplication(sys.argv)
-    main_app = MainApp()
+    multiprocessing.freeze_support()  # Lets the fleet's worker processes start from the PyInstaller build
+    parser = argparse.ArgumentParser(description="Robotic Subsystem Fan Control and Data Log")
+    parser.add_argument("--control-config", default=None, help="JSON file with the fan control zones")
+    parser.add_argument("--thermal-config", default=None,
+                        help="JSON file with the fan-to-subsystem thermal coupling of the simulation")
+    parser.add_argument("--alarm-config", default=None, help="JSON file with the alarm rules")
+    parser.add_argument("--timing-json", default=None, help="write the timing statistics to this JSON file on quit")
+    parser.add_argument("--record-dir", default=None, help="record the sensor trace of every run to this directory")
+    parser.add_argument("--replay", default=None, help="replay this recorded sensor trace instead of simulating")
+    parser.add_argument("--replay-speed", type=float, default=1.0, help="multiple of real time to replay at")
+    parser.add_argument("--serve", type=int, default=None, metavar="PORT",
+                        help="serve the live telemetry over HTTP/WebSocket on this localhost port")
+    parser.add_argument("--frame-budget", type=float, default=UI_REFRESH_INTERVAL, metavar="MS",
+                        help="target interval between UI refreshes (in milliseconds); it is stretched while rendering "
+                             "is slow or the control loop falls behind, and refreshes stop while the window is hidden")
+    parser.add_argument("--startup-report", action="store_true", help="print how long each phase of the startup took")
+    parser.add_argument("--exit-after-startup", action="store_true",
+                        help="quit as soon as the menu is shown (used to measure the startup time)")
+    args, qt_args = parser.parse_known_args()
+    startup_timer.mark("parse arguments")
+    app = QApplication(sys.argv[:1] + qt_args)
+    startup_timer.mark("create QApplication")
+    main_app = MainApp(control_config=args.control_config, timing_json=args.timing_json, record_dir=args.record_dir,
+                       thermal_config=args.thermal_config, alarm_config=args.alarm_config, serve_port=args.serve,
+                       frame_budget=args.frame_budget / 1000)
+    startup_timer.mark("build menu")
+    if args.replay is not None:
+        main_app.start_replay(args.replay, args.replay_speed)
+    QTimer.singleShot(0, lambda: main_app.startup_finished(startup_timer, args.startup_report, args.exit_after_startup))
     sys.exit(app.exec())
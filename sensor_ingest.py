@@ -0,0 +1,440 @@
+import argparse
+import asyncio
+import socket
+import struct
+import sys
+import time
+import numpy as np
+from backend import Backend
+from control_engine import ControlEngine
+from control_loop import TICK_INTERVAL, CONTROL_DIVIDER
+from subsystem_simulation import SubsystemBank
+
+# Frame header: magic, source id, number of float32 values that follow, sequence number, sender timestamp
+HEADER = struct.Struct("<4sHHId")
+TEMPERATURE_MAGIC = b"FCT1"
+FAN_MAGIC = b"FCF1"
+# Largest number of values in one frame (a frame must fit in a single UDP datagram)
+MAX_FRAME_VALUES = (65507 - HEADER.size) // 4
+DEFAULT_PORT = 9750
+
+
+"""
+Description: Builds a control engine with one zone per source, so each robot's fans only respond to its own subsystems.
+Parameters: sources (list of (num_subsystems, num_fans) tuples)
+Returns: ControlEngine
+"""
+def per_source_control_engine(sources):
+    zones = []
+    subsystem_offset = fan_offset = 0
+    for num_subsystems, num_fans in sources:
+        zones.append({"subsystems": list(range(subsystem_offset, subsystem_offset + num_subsystems)),
+                      "fans": list(range(fan_offset, fan_offset + num_fans))})
+        subsystem_offset += num_subsystems
+        fan_offset += num_fans
+    return ControlEngine(fan_offset, subsystem_offset, zones)
+
+
+"""Description: Preallocated frame buffer. The header is packed in place and the values are written through a NumPy
+view of the same memory, so encoding a frame does not allocate."""
+class FrameBuffer:
+    def __init__(self, magic, source_id, count):
+        self.magic = magic
+        self.source_id = source_id
+        self.count = count
+        self.sequence = 0
+        self.data = bytearray(HEADER.size + 4 * count)
+        self.values = np.frombuffer(self.data, dtype="<f4", offset=HEADER.size)
+
+    """
+    Description: Encodes the given values into the buffer.
+    Parameters: values (numpy array), timestamp (float)
+    Returns: bytearray (the encoded frame)
+    """
+    def encode(self, values, timestamp):
+        HEADER.pack_into(self.data, 0, self.magic, self.source_id, self.count, self.sequence, timestamp)
+        self.values[:] = values
+        self.sequence = (self.sequence + 1) & 0xFFFFFFFF
+        return self.data
+
+
+"""Description: TCP protocol of the ingestion server. It receives into a preallocated buffer (asyncio.BufferedProtocol)
+and hands every complete frame to the server. A header with the wrong magic or more values than a frame can hold means
+the stream cannot be followed any further, so the frame is counted as rejected and the connection is closed."""
+class _IngestStreamProtocol(asyncio.BufferedProtocol):
+    def __init__(self, server):
+        self.server = server
+        self.buffer = bytearray(2 * (HEADER.size + 4 * MAX_FRAME_VALUES))
+        self.view = memoryview(self.buffer)
+        self.filled = 0
+        self.transport = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def connection_lost(self, exc):
+        self.server.forget_peer(self.transport)
+
+    def get_buffer(self, sizehint):
+        return self.view[self.filled:]
+
+    def buffer_updated(self, nbytes):
+        self.filled += nbytes
+        start = 0
+        while self.filled - start >= HEADER.size:
+            magic, _, count, _, _ = HEADER.unpack_from(self.buffer, start)
+            if magic != TEMPERATURE_MAGIC or count > MAX_FRAME_VALUES:
+                self.server.frames_rejected += 1
+                self.filled = 0
+                self.transport.close()
+                return
+            size = HEADER.size + 4 * count
+            if self.filled - start < size:
+                break
+            self.server.handle_frame(self.buffer, start, size, self.transport)
+            start += size
+        if start:
+            # Move the incomplete frame, if any, back to the start of the buffer
+            self.buffer[:self.filled - start] = self.buffer[start:self.filled]
+            self.filled -= start
+
+
+"""Description: asyncio ingestion server standing in for the telemetry link to real robots. Each source (robot) owns a
+contiguous range of the backend's subsystems and fans and sends batched binary temperature frames over UDP or TCP. Frames
+are decoded straight from a preallocated receive buffer into a staging array, coalesced into the backend once per control
+tick, and the resulting fan speeds are sent back to every source as a fan command frame."""
+class SensorIngestServer:
+    def __init__(self, sources, max_rpms, host="127.0.0.1", port=DEFAULT_PORT, protocol="udp",
+                 tick_interval=TICK_INTERVAL * CONTROL_DIVIDER):
+        self.sources = sources
+        self.host = host
+        self.port = port
+        self.protocol = protocol
+        self.tick_interval = tick_interval
+        self.subsystem_offsets = np.cumsum([0] + [num_subsystems for num_subsystems, _ in sources])
+        self.fan_offsets = np.cumsum([0] + [num_fans for _, num_fans in sources])
+        num_subsystems = int(self.subsystem_offsets[-1])
+        num_fans = int(self.fan_offsets[-1])
+        self.backend = Backend(num_fans, num_subsystems, max_rpms, control_engine=per_source_control_engine(sources))
+        self.staging = np.full(num_subsystems, 20.0)
+        self.frames_received = 0
+        self.frames_rejected = 0
+        self.peers = [None] * len(sources)
+        self.fan_frames = [FrameBuffer(FAN_MAGIC, source, num_fans) for source, (_, num_fans) in enumerate(sources)]
+        self._receive_buffer = bytearray(HEADER.size + 4 * MAX_FRAME_VALUES)
+        self._socket = None
+        self._server = None
+        self._tasks = []
+
+    """
+    Description: Decodes one temperature frame into the staging array and remembers where to send the source's fan
+    commands. A frame whose size does not match its header, e.g. a short datagram, is rejected, so values left in the
+    buffer by an earlier frame are never taken as new readings.
+    Parameters: buffer (bytearray), offset (int, start of the frame in the buffer), nbytes (int, size of the frame),
+    peer (UDP address or TCP transport)
+    """
+    def handle_frame(self, buffer, offset, nbytes, peer):
+        if nbytes < HEADER.size:
+            self.frames_rejected += 1
+            return
+        magic, source, count, _, _ = HEADER.unpack_from(buffer, offset)
+        if (magic != TEMPERATURE_MAGIC or nbytes != HEADER.size + 4 * count or source >= len(self.sources)
+                or count != self.sources[source][0]):
+            self.frames_rejected += 1
+            return
+        start = self.subsystem_offsets[source]
+        self.staging[start:start + count] = np.frombuffer(buffer, dtype="<f4", count=count, offset=offset + HEADER.size)
+        if self.peers[source] != peer:
+            self.peers[source] = peer
+        self.frames_received += 1
+
+    """
+    Description: Forgets the TCP connection of any source that was using it.
+    Parameters: transport (asyncio transport)
+    """
+    def forget_peer(self, transport):
+        self.peers = [None if peer is transport else peer for peer in self.peers]
+
+    """
+    Description: Starts listening and the control tick.
+    """
+    async def start(self):
+        loop = asyncio.get_running_loop()
+        if self.protocol == "udp":
+            self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            self._socket.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1 << 22)
+            self._socket.bind((self.host, self.port))
+            self._socket.setblocking(False)
+            self.port = self._socket.getsockname()[1]
+            self._tasks.append(loop.create_task(self._receive_udp()))
+        else:
+            self._server = await loop.create_server(lambda: _IngestStreamProtocol(self), self.host, self.port)
+            self.port = self._server.sockets[0].getsockname()[1]
+        self._tasks.append(loop.create_task(self._tick()))
+
+    """
+    Description: Stops the server.
+    """
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        if self._socket is not None:
+            self._socket.close()
+
+    """
+    Description: Receives UDP frames. After each awaited datagram, the socket is drained without going back through the
+    event loop, which keeps the per-frame overhead low under heavy load.
+    """
+    async def _receive_udp(self):
+        loop = asyncio.get_running_loop()
+        buffer = self._receive_buffer
+        while True:
+            nbytes, address = await loop.sock_recvfrom_into(self._socket, buffer)
+            self.handle_frame(buffer, 0, nbytes, address)
+            while True:
+                try:
+                    nbytes, address = self._socket.recvfrom_into(buffer)
+                except (BlockingIOError, InterruptedError):
+                    break
+                self.handle_frame(buffer, 0, nbytes, address)
+
+    """
+    Description: Runs one control update per tick on absolute deadlines and sends the fan commands back.
+    """
+    async def _tick(self):
+        next_tick = time.perf_counter() + self.tick_interval
+        while True:
+            await asyncio.sleep(max(next_tick - time.perf_counter(), 0))
+            next_tick += self.tick_interval
+            self.backend.sample_temperatures(self.staging)
+            self.backend.update_fan_speeds()
+            self.send_fan_commands()
+
+    """
+    Description: Sends every source that has reported in its slice of the current fan speeds.
+    """
+    def send_fan_commands(self):
+        timestamp = time.time()
+        for source, peer in enumerate(self.peers):
+            if peer is None:
+                continue
+            start = self.fan_offsets[source]
+            frame = self.fan_frames[source]
+            data = frame.encode(self.backend.fan_speeds[start:start + frame.count], timestamp)
+            if self.protocol == "udp":
+                self._socket.sendto(data, peer)
+            else:
+                peer.write(data)
+
+
+"""Description: UDP datagram protocol of the sensor emulator; applies the fan commands it receives to the matching
+robot's simulation."""
+class _EmulatorDatagramProtocol(asyncio.DatagramProtocol):
+    def __init__(self, emulator):
+        self.emulator = emulator
+
+    def datagram_received(self, data, addr):
+        self.emulator.handle_fan_frame(data, 0, len(data))
+
+
+"""Description: Local sensor emulator built on the existing simulation. It simulates the subsystems of every source in one
+SubsystemBank, each source cooled by the mean speed of its own fans, sends each source's temperatures as a binary frame
+`frame_rate` times per second, and applies the fan commands sent back by the ingestion server, so the whole network path
+can be exercised on localhost."""
+class SensorEmulator:
+    def __init__(self, sources, host="127.0.0.1", port=DEFAULT_PORT, protocol="udp", frame_rate=10, seed=None):
+        self.sources = sources
+        self.host = host
+        self.port = port
+        self.protocol = protocol
+        self.frame_rate = frame_rate
+        self.subsystem_offsets = np.cumsum([0] + [num_subsystems for num_subsystems, _ in sources])
+        self.fan_offsets = np.cumsum([0] + [num_fans for _, num_fans in sources])
+        self.bank = SubsystemBank(int(self.subsystem_offsets[-1]), seed=seed)
+        self.fan_speeds = np.zeros(int(self.fan_offsets[-1]))
+        self.frames = [FrameBuffer(TEMPERATURE_MAGIC, source, num_subsystems)
+                       for source, (num_subsystems, _) in enumerate(sources)]
+        self.frames_sent = 0
+        self.fan_frames_received = 0
+        self.fan_frames_rejected = 0
+        self._fans_updated = False
+        self._transport = None
+        self._send = None
+        self._tasks = []
+
+    """
+    Description: Stores the fan speeds of a fan command frame; they are applied to the simulation on the next tick.
+    Frames that are truncated, have trailing bytes, or do not match a source are counted and dropped.
+    Parameters: buffer (bytes-like), offset (int), nbytes (int, size of the frame)
+    """
+    def handle_fan_frame(self, buffer, offset, nbytes):
+        if nbytes < HEADER.size:
+            self.fan_frames_rejected += 1
+            return
+        magic, source, count, _, _ = HEADER.unpack_from(buffer, offset)
+        if (magic != FAN_MAGIC or nbytes != HEADER.size + 4 * count or source >= len(self.sources)
+                or count != self.sources[source][1]):
+            self.fan_frames_rejected += 1
+            return
+        start = self.fan_offsets[source]
+        self.fan_speeds[start:start + count] = np.frombuffer(buffer, dtype="<f4", count=count,
+                                                             offset=offset + HEADER.size)
+        self._fans_updated = True
+        self.fan_frames_received += 1
+
+    """
+    Description: Connects to the ingestion server and starts sending frames.
+    """
+    async def start(self):
+        loop = asyncio.get_running_loop()
+        if self.protocol == "udp":
+            self._transport, _ = await loop.create_datagram_endpoint(lambda: _EmulatorDatagramProtocol(self),
+                                                                     remote_addr=(self.host, self.port))
+            self._transport.get_extra_info("socket").setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1 << 22)
+            self._send = self._transport.sendto
+        else:
+            reader, writer = await asyncio.open_connection(self.host, self.port)
+            self._transport = writer.transport
+            self._send = writer.write
+            self._tasks.append(loop.create_task(self._receive_stream(reader)))
+        self._tasks.append(loop.create_task(self._run()))
+
+    """
+    Description: Stops sending frames and closes the connection.
+    """
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self._transport is not None:
+            self._transport.close()
+
+    """
+    Description: Reads fan command frames from a TCP connection. A header that cannot start a fan frame leaves the rest
+    of the stream unframeable, so the connection is closed without reading its payload.
+    Parameters: reader (asyncio.StreamReader)
+    """
+    async def _receive_stream(self, reader):
+        while True:
+            try:
+                header = await reader.readexactly(HEADER.size)
+                magic, _, count, _, _ = HEADER.unpack(header)
+                if magic != FAN_MAGIC or count > MAX_FRAME_VALUES:
+                    self.fan_frames_rejected += 1
+                    self._transport.close()
+                    return
+                payload = await reader.readexactly(4 * count)
+            except (asyncio.IncompleteReadError, ConnectionError):
+                return
+            self.handle_fan_frame(header + payload, 0, HEADER.size + 4 * count)
+
+    """
+    Description: Steps the simulation every TICK_INTERVAL and sends every source's temperatures at the frame rate.
+    """
+    async def _run(self):
+        ticks_per_frame = max(int(round(1 / (self.frame_rate * TICK_INTERVAL))), 1)
+        subsystems_per_source = np.diff(self.subsystem_offsets)
+        fans_per_source = np.maximum(np.diff(self.fan_offsets), 1)
+        tick = 0
+        next_tick = time.perf_counter()
+        while True:
+            if self._fans_updated:
+                self._fans_updated = False
+                mean_speeds = np.add.reduceat(self.fan_speeds, self.fan_offsets[:-1]) / fans_per_source
+                self.bank.set_cooling(np.repeat(mean_speeds / 2000 * 0.5, subsystems_per_source))
+            temperatures = self.bank.output_temperatures()
+            tick += 1
+            if tick % ticks_per_frame == 0:
+                timestamp = time.time()
+                for source, frame in enumerate(self.frames):
+                    start = self.subsystem_offsets[source]
+                    self._send(frame.encode(temperatures[start:start + frame.count], timestamp))
+                self.frames_sent += len(self.frames)
+            next_tick += TICK_INTERVAL
+            await asyncio.sleep(max(next_tick - time.perf_counter(), 0))
+
+
+"""
+Description: Runs an ingestion server and a sensor emulator together on localhost and reports the frame throughput.
+Parameters: sources (list of (num_subsystems, num_fans) tuples), max_rpms (list of floats), protocol (str),
+frame_rate (float), duration (float, seconds)
+Returns: dict with the frame counts and rates
+"""
+async def self_test(sources, max_rpms, protocol="udp", frame_rate=10, duration=5.0):
+    server = SensorIngestServer(sources, max_rpms, port=0, protocol=protocol)
+    await server.start()
+    emulator = SensorEmulator(sources, port=server.port, protocol=protocol, frame_rate=frame_rate, seed=0)
+    await emulator.start()
+    await asyncio.sleep(duration)
+    await emulator.stop()
+    await asyncio.sleep(0.2)
+    await server.stop()
+    return {
+        "frames_sent": emulator.frames_sent,
+        "frames_received": server.frames_received,
+        "frames_rejected": server.frames_rejected,
+        "fan_frames_received": emulator.fan_frames_received,
+        "fan_frames_rejected": emulator.fan_frames_rejected,
+        "frames_per_second": server.frames_received / duration,
+        "max_temperature": float(np.max(server.backend.subsystem_temperatures)),
+    }
+
+
+"""
+Description: Entry point of the ingestion tools: an ingestion server, a sensor emulator, or both in one process.
+Parameters: argv (list of str or None)
+Returns: int (exit code)
+"""
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Receive robot temperature frames over the network, or emulate them.")
+    parser.add_argument("command", choices=["serve", "emulate", "selftest"])
+    parser.add_argument("--sources", type=int, default=10, help="number of robots")
+    parser.add_argument("--subsystems", type=int, default=6, help="subsystems per robot")
+    parser.add_argument("--fans", type=int, default=5, help="fans per robot")
+    parser.add_argument("--max-rpm", type=int, default=2000, help="maximum RPM of every fan")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--protocol", choices=["udp", "tcp"], default="udp")
+    parser.add_argument("--rate", type=float, default=10, help="frames per second sent by each emulated robot")
+    parser.add_argument("--duration", type=float, default=10, help="seconds to run for")
+    parser.add_argument("--record", default=None, help="record the received sensor trace to this file (serve only)")
+    args = parser.parse_args(argv)
+
+    sources = [(args.subsystems, args.fans)] * args.sources
+    max_rpms = [args.max_rpm] * (args.fans * args.sources)
+
+    async def run():
+        if args.command == "selftest":
+            result = await self_test(sources, max_rpms, args.protocol, args.rate, args.duration)
+            for key, value in result.items():
+                print(f"{key}: {value:.1f}" if isinstance(value, float) else f"{key}: {value}")
+            return
+        if args.command == "serve":
+            endpoint = SensorIngestServer(sources, max_rpms, args.host, args.port, args.protocol)
+        else:
+            endpoint = SensorEmulator(sources, args.host, args.port, args.protocol, args.rate)
+        if args.command == "serve" and args.record is not None:
+            endpoint.backend.start_trace(args.record)
+        await endpoint.start()
+        await asyncio.sleep(args.duration)
+        await endpoint.stop()
+        if args.command == "serve":
+            print(f"Received {endpoint.frames_received} frames ({endpoint.frames_rejected} rejected)")
+            if args.record is not None:
+                print(f"Trace recorded: {endpoint.backend.stop_trace()}")
+        else:
+            print(f"Sent {endpoint.frames_sent} frames, received {endpoint.fan_frames_received} fan commands "
+                  f"({endpoint.fan_frames_rejected} rejected)")
+
+    asyncio.run(run())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
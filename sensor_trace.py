@@ -0,0 +1,127 @@
+import json
+import os
+import queue
+import struct
+import threading
+import numpy as np
+
+# File header: magic, format version and length of the JSON metadata that follows it
+TRACE_HEADER = struct.Struct("<4sII")
+TRACE_MAGIC = b"FCTR"
+TRACE_VERSION = 1
+
+
+"""
+Description: Returns the record layout of a trace: the elapsed time and the exact temperatures the backend sampled,
+plus the fan speeds it computed from them (float32, kept as a reference to compare replays against).
+Parameters: num_subsystems (int), num_fans (int)
+Returns: numpy dtype
+"""
+def record_dtype(num_subsystems, num_fans):
+    return np.dtype([("time", "<f8"), ("temp", "<f8", (num_subsystems,)), ("speed", "<f4", (num_fans,))])
+
+
+"""
+Description: Returns the control configuration of a control engine in the format ControlEngine.from_config reads.
+Parameters: control_engine (ControlEngine)
+Returns: dict
+"""
+def control_config(control_engine):
+    return json.loads(json.dumps({"zones": control_engine.zones, "unassigned_output": control_engine.unassigned_output},
+                                 default=lambda value: value.tolist()))
+
+
+"""Description: Records every sample the backend takes into a compact binary trace. It is a backend log sink, so it
+sees exactly the temperatures each control update used, with the control update's timestamp. The file starts with a
+header holding JSON metadata (channel counts, maximum RPMs, control configuration and the simulation seed when there is
+one), followed by fixed-size records. Records are collected in memory and written in blocks by a background thread, so
+append() never waits on the disk."""
+class TraceRecorder:
+    def __init__(self, path, num_subsystems, num_fans, metadata, block_rows=256):
+        self.path = path
+        self.dtype = record_dtype(num_subsystems, num_fans)
+        self.block_rows = block_rows
+        self.rows_written = 0
+        meta = json.dumps(dict(metadata, num_subsystems=num_subsystems, num_fans=num_fans)).encode()
+        meta += b" " * (-(TRACE_HEADER.size + len(meta)) % 8)  # Keep the records 8-byte aligned
+        self._file = open(path, "xb")
+        self._file.write(TRACE_HEADER.pack(TRACE_MAGIC, TRACE_VERSION, len(meta)) + meta)
+        self._queue = queue.SimpleQueue()
+        self._block = np.empty(block_rows, dtype=self.dtype)
+        self._rows = 0
+        self._thread = threading.Thread(target=self._run, name="TraceRecorder", daemon=True)
+        self._thread.start()
+
+    """
+    Description: Appends one sample to the trace.
+    Parameters: elapsed_time (float), temperatures (numpy array), fan_speeds (numpy array)
+    """
+    def append(self, elapsed_time, temperatures, fan_speeds):
+        record = self._block[self._rows]
+        record["time"] = elapsed_time
+        record["temp"] = temperatures
+        record["speed"] = fan_speeds
+        self._rows += 1
+        if self._rows == self.block_rows:
+            self._queue.put((self._block, self._rows))
+            self._block = np.empty(self.block_rows, dtype=self.dtype)
+            self._rows = 0
+
+    """
+    Description: Writes the remaining samples, waits for them to reach the disk and closes the file.
+    """
+    def close(self):
+        if self._rows:
+            self._queue.put((self._block, self._rows))
+            self._rows = 0
+        self._queue.put(None)
+        self._thread.join()
+        self._file.close()
+
+    """
+    Description: Body of the writer thread.
+    """
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            block, rows = item
+            block[:rows].tofile(self._file)
+            self._file.flush()
+            self.rows_written += rows
+
+
+"""Description: Reads a trace through numpy.memmap. A trace cut short by a crash is read up to its last complete
+record."""
+class Trace:
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as file:
+            magic, version, meta_length = TRACE_HEADER.unpack(file.read(TRACE_HEADER.size))
+            if magic != TRACE_MAGIC:
+                raise ValueError(f"{path} is not a trace file.")
+            if version != TRACE_VERSION:
+                raise ValueError(f"Unsupported trace version: {version}.")
+            self.metadata = json.loads(file.read(meta_length))
+        self.num_subsystems = self.metadata["num_subsystems"]
+        self.num_fans = self.metadata["num_fans"]
+        self.dtype = record_dtype(self.num_subsystems, self.num_fans)
+        offset = TRACE_HEADER.size + meta_length
+        rows = (os.path.getsize(path) - offset) // self.dtype.itemsize
+        self.records = np.memmap(path, dtype=self.dtype, mode="r", offset=offset, shape=(rows,)) if rows else \
+            np.empty(0, dtype=self.dtype)
+
+    """
+    Description: Returns the number of samples in the trace.
+    Returns: int
+    """
+    def __len__(self):
+        return len(self.records)
+
+    """
+    Description: Returns the simulated time covered by the trace.
+    Returns: float (seconds)
+    """
+    def duration(self):
+        return float(self.records["time"][-1] - self.records["time"][0]) if len(self.records) else 0.0
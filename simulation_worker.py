@@ -0,0 +1,83 @@
+import threading
+import time
+from collections import namedtuple
+from control_loop import TICK_INTERVAL
+
+# Most ticks the worker runs back to back to catch up after a stall; beyond that the missed ticks are skipped
+MAX_CATCH_UP_TICKS = 10
+
+# Immutable view of the backend state after a control update. The arrays are read-only copies, so the UI can hold on to
+# a snapshot for as long as it likes while the worker keeps running.
+Snapshot = namedtuple("Snapshot", ["elapsed_time", "temperatures", "fan_speeds", "sample_count", "tick_count"])
+
+
+"""
+Description: Returns a read-only copy of an array, for use in a snapshot.
+Parameters: array (numpy array)
+Returns: numpy array
+"""
+def _frozen(array):
+    array = array.copy()
+    array.flags.writeable = False
+    return array
+
+
+"""Description: Runs the control loop on its own thread with an absolute-deadline scheduler, so control timing does not
+depend on how long the GUI takes to repaint. After every control update it publishes a new Snapshot by swapping a single
+reference, which the GUI picks up at its own refresh rate without any locking. The snapshot only carries the current
+values: the telemetry history, its decimation pyramid, the channel statistics and the alarm state are updated in place,
+under the backend's lock, so the GUI holds that lock while it reads them and copies out what it needs."""
+class SimulationWorker(threading.Thread):
+    def __init__(self, control_loop, tick_interval=TICK_INTERVAL):
+        super().__init__(name="SimulationWorker", daemon=True)
+        self.control_loop = control_loop
+        self.tick_interval = tick_interval
+        self.snapshot = None
+        self.skipped_ticks = 0
+        self._stop_event = threading.Event()
+
+    """
+    Description: Body of the worker thread. Ticks are scheduled on absolute deadlines so timing errors do not accumulate;
+    after a stall the worker catches up on at most MAX_CATCH_UP_TICKS ticks and skips the rest. With instrumentation,
+    each tick's duration and its lateness against its deadline (the tick jitter) are recorded.
+    """
+    def run(self):
+        next_tick = time.perf_counter()
+        while not self._stop_event.is_set():
+            delay = next_tick - time.perf_counter()
+            if delay > 0 and self._stop_event.wait(delay):
+                break
+            started = time.perf_counter()
+            try:
+                if self.control_loop.tick():
+                    self.publish()
+            except Exception as e:
+                print(f"Error in simulation worker: {e}")
+            instrumentation = self.control_loop.instrumentation
+            if instrumentation is not None:
+                instrumentation.record("tick", time.perf_counter() - started)
+                instrumentation.record("tick jitter", max(started - next_tick, 0.0))
+            next_tick += self.tick_interval
+            behind = int((time.perf_counter() - next_tick) / self.tick_interval)
+            if behind > MAX_CATCH_UP_TICKS:
+                self.skipped_ticks += behind
+                next_tick += behind * self.tick_interval
+                if instrumentation is not None:
+                    instrumentation.increment("skipped ticks", behind)
+
+    """
+    Description: Publishes an immutable snapshot of the backend's current state.
+    """
+    def publish(self):
+        backend = self.control_loop.backend
+        temperatures, fan_speeds = backend.get_current_data()
+        self.snapshot = Snapshot(backend.clock() - backend.start_time, _frozen(temperatures), _frozen(fan_speeds),
+                                 backend.telemetry.count, self.control_loop.tick_count)
+
+    """
+    Description: Stops the worker thread and waits for it to finish its current tick.
+    """
+    def stop(self):
+        self._stop_event.set()
+        if self.is_alive():
+            self.join()
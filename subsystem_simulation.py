@@ -34,3 +34,99 @@ class SubsystemSimulation:
     """
     def get_temperature(self):
         return self.temperature
+
+
+"""Description: Array-backed bank of simulated subsystems. It holds every subsystem's temperature in one NumPy array and
+steps all of them in a single vectorized call, using the same model as SubsystemSimulation: cooling proportional to the
+mean fan speed, a 20% chance per step of a 1-3 °C heat spike, and a 20 °C floor. A seeded numpy.random.Generator makes
+runs reproducible. With `groups` > 1 the bank holds several robots of equally many subsystems, each cooled by the mean
+speed of its own, equally large share of the fans. With `shared_noise`, every group starts from the same temperatures
+and gets the same heat spikes, drawn exactly as a single-group bank with the same seed would draw them, so groups only
+differ by how their fans cool them (e.g. when comparing fan curves)."""
+class SubsystemBank:
+    def __init__(self, num_subsystems, seed=None, groups=1, shared_noise=False):
+        if num_subsystems % groups:
+            raise ValueError("Number of subsystems must be a multiple of the number of groups.")
+        self.num_subsystems = num_subsystems
+        self.groups = groups
+        self.shared_noise = shared_noise
+        self.seed = seed
+        self.rng = np.random.default_rng(seed)
+        self.temperatures = self._tile(self.rng.uniform(25, 45, self._noise_size()))
+        self.fan_speeds = None
+        self._cooling = None
+        self.spike_probability = 0.2
+        self.spike_range = (1, 3)
+        self.min_temperature = 20
+
+    """
+    Description: Sets the fan speeds for all subsystems. The mean fan speed (per group) is computed once here instead of
+    once per subsystem per step.
+    Parameters: fan_speeds (list of floats)
+    """
+    def set_fan_speeds(self, fan_speeds):
+        self.fan_speeds = fan_speeds
+        if self.groups == 1:
+            self.set_cooling(np.mean(fan_speeds) / 2000 * 0.5)
+        else:
+            group_means = np.reshape(fan_speeds, (self.groups, -1)).mean(axis=1)
+            self.set_cooling(np.repeat(group_means / 2000 * 0.5, self.num_subsystems // self.groups))
+
+    """
+    Description: Changes the number of subsystems in place. The subsystems that remain keep their temperatures, added
+    ones start at a random temperature like at construction, and the cooling is recomputed on the next call to
+    set_fan_speeds.
+    Parameters: num_subsystems (int), num_fans (int or None, unused by this model)
+    """
+    def resize(self, num_subsystems, num_fans=None):
+        if num_subsystems % self.groups:
+            raise ValueError("Number of subsystems must be a multiple of the number of groups.")
+        added = self.rng.uniform(25, 45, max(num_subsystems - self.num_subsystems, 0))
+        self.temperatures = np.concatenate([self.temperatures[:num_subsystems], added])
+        self.num_subsystems = num_subsystems
+        self.fan_speeds = None
+        self._cooling = None
+
+    """
+    Description: Returns how many subsystems get their own random draws: one group's worth with shared noise.
+    Returns: int
+    """
+    def _noise_size(self):
+        return self.num_subsystems // self.groups if self.shared_noise else self.num_subsystems
+
+    """
+    Description: Repeats one group's random draws for every group when the noise is shared.
+    Parameters: values (numpy array)
+    Returns: numpy array
+    """
+    def _tile(self, values):
+        return np.tile(values, self.groups) if self.shared_noise else values
+
+    """
+    Description: Sets the temperature drop per step directly, either one value for every subsystem or one value per
+    subsystem (e.g. when the bank simulates several robots, each cooled by its own fans).
+    Parameters: cooling (float or numpy array)
+    """
+    def set_cooling(self, cooling):
+        self._cooling = cooling
+
+    """
+    Description: Advances every subsystem by one simulation step based on the current fan speeds.
+    Returns: numpy array of floats
+    """
+    def output_temperatures(self):
+        if self._cooling is None:
+            return self.temperatures
+        self.temperatures -= self._cooling
+        spikes = self.rng.random(self._noise_size()) < self.spike_probability
+        heat = self.rng.uniform(*self.spike_range, np.count_nonzero(spikes))
+        self.temperatures[self._tile(spikes)] += self._tile(heat)
+        np.maximum(self.temperatures, self.min_temperature, out=self.temperatures)
+        return self.temperatures
+
+    """
+    Description: Returns the current temperatures of the subsystems.
+    Returns: numpy array of floats
+    """
+    def get_temperatures(self):
+        return self.temperatures
@@ -0,0 +1,278 @@
+import argparse
+import itertools
+import multiprocessing
+import os
+import sys
+import time
+import numpy as np
+from backend import Backend
+from control_engine import ControlEngine, DEFAULT_CURVE
+from control_loop import ControlLoop, TICK_INTERVAL
+from headless import SimulatedClock
+from subsystem_simulation import SubsystemBank
+
+# Swept parameters of a configuration and their defaults (the built-in 25-75 °C, 20-100% curve): the curve's lower and
+# upper breakpoints (in °C), the fan output at and below the lower one and at and above the upper one (fractions of the
+# maximum RPM), the hysteresis band (in °C), the number of fans and their maximum RPM
+PARAMETERS = {
+    "low": DEFAULT_CURVE[0][0],
+    "high": DEFAULT_CURVE[-1][0],
+    "min_output": DEFAULT_CURVE[0][1],
+    "max_output": DEFAULT_CURVE[-1][1],
+    "hysteresis": 0.0,
+    "fans": 5,
+    "max_rpm": 2000,
+}
+# Maximum number of configurations simulated together by one vectorized backend/simulation batch
+BATCH_SIZE = 256
+# History kept by each batch's backend (in seconds); the sweep only needs the metrics, not the telemetry
+BATCH_RETENTION = 1
+
+
+"""
+Description: Returns every combination of the given parameter values. Parameters that are not given keep their default,
+and combinations whose curve breakpoints are not increasing are left out.
+Parameters: values (keyword lists of values, one per swept parameter)
+Returns: list of dict (one configuration per combination)
+"""
+def grid_configs(**values):
+    names = list(PARAMETERS)
+    lists = [values.get(name) or [PARAMETERS[name]] for name in names]
+    configs = [dict(zip(names, combination)) for combination in itertools.product(*lists)]
+    return [config for config in configs if config["low"] < config["high"]]
+
+
+"""
+Description: Draws configurations uniformly at random between the smallest and largest of the given values of each
+parameter (the fan count is drawn as an integer). Parameters that are not given keep their default.
+Parameters: count (int), seed (int or None), values (keyword lists of values, one per swept parameter)
+Returns: list of dict
+"""
+def random_configs(count, seed=None, **values):
+    rng = np.random.default_rng(seed)
+    columns = {}
+    for name, default in PARAMETERS.items():
+        given = values.get(name) or [default]
+        if name == "fans":
+            columns[name] = rng.integers(min(given), max(given) + 1, count)
+        else:
+            columns[name] = rng.uniform(min(given), max(given), count)
+    configs = [{name: column[index].item() for name, column in columns.items()} for index in range(count)]
+    return [config for config in configs if config["low"] < config["high"]]
+
+
+"""Description: Backend sink that accumulates the metrics of every configuration of a batch from each logged sample:
+the peak and mean subsystem temperature, the fan RPM-hours, and the time any subsystem spent above the limit."""
+class SweepMetrics:
+    def __init__(self, configs, num_fans, num_subsystems, limit):
+        self.num_fans = num_fans
+        self.num_subsystems = num_subsystems
+        self.limit = limit
+        self.peak_temperature = np.full(configs, -np.inf)
+        self.temperature_sum = np.zeros(configs)
+        self.rpm_seconds = np.zeros(configs)
+        self.time_over_limit = np.zeros(configs)
+        self.samples = 0
+        self.last_time = 0.0
+
+    """
+    Description: Adds one logged sample. Fan speeds count from the previous sample until this one.
+    Parameters: elapsed_time (float), temperatures (numpy array), fan_speeds (numpy array)
+    """
+    def append(self, elapsed_time, temperatures, fan_speeds):
+        dt = elapsed_time - self.last_time
+        self.last_time = elapsed_time
+        temperatures = temperatures.reshape(-1, self.num_subsystems)
+        hottest = temperatures.max(axis=1)
+        np.maximum(self.peak_temperature, hottest, out=self.peak_temperature)
+        self.temperature_sum += temperatures.mean(axis=1)
+        self.rpm_seconds += fan_speeds.reshape(-1, self.num_fans).sum(axis=1) * dt
+        self.time_over_limit += (hottest > self.limit) * dt
+        self.samples += 1
+
+
+"""
+Description: Simulates one batch of configurations that share a fan count as a single vectorized run: one backend holds
+every configuration's fans and subsystems, with one control zone per configuration, and one SubsystemBank steps all of
+their subsystems with shared noise, so every configuration sees the same heat spikes.
+Parameters: task (tuple of (configs, num_subsystems, duration, limit, seed))
+Returns: list of dict (the configurations with their metrics)
+"""
+def _run_batch(task):
+    configs, num_subsystems, duration, limit, seed = task
+    num_fans = configs[0]["fans"]
+    zones = [{"fans": list(range(index * num_fans, (index + 1) * num_fans)),
+              "subsystems": list(range(index * num_subsystems, (index + 1) * num_subsystems)),
+              "curve": [[config["low"], config["min_output"]], [config["high"], config["max_output"]]],
+              "hysteresis": config["hysteresis"]}
+             for index, config in enumerate(configs)]
+    total_fans = len(configs) * num_fans
+    total_subsystems = len(configs) * num_subsystems
+    max_rpms = np.repeat([float(config["max_rpm"]) for config in configs], num_fans)
+    clock = SimulatedClock()
+    backend = Backend(total_fans, total_subsystems, max_rpms, retention=BATCH_RETENTION, clock=clock,
+                      control_engine=ControlEngine(total_fans, total_subsystems, zones), stats=False)
+    backend.alarm_engine = None
+    metrics = SweepMetrics(len(configs), num_fans, num_subsystems, limit)
+    backend.log_sinks = [metrics]
+    subsystems = SubsystemBank(total_subsystems, seed=seed, groups=len(configs), shared_noise=True)
+    control_loop = ControlLoop(backend, subsystems)
+    for _ in range(int(round(duration / TICK_INTERVAL))):
+        clock.advance(TICK_INTERVAL)
+        control_loop.tick()
+
+    results = []
+    for index, config in enumerate(configs):
+        results.append(dict(config, peak_temperature=float(metrics.peak_temperature[index]),
+                            mean_temperature=float(metrics.temperature_sum[index] / max(metrics.samples, 1)),
+                            rpm_hours=float(metrics.rpm_seconds[index] / 3600),
+                            time_over_limit=float(metrics.time_over_limit[index]),
+                            feasible=bool(metrics.peak_temperature[index] <= limit)))
+    return results
+
+
+"""
+Description: Splits configurations into batches of at most `batch_size` configurations with the same fan count. The
+batches only depend on the configurations, not on the number of workers.
+Parameters: configs (list of dict), batch_size (int)
+Returns: list of lists of dict
+"""
+def make_batches(configs, batch_size=BATCH_SIZE):
+    by_fans = {}
+    for config in configs:
+        by_fans.setdefault(int(config["fans"]), []).append(dict(config, fans=int(config["fans"])))
+    return [group[start:start + batch_size] for _, group in sorted(by_fans.items())
+            for start in range(0, len(group), batch_size)]
+
+
+"""
+Description: Ranks sweep results: configurations that kept the peak temperature within the limit come first, by
+ascending fan RPM-hours, followed by the others by ascending peak temperature.
+Parameters: results (list of dict)
+Returns: list of dict (sorted, with a 1-based "rank")
+"""
+def rank_results(results):
+    ranked = sorted(results, key=lambda result: (not result["feasible"],
+                                                 result["rpm_hours"] if result["feasible"] else result["peak_temperature"]))
+    return [dict(result, rank=rank) for rank, result in enumerate(ranked, start=1)]
+
+
+"""
+Description: Simulates every configuration for the same duration and scenario (the same seed for every batch) and
+returns the ranked results. Batches are spread over a pool of worker processes, or run in this process with one worker.
+Parameters: configs (list of dict), num_subsystems (int), duration (float, simulated seconds), limit (float, peak
+temperature limit in °C), seed (int), workers (int or None, defaults to one per CPU core), batch_size (int)
+Returns: list of dict (ranked, see rank_results)
+"""
+def run_sweep(configs, num_subsystems, duration, limit, seed, workers=None, batch_size=BATCH_SIZE):
+    tasks = [(batch, num_subsystems, duration, limit, seed) for batch in make_batches(configs, batch_size)]
+    workers = min(workers or os.cpu_count() or 1, len(tasks))
+    if workers <= 1:
+        batches = [_run_batch(task) for task in tasks]
+    else:
+        with multiprocessing.get_context("spawn").Pool(workers) as pool:
+            batches = pool.map(_run_batch, tasks, chunksize=1)
+    return rank_results([result for batch in batches for result in batch])
+
+
+# Columns of the results table and CSV file, as (header, result key, format)
+RESULT_COLUMNS = [
+    ("Rank", "rank", "d"), ("Low (°C)", "low", ".1f"), ("High (°C)", "high", ".1f"), ("Min out", "min_output", ".3f"),
+    ("Max out", "max_output", ".3f"), ("Hyst (°C)", "hysteresis", ".1f"), ("Fans", "fans", "d"),
+    ("Max RPM", "max_rpm", ".0f"), ("Peak (°C)", "peak_temperature", ".3f"), ("Mean (°C)", "mean_temperature", ".3f"),
+    ("RPM-hours", "rpm_hours", ".1f"), ("Over limit (s)", "time_over_limit", ".1f"),
+]
+
+
+"""
+Description: Formats the first ranked results as a fixed-width text table.
+Parameters: results (list of dict, ranked), top (int)
+Returns: str
+"""
+def format_results(results, top):
+    widths = [max(len(header), 9) for header, _, _ in RESULT_COLUMNS]
+    lines = ["  ".join(f"{header:>{width}}" for (header, _, _), width in zip(RESULT_COLUMNS, widths))]
+    for result in results[:top]:
+        cells = [f"{result[key]:>{width}{spec}}" for (_, key, spec), width in zip(RESULT_COLUMNS, widths)]
+        lines.append("  ".join(cells) + ("" if result["feasible"] else "  over limit"))
+    return "\n".join(lines)
+
+
+"""
+Description: Writes the ranked results to a CSV file.
+Parameters: results (list of dict, ranked), filename (str)
+Returns: str
+"""
+def write_results_csv(results, filename):
+    with open(filename, "w", newline="", encoding="utf-8") as file:
+        file.write(",".join(header for header, _, _ in RESULT_COLUMNS) + ",Feasible\n")
+        for result in results:
+            file.write(",".join(str(result[key]) for _, key, _ in RESULT_COLUMNS) + f",{result['feasible']}\n")
+    return filename
+
+
+"""
+Description: Parses the command line arguments of the parameter sweep.
+Parameters: argv (list of str or None)
+Returns: argparse.Namespace
+"""
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Sweep fan curve parameters, fan counts and maximum RPMs over headless "
+                                                 "simulations and rank them by fan RPM-hours under a peak temperature "
+                                                 "limit.")
+    parser.add_argument("--low", type=float, nargs="+", help="lower curve breakpoints (in °C)")
+    parser.add_argument("--high", type=float, nargs="+", help="upper curve breakpoints (in °C)")
+    parser.add_argument("--min-output", type=float, nargs="+", help="fan outputs at the lower breakpoint (0-1)")
+    parser.add_argument("--max-output", type=float, nargs="+", help="fan outputs at the upper breakpoint (0-1)")
+    parser.add_argument("--hysteresis", type=float, nargs="+", help="hysteresis bands (in °C)")
+    parser.add_argument("--fans", type=int, nargs="+", help="numbers of fans")
+    parser.add_argument("--max-rpm", type=float, nargs="+", help="maximum RPMs of the fans")
+    parser.add_argument("--random", type=int, default=None,
+                        help="draw this many configurations between the smallest and largest given values instead of "
+                             "running the full grid")
+    parser.add_argument("--subsystems", type=int, default=6, help="number of subsystems")
+    parser.add_argument("--duration", type=float, default=600, help="simulated time of every run (in seconds)")
+    parser.add_argument("--limit", type=float, default=70, help="peak temperature limit (in °C)")
+    parser.add_argument("--seed", type=int, default=None, help="seed of the simulated scenario (and of --random)")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: one per CPU core)")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE,
+                        help="maximum configurations simulated together in one vectorized batch")
+    parser.add_argument("--top", type=int, default=20, help="number of ranked configurations to print")
+    parser.add_argument("--output", default=None, help="write every ranked configuration to this CSV file")
+    return parser.parse_args(argv)
+
+
+"""
+Description: Entry point of the parameter sweep.
+Parameters: argv (list of str or None)
+Returns: int (exit code)
+"""
+def main(argv=None):
+    args = parse_args(argv)
+    if args.seed is None:
+        args.seed = int(np.random.default_rng().integers(2 ** 31))  # Every batch must still see the same scenario
+    values = {name: getattr(args, name) for name in PARAMETERS}
+    if args.random is not None:
+        configs = random_configs(args.random, args.seed, **values)
+    else:
+        configs = grid_configs(**values)
+    if not configs:
+        print("No configuration has a lower breakpoint below its upper breakpoint.", file=sys.stderr)
+        return 2
+
+    started = time.perf_counter()
+    results = run_sweep(configs, args.subsystems, args.duration, args.limit, args.seed, workers=args.workers,
+                        batch_size=args.batch_size)
+    wall_time = time.perf_counter() - started
+    feasible = sum(result["feasible"] for result in results)
+    print(f"Simulated {len(results)} configurations x {args.duration:.0f} s in {wall_time:.2f} s "
+          f"({len(results) / wall_time:.1f} configurations per second, seed {args.seed}); {feasible} kept the peak "
+          f"temperature within {args.limit:.1f} °C")
+    print(format_results(results, args.top))
+    if args.output is not None:
+        print(f"Results written: {write_results_csv(results, args.output)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,233 @@
+import argparse
+import json
+import os
+import queue
+import sys
+import threading
+import numpy as np
+from csv_logger import csv_header, format_rows
+
+# Layout of one entry of the chunk index: time of the first and last row, and number of rows in the chunk
+INDEX_DTYPE = np.dtype([("t_first", "<f8"), ("t_last", "<f8"), ("rows", "<i8")])
+ARCHIVE_VERSION = 1
+
+
+"""
+Description: Returns the path of a chunk file inside an archive directory.
+Parameters: path (str), chunk (int)
+Returns: str
+"""
+def chunk_filename(path, chunk):
+    return os.path.join(path, f"chunk_{chunk:06}.bin")
+
+
+"""Description: Writes the full telemetry history to an on-disk archive of fixed-size chunks. Each chunk file holds a
+float64 time column followed by one contiguous column per temperature channel and per fan channel (float32 by default),
+and an index file records the first and last time and the row count of every completed chunk. Rows are collected in
+memory and each full chunk is handed to a background thread, so append() never waits on the disk."""
+class TelemetryArchiveWriter:
+    def __init__(self, path, num_subsystems, num_fans, chunk_rows=4096, dtype="float32"):
+        if os.path.exists(os.path.join(path, "meta.json")):
+            raise ValueError(f"An archive already exists at {path}.")
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.num_subsystems = num_subsystems
+        self.num_fans = num_fans
+        self.chunk_rows = chunk_rows
+        self.dtype = np.dtype(dtype).newbyteorder("<")
+        self.chunks_written = 0
+        with open(os.path.join(path, "meta.json"), "w") as file:
+            json.dump({"version": ARCHIVE_VERSION, "num_subsystems": num_subsystems, "num_fans": num_fans,
+                       "chunk_rows": chunk_rows, "dtype": self.dtype.str}, file)
+        open(os.path.join(path, "index.bin"), "wb").close()
+        self._queue = queue.SimpleQueue()
+        self._new_chunk()
+        self._thread = threading.Thread(target=self._run, name="TelemetryArchiveWriter", daemon=True)
+        self._thread.start()
+
+    """
+    Description: Allocates the in-memory buffers of the next chunk. Channels are stored as rows of a 2-D array so each
+    channel's samples are contiguous, as they are on disk.
+    """
+    def _new_chunk(self):
+        self._times = np.empty(self.chunk_rows, dtype="<f8")
+        self._temps = np.empty((self.num_subsystems, self.chunk_rows), dtype=self.dtype)
+        self._speeds = np.empty((self.num_fans, self.chunk_rows), dtype=self.dtype)
+        self._rows = 0
+
+    """
+    Description: Appends one row to the archive.
+    Parameters: elapsed_time (float), temperatures (numpy array), fan_speeds (numpy array)
+    """
+    def append(self, elapsed_time, temperatures, fan_speeds):
+        row = self._rows
+        self._times[row] = elapsed_time
+        self._temps[:, row] = temperatures
+        self._speeds[:, row] = fan_speeds
+        self._rows += 1
+        if self._rows == self.chunk_rows:
+            self._queue.put((self._times, self._temps, self._speeds, self._rows))
+            self._new_chunk()
+
+    """
+    Description: Writes the partially filled last chunk, waits for all chunks to reach the disk and stops the writer
+    thread.
+    """
+    def close(self):
+        if self._rows:
+            self._queue.put((self._times, self._temps, self._speeds, self._rows))
+            self._new_chunk()
+        self._queue.put(None)
+        self._thread.join()
+
+    """
+    Description: Body of the writer thread. Each chunk file is written completely before its index entry, so readers
+    never see a chunk that is still being written.
+    """
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            times, temps, speeds, rows = item
+            with open(chunk_filename(self.path, self.chunks_written), "wb") as file:
+                times.tofile(file)
+                temps.tofile(file)
+                speeds.tofile(file)
+            entry = np.array([(times[0], times[rows - 1], rows)], dtype=INDEX_DTYPE)
+            with open(os.path.join(self.path, "index.bin"), "ab") as file:
+                entry.tofile(file)
+            self.chunks_written += 1
+
+
+"""Description: Reads a telemetry archive through numpy.memmap. Range queries use the chunk index to find the chunks
+overlapping the requested time range and only map those, so queries stay fast on archives of many gigabytes. Results
+from a single chunk are zero-copy views of the mapped file."""
+class TelemetryArchive:
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, "meta.json")) as file:
+            meta = json.load(file)
+        if meta["version"] != ARCHIVE_VERSION:
+            raise ValueError(f"Unsupported archive version: {meta['version']}.")
+        self.num_subsystems = meta["num_subsystems"]
+        self.num_fans = meta["num_fans"]
+        self.chunk_rows = meta["chunk_rows"]
+        self.dtype = np.dtype(meta["dtype"])
+        self._maps = {}
+        self.refresh()
+
+    """
+    Description: Re-reads the chunk index, picking up chunks written since the archive was opened.
+    """
+    def refresh(self):
+        self.index = np.fromfile(os.path.join(self.path, "index.bin"), dtype=INDEX_DTYPE)
+
+    """
+    Description: Returns the number of rows in the archive.
+    Returns: int
+    """
+    def __len__(self):
+        return int(self.index["rows"].sum())
+
+    """
+    Description: Returns zero-copy views of one chunk's columns.
+    Parameters: chunk (int)
+    Returns: tuple of numpy arrays (times (rows,), temperatures (rows, subsystems), fan speeds (rows, fans))
+    """
+    def chunk(self, chunk):
+        if chunk not in self._maps:
+            self._maps[chunk] = np.memmap(chunk_filename(self.path, chunk), dtype=np.uint8, mode="r")
+        data = self._maps[chunk]
+        rows = int(self.index["rows"][chunk])
+        temps_offset = self.chunk_rows * 8
+        speeds_offset = temps_offset + self.num_subsystems * self.chunk_rows * self.dtype.itemsize
+        times = np.ndarray((rows,), dtype="<f8", buffer=data)
+        temps = np.ndarray((self.num_subsystems, self.chunk_rows), dtype=self.dtype, buffer=data, offset=temps_offset)
+        speeds = np.ndarray((self.num_fans, self.chunk_rows), dtype=self.dtype, buffer=data, offset=speeds_offset)
+        return times, temps[:, :rows].T, speeds[:, :rows].T
+
+    """
+    Description: Yields the rows between t0 and t1 (inclusive) chunk by chunk. Channels can be selected with a list of
+    indices or a slice; with a slice (or all channels) every yielded array is a view of the mapped file.
+    Parameters: t0 (float or None), t1 (float or None), temp_channels (list, slice or None), fan_channels (list, slice
+    or None)
+    Returns: generator of tuples of numpy arrays (times, temperatures, fan speeds)
+    """
+    def iter_range(self, t0=None, t1=None, temp_channels=None, fan_channels=None):
+        first = 0 if t0 is None else int(np.searchsorted(self.index["t_last"], t0, side="left"))
+        last = len(self.index) if t1 is None else int(np.searchsorted(self.index["t_first"], t1, side="right"))
+        temp_channels = slice(None) if temp_channels is None else temp_channels
+        fan_channels = slice(None) if fan_channels is None else fan_channels
+        for chunk in range(first, last):
+            times, temps, speeds = self.chunk(chunk)
+            start = 0 if t0 is None else int(np.searchsorted(times, t0, side="left"))
+            stop = len(times) if t1 is None else int(np.searchsorted(times, t1, side="right"))
+            if start < stop:
+                yield times[start:stop], temps[start:stop, temp_channels], speeds[start:stop, fan_channels]
+
+    """
+    Description: Returns the rows between t0 and t1 (inclusive) as three arrays. The result is a view of the mapped file
+    when it falls in a single chunk and a copy otherwise.
+    Parameters: t0 (float or None), t1 (float or None), temp_channels (list, slice or None), fan_channels (list, slice
+    or None)
+    Returns: tuple of numpy arrays (times (rows,), temperatures (rows, channels), fan speeds (rows, channels))
+    """
+    def query(self, t0=None, t1=None, temp_channels=None, fan_channels=None):
+        parts = list(self.iter_range(t0, t1, temp_channels, fan_channels))
+        if len(parts) == 1:
+            return parts[0]
+        if not parts:
+            temp_channels = slice(None) if temp_channels is None else temp_channels
+            fan_channels = slice(None) if fan_channels is None else fan_channels
+            return (np.empty(0), np.empty((0, self.num_subsystems), self.dtype)[:, temp_channels],
+                    np.empty((0, self.num_fans), self.dtype)[:, fan_channels])
+        return tuple(np.concatenate(columns) for columns in zip(*parts))
+
+    """
+    Description: Converts the rows between t0 and t1 to a CSV file in the same layout as the backend's CSV export,
+    one chunk at a time.
+    Parameters: filename (str), t0 (float or None), t1 (float or None)
+    Returns: int (number of rows written)
+    """
+    def to_csv(self, filename, t0=None, t1=None):
+        rows = 0
+        with open(filename, "w", newline="", encoding="utf-8") as file:
+            file.write(csv_header(self.num_subsystems, self.num_fans))
+            for times, temps, speeds in self.iter_range(t0, t1):
+                file.write(format_rows(times, np.hstack([temps, speeds])))
+                rows += len(times)
+        return rows
+
+
+"""
+Description: Entry point of the archive tool, which prints information about an archive or converts it to CSV.
+Parameters: argv (list of str or None)
+Returns: int (exit code)
+"""
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Inspect a telemetry archive or convert it to CSV.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    info_parser = subparsers.add_parser("info", help="print the size and time range of an archive")
+    info_parser.add_argument("archive")
+    csv_parser = subparsers.add_parser("to-csv", help="convert an archive (or a time range of it) to CSV")
+    csv_parser.add_argument("archive")
+    csv_parser.add_argument("output")
+    csv_parser.add_argument("--start", type=float, default=None, help="first elapsed time to export (in seconds)")
+    csv_parser.add_argument("--end", type=float, default=None, help="last elapsed time to export (in seconds)")
+    args = parser.parse_args(argv)
+
+    archive = TelemetryArchive(args.archive)
+    if args.command == "info":
+        print(f"{archive.num_subsystems} subsystems, {archive.num_fans} fans, {len(archive.index)} chunks, "
+              f"{len(archive)} rows")
+        if len(archive.index):
+            print(f"Time range: {archive.index['t_first'][0]:.3f} s to {archive.index['t_last'][-1]:.3f} s")
+    else:
+        rows = archive.to_csv(args.output, args.start, args.end)
+        print(f"Wrote {rows} rows to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
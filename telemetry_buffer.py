@@ -0,0 +1,118 @@
+import threading
+import numpy as np
+
+"""Description: Fixed-capacity circular buffer for the telemetry history. It holds one time column and one contiguous
+2-D float array per channel group (e.g. subsystem temperatures and fan speeds). Every row is written twice, once at its
+ring position and once a full capacity further on, so the newest rows are always a single contiguous slice and windowed
+reads are zero-copy views. Appending is O(1) and the memory footprint never grows after construction.
+The buffer does no locking of its own: writers hold `lock` while they append or resize, and a reader on another thread
+holds it while it reads and copies out the rows it needs, since a view is overwritten once the ring wraps around."""
+class TelemetryBuffer:
+    def __init__(self, groups, capacity, retention=300):
+        if capacity < 1:
+            raise ValueError("Capacity must be at least 1.")
+        self.capacity = int(capacity)
+        self.retention = retention
+        self.count = 0
+        self.lock = threading.RLock()
+        self._times = np.zeros(2 * self.capacity)
+        self._data = {name: np.zeros((2 * self.capacity, channels)) for name, channels in groups.items()}
+
+    """
+    Description: Appends one row to the buffer, overwriting the oldest row once the buffer is full.
+    Parameters: elapsed_time (float), values (keyword arrays, one per channel group)
+    """
+    def append(self, elapsed_time, **values):
+        position = self.count % self.capacity
+        mirror = position + self.capacity
+        self._times[position] = elapsed_time
+        self._times[mirror] = elapsed_time
+        for name, data in self._data.items():
+            data[position] = values[name]
+            data[mirror] = values[name]
+        self.count += 1
+
+    """
+    Description: Changes the number of channels of a group in place, keeping the history of the channels that remain.
+    Channels added to the group have no history, so they are filled with `fill` (NaN by default, which plots as a gap).
+    Parameters: name (str), channels (int), fill (float)
+    """
+    def resize_group(self, name, channels, fill=np.nan):
+        old = self._data[name]
+        if old.shape[1] == channels:
+            return
+        data = np.full((2 * self.capacity, channels), fill)
+        kept = min(old.shape[1], channels)
+        data[:, :kept] = old[:, :kept]
+        self._data[name] = data
+
+    """
+    Description: Returns the slice of the backing arrays holding the rows stored in the buffer, oldest first.
+    Returns: slice
+    """
+    def _stored_slice(self):
+        stored = min(self.count, self.capacity)
+        start = (self.count - stored) % self.capacity
+        return slice(start, start + stored)
+
+    """
+    Description: Returns the slice of the backing arrays holding the rows newer than the given number of seconds
+    (the retention window by default), measured back from the newest row.
+    Parameters: seconds (float or None)
+    Returns: slice
+    """
+    def window_slice(self, seconds=None):
+        stored = self._stored_slice()
+        if stored.start == stored.stop:
+            return stored
+        if seconds is None:
+            seconds = self.retention
+        times = self._times[stored]
+        first = np.searchsorted(times, times[-1] - seconds, side="right")
+        return slice(stored.start + first, stored.stop)
+
+    """
+    Description: Returns zero-copy views of the time column and one channel group over the requested window.
+    Parameters: group (str), seconds (float or None)
+    Returns: tuple of numpy arrays (times with shape (rows,), values with shape (rows, channels))
+    """
+    def view(self, group, seconds=None):
+        window = self.window_slice(seconds)
+        return self._times[window], self._data[group][window]
+
+    """
+    Description: Returns zero-copy views of the time column and one channel group for every stored row whose global
+    row number (the number of rows appended before it) is at least `first`.
+    Parameters: group (str), first (int)
+    Returns: tuple of numpy arrays (times with shape (rows,), values with shape (rows, channels))
+    """
+    def view_rows(self, group, first):
+        stored = self._stored_slice()
+        oldest = self.count - (stored.stop - stored.start)
+        start = stored.start + min(max(first - oldest, 0), stored.stop - stored.start)
+        return self._times[start:stored.stop], self._data[group][start:stored.stop]
+
+    """
+    Description: Returns the global row number of the oldest row in the requested window.
+    Parameters: seconds (float or None)
+    Returns: int
+    """
+    def first_row(self, seconds=None):
+        window = self.window_slice(seconds)
+        return self.count - (window.stop - window.start)
+
+    """
+    Description: Returns a zero-copy view of the time column over the requested window.
+    Parameters: seconds (float or None)
+    Returns: numpy array
+    """
+    def times(self, seconds=None):
+        return self._times[self.window_slice(seconds)]
+
+    """
+    Description: Returns the number of rows in the retention window.
+    Returns: int
+    """
+    def __len__(self):
+        window = self.window_slice()
+        return window.stop - window.start
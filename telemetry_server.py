@@ -0,0 +1,706 @@
+import argparse
+import asyncio
+import base64
+import hashlib
+import json
+import os
+import struct
+import sys
+import threading
+import time
+import numpy as np
+from urllib.parse import parse_qs, urlsplit
+from backend import SAMPLE_INTERVAL
+
+DEFAULT_PORT = 9760
+# Channel groups in the order they appear in stream frames
+GROUPS = ("temp", "speed")
+# Resolution the stream quantizes each group to: 0.01 °C and 0.1 RPM
+QUANTA = {"temp": 0.01, "speed": 0.1}
+# Stream frame header: magic, kind, sequence number, sample count (rows logged by the backend), elapsed time
+FRAME_HEADER = struct.Struct("<4sBIId")
+FRAME_MAGIC = b"FCS1"
+KIND_KEYFRAME = 0
+KIND_DELTA = 1
+# Per-group header in a stream frame: number of channels, bytes per value (0 in a delta frame when nothing changed)
+GROUP_HEADER = struct.Struct("<IB")
+VALUE_DTYPES = {1: "<i1", 2: "<i2", 4: "<i4"}
+# Binary history header: magic, global row number of the first row, rows, subsystems, fans
+HISTORY_HEADER = struct.Struct("<4sIIII")
+HISTORY_MAGIC = b"FCH1"
+# Bytes a subscriber may have waiting to be sent before it skips frames and is resynchronized with a keyframe
+MAX_BUFFERED = 1 << 20
+# Largest frame accepted from a WebSocket client (clients only send control frames)
+MAX_CLIENT_FRAME = 1 << 16
+
+WEBSOCKET_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+OPCODE_TEXT = 0x1
+OPCODE_BINARY = 0x2
+OPCODE_CLOSE = 0x8
+OPCODE_PING = 0x9
+OPCODE_PONG = 0xA
+HTTP_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 500: "Internal Server Error",
+                503: "Service Unavailable"}
+
+
+"""
+Description: Encodes one WebSocket frame. Frames sent by a client must be masked, frames sent by a server must not.
+Parameters: payload (bytes), opcode (int), mask (bool)
+Returns: bytes
+"""
+def websocket_frame(payload, opcode=OPCODE_BINARY, mask=False):
+    length = len(payload)
+    mask_bit = 0x80 if mask else 0
+    if length < 126:
+        header = struct.pack("!BB", 0x80 | opcode, mask_bit | length)
+    elif length < 1 << 16:
+        header = struct.pack("!BBH", 0x80 | opcode, mask_bit | 126, length)
+    else:
+        header = struct.pack("!BBQ", 0x80 | opcode, mask_bit | 127, length)
+    if not mask:
+        return header + payload
+    key = os.urandom(4)
+    return header + key + _unmask(payload, key)
+
+
+"""
+Description: Applies (or removes) a WebSocket masking key.
+Parameters: payload (bytes), key (bytes, 4 bytes)
+Returns: bytes
+"""
+def _unmask(payload, key):
+    data = np.frombuffer(payload, dtype=np.uint8)
+    return (data ^ np.resize(np.frombuffer(key, dtype=np.uint8), len(data))).tobytes()
+
+
+"""
+Description: Reads one WebSocket frame, unmasking it if needed.
+Parameters: reader (asyncio.StreamReader), max_length (int or None)
+Returns: tuple of (opcode (int), payload (bytes))
+"""
+async def read_websocket_frame(reader, max_length=None):
+    first, second = await reader.readexactly(2)
+    length = second & 0x7F
+    if length == 126:
+        length = struct.unpack("!H", await reader.readexactly(2))[0]
+    elif length == 127:
+        length = struct.unpack("!Q", await reader.readexactly(8))[0]
+    if max_length is not None and length > max_length:
+        raise ValueError(f"WebSocket frame of {length} bytes is too large.")
+    key = await reader.readexactly(4) if second & 0x80 else None
+    payload = await reader.readexactly(length)
+    return first & 0x0F, payload if key is None else _unmask(payload, key)
+
+
+"""
+Description: Returns the Sec-WebSocket-Accept value answering a client's Sec-WebSocket-Key.
+Parameters: key (str)
+Returns: str
+"""
+def websocket_accept(key):
+    return base64.b64encode(hashlib.sha1((key + WEBSOCKET_GUID).encode()).digest()).decode()
+
+
+"""Description: Delta encoder of the live stream. Values are quantized to QUANTA and each frame only carries the change
+of every channel since the previous frame: a bitmap of the channels that changed, then their changes as 1-, 2- or
+4-byte integers, whichever is the narrowest that fits the group's largest change. Because the encoder keeps the
+quantized values it last sent, decoding never drifts. A keyframe holds every quantized value; it is sent when a
+subscriber joins or resynchronizes and whenever the channel counts change. One frame is encoded per sample and shared
+by every subscriber."""
+class DeltaEncoder:
+    def __init__(self, quanta=None):
+        self.quanta = dict(QUANTA if quanta is None else quanta)
+        self.reference = None  # Quantized values of the last frame, one int64 array per group
+        self.sequence = 0
+        self.sample_count = 0
+        self.elapsed_time = 0.0
+
+    """
+    Description: Encodes a sample as a delta frame, or as a keyframe if it is the first one, the channel counts changed
+    or a change does not fit in 4 bytes.
+    Parameters: elapsed_time (float), sample_count (int), values (dict of group to numpy array)
+    Returns: bytes
+    """
+    def encode(self, elapsed_time, sample_count, values):
+        quantized = {group: np.rint(np.asarray(values[group]) / self.quanta[group]).astype(np.int64)
+                     for group in GROUPS}
+        self.sequence = (self.sequence + 1) & 0xFFFFFFFF
+        self.sample_count = sample_count
+        self.elapsed_time = elapsed_time
+        reference = self.reference
+        self.reference = quantized
+        if reference is None or any(len(quantized[group]) != len(reference[group]) for group in GROUPS):
+            return self.keyframe()
+        deltas = {group: quantized[group] - reference[group] for group in GROUPS}
+        widths = {group: _value_width(delta) for group, delta in deltas.items()}
+        if None in widths.values():
+            return self.keyframe()
+
+        parts = [FRAME_HEADER.pack(FRAME_MAGIC, KIND_DELTA, self.sequence, sample_count, elapsed_time)]
+        for group in GROUPS:
+            delta, width = deltas[group], widths[group]
+            parts.append(GROUP_HEADER.pack(len(delta), width))
+            if width:
+                changed = delta != 0
+                parts.append(np.packbits(changed, bitorder="little").tobytes())
+                parts.append(delta[changed].astype(VALUE_DTYPES[width]).tobytes())
+        return b"".join(parts)
+
+    """
+    Description: Encodes the last encoded sample as a keyframe, with the same sequence number.
+    Returns: bytes or None (before the first sample)
+    """
+    def keyframe(self):
+        if self.reference is None:
+            return None
+        parts = [FRAME_HEADER.pack(FRAME_MAGIC, KIND_KEYFRAME, self.sequence, self.sample_count, self.elapsed_time)]
+        for group in GROUPS:
+            parts.append(GROUP_HEADER.pack(len(self.reference[group]), 4))
+            parts.append(self.reference[group].astype("<i4").tobytes())
+        return b"".join(parts)
+
+
+"""
+Description: Returns the narrowest integer width that holds every value of a delta.
+Parameters: delta (numpy array of int)
+Returns: int (0 when every value is 0, else 1, 2 or 4) or None (when a value does not fit in 4 bytes)
+"""
+def _value_width(delta):
+    largest = int(np.abs(delta).max(initial=0))
+    if largest == 0:
+        return 0
+    for width in (1, 2, 4):
+        if largest < 1 << (8 * width - 1):
+            return width
+    return None
+
+
+"""Description: Decoder of the live stream, for Python subscribers. It applies each delta frame to the values of the
+previous frame, and refuses a delta frame that does not follow the last frame it decoded."""
+class DeltaDecoder:
+    def __init__(self, quanta=None):
+        self.quanta = dict(QUANTA if quanta is None else quanta)
+        self.values = None  # Quantized values of the last frame, one int64 array per group
+        self.sequence = None
+
+    """
+    Description: Decodes one frame.
+    Parameters: frame (bytes)
+    Returns: dict ("sequence", "sample_count", "elapsed_time", "keyframe", and one float array per group)
+    """
+    def decode(self, frame):
+        magic, kind, sequence, sample_count, elapsed_time = FRAME_HEADER.unpack_from(frame, 0)
+        if magic != FRAME_MAGIC:
+            raise ValueError("Not a telemetry stream frame.")
+        if kind == KIND_DELTA and (self.values is None or sequence != (self.sequence + 1) & 0xFFFFFFFF):
+            raise ValueError(f"Delta frame {sequence} does not follow frame {self.sequence}.")
+        offset = FRAME_HEADER.size
+        values = {}
+        for group in GROUPS:
+            channels, width = GROUP_HEADER.unpack_from(frame, offset)
+            offset += GROUP_HEADER.size
+            if kind == KIND_KEYFRAME:
+                values[group] = np.frombuffer(frame, VALUE_DTYPES[width], channels, offset).astype(np.int64)
+                offset += channels * width
+                continue
+            values[group] = self.values[group].copy()
+            if width:
+                bitmap = np.frombuffer(frame, np.uint8, (channels + 7) // 8, offset)
+                changed = np.unpackbits(bitmap, count=channels, bitorder="little").astype(bool)
+                offset += len(bitmap)
+                count = int(np.count_nonzero(changed))
+                values[group][changed] += np.frombuffer(frame, VALUE_DTYPES[width], count, offset)
+                offset += count * width
+        self.values = values
+        self.sequence = sequence
+        result = {"sequence": sequence, "sample_count": sample_count, "elapsed_time": elapsed_time,
+                  "keyframe": kind == KIND_KEYFRAME}
+        for group in GROUPS:
+            result[group] = values[group] * self.quanta[group]
+        return result
+
+
+"""Description: One WebSocket subscriber of the live stream. `resync` is set when it fell too far behind and skipped
+frames, so it gets a keyframe once its connection has drained."""
+class _Subscriber:
+    def __init__(self, writer):
+        self.writer = writer
+        self.resync = False
+
+
+"""Description: Embedded local telemetry server. It runs an asyncio event loop on its own thread, so neither the GUI nor
+the control loop ever waits on a client, and answers HTTP requests for the current snapshot (GET /snapshot), the
+retained history as JSON or binary columns (GET /history) and a description of the channels (GET /). GET /stream
+upgrades to a WebSocket that pushes one delta-encoded frame per sample (see DeltaEncoder). The server is a log sink of
+the attached backend: each sample is copied and handed to the event loop, which encodes it once for every subscriber.
+Samples that arrive faster than the loop can send them are coalesced, and a subscriber whose connection falls behind
+skips frames and is resynchronized with a keyframe. attach() moves the server to another backend (or detaches it)."""
+class TelemetryServer:
+    def __init__(self, host="127.0.0.1", port=DEFAULT_PORT, max_buffered=MAX_BUFFERED):
+        self.host = host
+        self.port = port
+        self.max_buffered = max_buffered
+        self.backend = None
+        self.encoder = DeltaEncoder()
+        self.frames_sent = 0
+        self.frames_skipped = 0
+        self.requests = 0
+        self._subscribers = []
+        self._pending = None
+        self._latest = None  # Last sample handed over by the backend, served by /snapshot
+        self._scheduled = False
+        self._loop = None
+        self._stopping = None
+        self._ready = threading.Event()
+        self._thread = None
+        self._error = None
+
+    """
+    Description: Starts the server thread and waits until it is listening.
+    Returns: int (the port, useful when the server was created with port 0)
+    """
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="TelemetryServer", daemon=True)
+        self._thread.start()
+        self._ready.wait()
+        if self._error is not None:
+            raise self._error
+        return self.port
+
+    """
+    Description: Stops the server, closes every connection and detaches it from its backend.
+    """
+    def stop(self):
+        self.attach(None)
+        if self._loop is not None and self._thread.is_alive():
+            self._loop.call_soon_threadsafe(self._stopping.set)
+            self._thread.join()
+
+    """
+    Description: Makes the server publish the given backend, or nothing when it is None.
+    Parameters: backend (Backend or None)
+    """
+    def attach(self, backend):
+        if self.backend is not None:
+            self.backend.log_sinks = [sink for sink in self.backend.log_sinks if sink is not self]
+        self._latest = None
+        self.backend = backend
+        if backend is not None:
+            backend.log_sinks = backend.log_sinks + [self]
+
+    """
+    Description: Log sink interface, called on the control thread after every sample. The sample is copied, kept for
+    /snapshot, and the event loop is woken up to send it, unless a wake-up is already pending.
+    Parameters: elapsed_time (float), temperatures (numpy array), fan_speeds (numpy array)
+    """
+    def append(self, elapsed_time, temperatures, fan_speeds):
+        loop, backend = self._loop, self.backend
+        if loop is None or backend is None:
+            return
+        self._latest = self._pending = (elapsed_time, backend.telemetry.count,
+                                        {"temp": temperatures.copy(), "speed": fan_speeds.copy()})
+        if not self._scheduled:
+            self._scheduled = True
+            loop.call_soon_threadsafe(self._broadcast)
+
+    """
+    Description: Body of the server thread.
+    """
+    def _run(self):
+        try:
+            asyncio.run(self._serve())
+        except Exception as e:
+            self._error = e
+            self._ready.set()
+
+    """
+    Description: Listens until stop() is called, then closes every connection.
+    """
+    async def _serve(self):
+        self._stopping = asyncio.Event()
+        server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        self.port = server.sockets[0].getsockname()[1]
+        self._loop = asyncio.get_running_loop()
+        self._ready.set()
+        try:
+            await self._stopping.wait()
+        finally:
+            self._loop = None
+            server.close()
+            for subscriber in self._subscribers:
+                subscriber.writer.close()
+            self._subscribers = []
+            await server.wait_closed()
+
+    """
+    Description: Encodes the latest sample and sends it to every subscriber. Runs on the event loop.
+    """
+    def _broadcast(self):
+        self._scheduled = False  # Cleared before taking the sample, so a newer one schedules another broadcast
+        sample, self._pending = self._pending, None
+        if sample is None:
+            return
+        frame = self.encoder.encode(*sample)
+        if not self._subscribers:
+            return
+        data = websocket_frame(frame)
+        for subscriber in list(self._subscribers):
+            transport = subscriber.writer.transport
+            if transport.is_closing():
+                self._subscribers.remove(subscriber)
+            elif transport.get_write_buffer_size() > self.max_buffered:
+                subscriber.resync = True
+                self.frames_skipped += 1
+            elif subscriber.resync:
+                subscriber.writer.write(websocket_frame(self.encoder.keyframe()))
+                subscriber.resync = False
+                self.frames_sent += 1
+            else:
+                subscriber.writer.write(data)
+                self.frames_sent += 1
+
+    """
+    Description: Handles one client connection: reads the request and either answers it or upgrades it to the stream.
+    Parameters: reader (asyncio.StreamReader), writer (asyncio.StreamWriter)
+    """
+    async def _handle_connection(self, reader, writer):
+        try:
+            request = await reader.readuntil(b"\r\n\r\n")
+            lines = request.decode("latin-1").split("\r\n")
+            method, target, _ = lines[0].split(" ", 2)
+            headers = {}
+            for line in lines[1:]:
+                if ":" in line:
+                    name, value = line.split(":", 1)
+                    headers[name.strip().lower()] = value.strip()
+            url = urlsplit(target)
+            self.requests += 1
+            if url.path == "/stream" and headers.get("upgrade", "").lower() == "websocket":
+                await self._stream(reader, writer, headers)
+                return
+            if method != "GET":
+                status, body, content_type = 400, {"error": "Only GET requests are supported."}, None
+            else:
+                status, body, content_type = self._route(url.path, parse_qs(url.query))
+            if content_type is None:
+                body, content_type = json.dumps(body).encode(), "application/json"
+            writer.write(f"HTTP/1.1 {status} {HTTP_REASONS[status]}\r\nContent-Type: {content_type}\r\n"
+                         f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body)
+            await writer.drain()
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    """
+    Description: Answers an HTTP GET request.
+    Parameters: path (str), query (dict of str to list of str)
+    Returns: tuple of (status (int), body (dict, or bytes with a content type), content type (str or None for JSON))
+    """
+    def _route(self, path, query):
+        backend = self.backend
+        if path not in ("/", "/snapshot", "/history"):
+            return 404, {"error": f"Unknown path {path}."}, None
+        if backend is None:
+            return 503, {"error": "No simulation is running."}, None
+        try:
+            if path == "/":
+                return 200, self.describe(), None
+            if path == "/snapshot":
+                return 200, self.snapshot(), None
+            seconds = float(query["seconds"][0]) if "seconds" in query else None
+            since = int(query["since"][0]) if "since" in query else None
+            binary = query.get("format", ["json"])[0] == "binary"
+            return self.history(seconds, since, binary)
+        except ValueError as e:
+            return 400, {"error": str(e)}, None
+        except Exception as e:
+            print(f"Error in telemetry server: {e}")
+            return 500, {"error": str(e)}, None
+
+    """
+    Description: Describes the published backend and the stream encoding.
+    Returns: dict
+    """
+    def describe(self):
+        backend = self.backend
+        with backend.lock:
+            return {"num_subsystems": backend.num_subsystems, "num_fans": backend.num_fans,
+                    "max_rpms": backend.max_rpms.tolist(), "sample_interval": SAMPLE_INTERVAL,
+                    "retention": backend.telemetry.retention, "quanta": self.encoder.quanta, "groups": list(GROUPS)}
+
+    """
+    Description: Returns the latest sample of the published backend, as handed over to the log sink, so its values,
+    time and sample count always belong together. Before the first sample it is read from the history under the
+    backend's lock.
+    Returns: dict
+    """
+    def snapshot(self):
+        latest = self._latest
+        if latest is None:
+            backend = self.backend
+            with backend.lock:
+                count = backend.telemetry.count
+                times, temperatures = backend.telemetry.view_rows("temp", count - 1)
+                _, fan_speeds = backend.telemetry.view_rows("speed", count - 1)
+                if len(times):
+                    latest = (times[-1], count, {"temp": temperatures[-1].copy(), "speed": fan_speeds[-1].copy()})
+                else:
+                    latest = (0.0, count, {"temp": np.zeros(backend.num_subsystems),
+                                           "speed": np.zeros(backend.num_fans)})
+        elapsed_time, sample_count, values = latest
+        return {"elapsed_time": float(elapsed_time), "sample_count": sample_count,
+                "temperatures": values["temp"].tolist(), "fan_speeds": values["speed"].tolist()}
+
+    """
+    Description: Returns the retained history of every channel, either the last `seconds` (the whole retention window
+    by default) or every row from global row number `since` on, so a client can fetch only the rows it has not seen;
+    both are clamped to the retention window. The rows are copied under the backend's lock, so they are never torn
+    by a sample or a reconfiguration that happens meanwhile.
+    JSON holds "times" and one list per channel for each group (columnar); the binary format is HISTORY_HEADER followed
+    by the times as float64 and each group's channels, one after the other, as float32.
+    Parameters: seconds (float or None), since (int or None), binary (bool)
+    Returns: tuple of (status, body, content type), as _route
+    """
+    def history(self, seconds=None, since=None, binary=False):
+        telemetry = self.backend.telemetry
+        with self.backend.lock:
+            retained = telemetry.first_row()
+            if since is None:
+                first = max(telemetry.first_row(seconds), retained)
+            else:
+                first = min(max(since, retained), telemetry.count)
+            times, temperatures = telemetry.view_rows("temp", first)
+            _, fan_speeds = telemetry.view_rows("speed", first)
+            times, temperatures, fan_speeds = times.copy(), temperatures.T.copy(), fan_speeds.T.copy()
+        rows = len(times)
+        first = int(first)
+        if binary:
+            body = (HISTORY_HEADER.pack(HISTORY_MAGIC, first, rows, len(temperatures), len(fan_speeds)) +
+                    times.astype("<f8").tobytes() + temperatures.astype("<f4").tobytes() +
+                    fan_speeds.astype("<f4").tobytes())
+            return 200, body, "application/octet-stream"
+        return 200, {"first_row": first, "times": times.tolist(), "temp": temperatures.tolist(),
+                     "speed": fan_speeds.tolist()}, None
+
+    """
+    Description: Completes the WebSocket handshake, sends the channel description and a keyframe, then keeps the
+    connection subscribed until the client closes it. Frames sent by the client are only answered (pings) or closed.
+    Parameters: reader (asyncio.StreamReader), writer (asyncio.StreamWriter), headers (dict)
+    """
+    async def _stream(self, reader, writer, headers):
+        if "sec-websocket-key" not in headers:
+            writer.write(b"HTTP/1.1 400 Bad Request\r\nContent-Length: 0\r\nConnection: close\r\n\r\n")
+            return
+        writer.write(f"HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+                     f"Sec-WebSocket-Accept: {websocket_accept(headers['sec-websocket-key'])}\r\n\r\n".encode())
+        if self.backend is not None:
+            writer.write(websocket_frame(json.dumps(self.describe()).encode(), OPCODE_TEXT))
+        keyframe = self.encoder.keyframe()
+        if keyframe is not None:
+            writer.write(websocket_frame(keyframe))
+        subscriber = _Subscriber(writer)
+        self._subscribers.append(subscriber)
+        try:
+            while True:
+                opcode, payload = await read_websocket_frame(reader, MAX_CLIENT_FRAME)
+                if opcode == OPCODE_CLOSE:
+                    writer.write(websocket_frame(payload[:2], OPCODE_CLOSE))
+                    await writer.drain()
+                    break
+                if opcode == OPCODE_PING:
+                    writer.write(websocket_frame(payload, OPCODE_PONG))
+        finally:
+            if subscriber in self._subscribers:
+                self._subscribers.remove(subscriber)
+
+
+"""Description: Python subscriber of a telemetry server's live stream, e.g. for dashboards or tests."""
+class TelemetrySubscriber:
+    def __init__(self, host="127.0.0.1", port=DEFAULT_PORT):
+        self.host = host
+        self.port = port
+        self.decoder = DeltaDecoder()
+        self.description = None
+        self.bytes_received = 0
+        self.frames_received = 0
+        self._reader = None
+        self._writer = None
+
+    """
+    Description: Connects to the stream and completes the WebSocket handshake.
+    """
+    async def connect(self):
+        self._reader, self._writer = await asyncio.open_connection(self.host, self.port)
+        key = base64.b64encode(os.urandom(16)).decode()
+        self._writer.write(f"GET /stream HTTP/1.1\r\nHost: {self.host}:{self.port}\r\nUpgrade: websocket\r\n"
+                           f"Connection: Upgrade\r\nSec-WebSocket-Key: {key}\r\nSec-WebSocket-Version: 13\r\n\r\n"
+                           .encode())
+        response = (await self._reader.readuntil(b"\r\n\r\n")).decode("latin-1")
+        if not response.startswith("HTTP/1.1 101") or websocket_accept(key) not in response:
+            raise ConnectionError(f"WebSocket handshake failed: {response.splitlines()[0]}")
+
+    """
+    Description: Waits for the next sample of the stream. The channel description sent on connecting is stored in
+    `description`.
+    Returns: dict (see DeltaDecoder.decode)
+    """
+    async def receive(self):
+        while True:
+            opcode, payload = await read_websocket_frame(self._reader)
+            if opcode == OPCODE_TEXT:
+                self.description = json.loads(payload)
+            elif opcode == OPCODE_BINARY:
+                self.bytes_received += len(payload)
+                self.frames_received += 1
+                return self.decoder.decode(payload)
+            elif opcode == OPCODE_CLOSE:
+                raise ConnectionError("The server closed the stream.")
+
+    """
+    Description: Closes the stream.
+    """
+    async def close(self):
+        if self._writer is not None:
+            self._writer.write(websocket_frame(struct.pack("!H", 1000), OPCODE_CLOSE, mask=True))
+            self._writer.close()
+            self._writer = None
+
+
+"""
+Description: Sends an HTTP GET request to a telemetry server and returns the response body.
+Parameters: host (str), port (int), path (str, with the query string)
+Returns: tuple of (status (int), body (bytes))
+"""
+async def http_get(host, port, path):
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write(f"GET {path} HTTP/1.1\r\nHost: {host}:{port}\r\nConnection: close\r\n\r\n".encode())
+    response = await reader.read()
+    writer.close()
+    head, _, body = response.partition(b"\r\n\r\n")
+    return int(head.split(b" ", 2)[1]), body
+
+
+"""
+Description: Runs a headless simulation behind a server on an ephemeral localhost port, subscribes to it and checks that
+every decoded sample matches what the backend logged to within half the quantization step, and that the snapshot and
+history endpoints answer.
+Parameters: subscribers (int), duration (float, simulated seconds), speed (float, multiple of real time), num_fans
+(int), num_subsystems (int)
+Returns: dict of results
+"""
+async def self_test(subscribers=4, duration=30.0, speed=20.0, num_fans=5, num_subsystems=6):
+    from headless import HeadlessRunner  # Only the self test runs a simulation
+
+    runner = HeadlessRunner(num_fans, num_subsystems, [2000] * num_fans, seed=0)
+    logged = {}
+
+    # Runs before the server in the backend's sinks, so a sample is always logged before it can be received
+    class SampleLog:
+        def append(self, elapsed_time, temperatures, fan_speeds):
+            logged[runner.backend.telemetry.count] = (temperatures.copy(), fan_speeds.copy())
+
+    runner.backend.log_sinks = [SampleLog()]
+    server = TelemetryServer(port=0)
+    port = server.start()
+    server.attach(runner.backend)
+    clients = [TelemetrySubscriber(port=port) for _ in range(subscribers)]
+    for client in clients:
+        await client.connect()
+
+    thread = threading.Thread(target=runner.run, args=(duration, speed))
+    started = time.perf_counter()
+    thread.start()
+    errors = {"temp": 0.0, "speed": 0.0}
+    samples = 0
+
+    async def consume(client):
+        nonlocal samples
+        while True:
+            sample = await client.receive()
+            samples += 1
+            temperatures, fan_speeds = logged[sample["sample_count"]]
+            errors["temp"] = max(errors["temp"], float(np.abs(sample["temp"] - temperatures).max()))
+            errors["speed"] = max(errors["speed"], float(np.abs(sample["speed"] - fan_speeds).max()))
+
+    tasks = [asyncio.ensure_future(consume(client)) for client in clients]
+    await asyncio.get_running_loop().run_in_executor(None, thread.join)
+    await asyncio.sleep(0.2)
+    wall_time = time.perf_counter() - started
+    _, snapshot = await http_get("127.0.0.1", port, "/snapshot")
+    _, history = await http_get("127.0.0.1", port, "/history?seconds=60&format=binary")
+    _, history_json = await http_get("127.0.0.1", port, "/history?seconds=60")
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    for client in clients:
+        await client.close()
+    server.stop()
+    frames = sum(client.frames_received for client in clients)
+    return {
+        "samples_logged": len(logged),
+        "frames_received": frames,
+        "frames_skipped": server.frames_skipped,
+        "frames_per_second": frames / wall_time,
+        "stream_bytes_per_frame": sum(client.bytes_received for client in clients) / max(frames, 1),
+        "snapshot_json_bytes": len(snapshot),
+        "history_60s_binary_bytes": len(history),
+        "history_60s_json_bytes": len(history_json),
+        "max_temperature_error": errors["temp"],
+        "max_fan_speed_error": errors["speed"],
+        "within_quantization": errors["temp"] <= QUANTA["temp"] / 2 + 1e-9 and
+                               errors["speed"] <= QUANTA["speed"] / 2 + 1e-9,
+    }
+
+
+"""
+Description: Prints the samples of a running server's stream, e.g. one started with `headless.py --serve`.
+Parameters: host (str), port (int), count (int or None, samples to print; None prints until interrupted)
+"""
+async def watch(host, port, count=None):
+    client = TelemetrySubscriber(host, port)
+    await client.connect()
+    try:
+        printed = 0
+        while count is None or printed < count:
+            sample = await client.receive()
+            print(f"{sample['elapsed_time']:10.1f} s  max temperature {sample['temp'].max():7.2f} °C  mean fan speed "
+                  f"{sample['speed'].mean():8.1f} RPM  ({client.bytes_received / client.frames_received:.0f} bytes "
+                  f"per frame)")
+            printed += 1
+    finally:
+        await client.close()
+
+
+"""
+Description: Entry point of the telemetry server tools: a localhost self test, or a client that prints a stream.
+Parameters: argv (list of str or None)
+Returns: int (exit code; 1 if the self test failed)
+"""
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Test the telemetry server on localhost, or watch a server's stream.")
+    parser.add_argument("command", choices=["selftest", "watch"])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--subscribers", type=int, default=4, help="stream subscribers of the self test")
+    parser.add_argument("--duration", type=float, default=30, help="simulated seconds of the self test")
+    parser.add_argument("--speed", type=float, default=20, help="multiple of real time of the self test")
+    parser.add_argument("--fans", type=int, default=5, help="number of fans of the self test")
+    parser.add_argument("--subsystems", type=int, default=6, help="number of subsystems of the self test")
+    parser.add_argument("--count", type=int, default=None, help="samples to print before exiting (watch only)")
+    args = parser.parse_args(argv)
+
+    if args.command == "watch":
+        try:
+            asyncio.run(watch(args.host, args.port, args.count))
+        except KeyboardInterrupt:
+            pass
+        return 0
+    result = asyncio.run(self_test(args.subscribers, args.duration, args.speed, args.fans, args.subsystems))
+    for key, value in result.items():
+        print(f"{key}: {value:.4f}" if isinstance(value, float) else f"{key}: {value}")
+    return 0 if result["within_quantization"] and result["frames_received"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
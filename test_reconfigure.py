@@ -0,0 +1,73 @@
+import numpy as np
+import pytest
+from alarm_engine import AlarmEngine
+from control_engine import ControlEngine
+from headless import HeadlessRunner
+from subsystem_simulation import SubsystemBank
+
+
+"""
+Description: Creates a headless runner with 6 subsystems that has already run for a few control updates.
+Parameters: num_fans (int), keyword arguments passed on to HeadlessRunner
+Returns: HeadlessRunner
+"""
+def running(num_fans=5, **kwargs):
+    runner = HeadlessRunner(num_fans, 6, [2000] * num_fans, seed=1, **kwargs)
+    runner.run(1.0)
+    return runner
+
+
+"""
+Description: Checks that the backend and the simulation both have the given counts and that the loop still ticks.
+Parameters: runner (HeadlessRunner), num_fans (int), num_subsystems (int)
+"""
+def assert_consistent(runner, num_fans, num_subsystems):
+    assert (runner.backend.num_fans, runner.backend.num_subsystems) == (num_fans, num_subsystems)
+    assert runner.subsystems.num_subsystems == num_subsystems
+    count = runner.backend.telemetry.count
+    runner.run(1.0)
+    assert runner.backend.telemetry.count == count + 10
+
+
+"""Description: Alarm engine that rejects any change of the channel counts, standing in for any configuration the
+backend turns down after the simulation could already have been resized."""
+class RejectingAlarmEngine(AlarmEngine):
+    def resized(self, channels, scales=None):
+        raise ValueError("The alarm rules do not fit the new channel counts.")
+
+
+def test_rejected_alarm_engine_leaves_the_loop_unchanged():
+    runner = running(alarm_engine=RejectingAlarmEngine({"temp": 6, "speed": 5}))
+    with pytest.raises(ValueError):
+        runner.control_loop.reconfigure(num_subsystems=4)
+    assert_consistent(runner, 5, 6)
+
+
+def test_rejected_control_zone_leaves_the_loop_unchanged():
+    control_engine = ControlEngine(5, 6, [{"subsystems": [5], "fans": "all"}])
+    runner = running(control_engine=control_engine)
+    with pytest.raises(ValueError):
+        runner.control_loop.reconfigure(num_subsystems=4)
+    assert_consistent(runner, 5, 6)
+    assert runner.backend.control_engine is control_engine
+
+
+def test_rejected_simulation_size_leaves_the_backend_unchanged():
+    runner = running(num_fans=6)
+    runner.subsystems = runner.control_loop.subsystems = SubsystemBank(6, seed=1, groups=2)
+    with pytest.raises(ValueError):
+        runner.control_loop.reconfigure(num_subsystems=5)
+    assert_consistent(runner, 6, 6)
+
+
+def test_alarm_rule_on_removed_channel_keeps_its_remaining_channels():
+    alarm_engine = AlarmEngine({"temp": 6, "speed": 5},
+                               [{"name": "hot", "group": "temp", "channels": [1, 5], "above": 0.0}])
+    runner = running(alarm_engine=alarm_engine)
+    runner.control_loop.reconfigure(num_subsystems=4)
+    assert_consistent(runner, 5, 4)
+    assert list(np.flatnonzero(runner.backend.alarm_engine.active_channels("temp"))) == [1]
+
+    runner.control_loop.reconfigure(num_subsystems=6)
+    assert_consistent(runner, 5, 6)
+    assert list(np.flatnonzero(runner.backend.alarm_engine.active_channels("temp"))) == [1, 5]
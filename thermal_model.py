@@ -0,0 +1,157 @@
+import json
+import numpy as np
+from subsystem_simulation import SubsystemBank
+
+"""Description: Sparse matrix of the cooling effect of each fan on each subsystem, stored as (subsystem, fan, value)
+triplets sorted by subsystem. A matrix-vector product is one gather, one multiply and one np.bincount over the non-zero
+entries, so its cost grows with the number of couplings rather than with fans x subsystems. Entries given more than
+once for the same fan and subsystem add up."""
+class CouplingMatrix:
+    def __init__(self, num_subsystems, num_fans, subsystems, fans, values):
+        subsystems = np.asarray(subsystems, dtype=np.intp)
+        fans = np.asarray(fans, dtype=np.intp)
+        values = np.asarray(values, dtype=float)
+        if not subsystems.shape == fans.shape == values.shape:
+            raise ValueError("Coupling subsystems, fans and values must have the same length.")
+        if subsystems.size and (subsystems.min() < 0 or subsystems.max() >= num_subsystems):
+            raise ValueError(f"Coupling subsystem indices must be between 0 and {num_subsystems - 1}.")
+        if fans.size and (fans.min() < 0 or fans.max() >= num_fans):
+            raise ValueError(f"Coupling fan indices must be between 0 and {num_fans - 1}.")
+        order = np.lexsort((fans, subsystems))
+        self.shape = (num_subsystems, num_fans)
+        self.rows = subsystems[order]
+        self.columns = fans[order]
+        self.values = values[order]
+
+    """
+    Description: Builds a coupling matrix from blocks, each giving one cooling value for every pair of a set of fans
+    and a set of subsystems. A set is a list of 0-based indices, a single index, {"start": i, "stop": j} for the range
+    i..j-1, or "all".
+    Parameters: blocks (list of dict with "fans", "subsystems" and "cooling"), num_subsystems (int), num_fans (int)
+    Returns: CouplingMatrix
+    """
+    @classmethod
+    def from_blocks(cls, blocks, num_subsystems, num_fans):
+        subsystems, fans, values = [], [], []
+        for block in blocks:
+            block_subsystems = cls._selection(block["subsystems"], num_subsystems)
+            block_fans = cls._selection(block["fans"], num_fans)
+            subsystems.append(np.repeat(block_subsystems, len(block_fans)))
+            fans.append(np.tile(block_fans, len(block_subsystems)))
+            values.append(np.full(len(block_subsystems) * len(block_fans), float(block["cooling"])))
+        if not blocks:
+            return cls(num_subsystems, num_fans, [], [], [])
+        return cls(num_subsystems, num_fans, np.concatenate(subsystems), np.concatenate(fans), np.concatenate(values))
+
+    """
+    Description: Converts a fan or subsystem selection of a coupling block into an array of indices.
+    Parameters: selection (list, int, dict or "all"), count (int)
+    Returns: numpy array of int
+    """
+    @staticmethod
+    def _selection(selection, count):
+        if selection == "all":
+            return np.arange(count)
+        if isinstance(selection, dict):
+            return np.arange(selection["start"], selection["stop"])
+        return np.atleast_1d(np.asarray(selection, dtype=np.intp))
+
+    """
+    Description: Returns the number of non-zero couplings.
+    Returns: int
+    """
+    @property
+    def nnz(self):
+        return len(self.values)
+
+    """
+    Description: Multiplies the matrix by a vector with one value per fan.
+    Parameters: vector (numpy array)
+    Returns: numpy array with one value per subsystem
+    """
+    def dot(self, vector):
+        return np.bincount(self.rows, weights=self.values * vector[self.columns], minlength=self.shape[0])
+
+
+"""Description: Subsystem simulation driven by a sparse fan-to-subsystem coupling matrix instead of the mean of all fan
+speeds. On every step each subsystem cools by the sum over its coupled fans of the fan's speed (in thousands of RPM)
+times the coupling, heats up by its heat load, and relaxes towards the ambient temperature by `ambient_coefficient`
+of the difference; the random heat spikes and the temperature floor of SubsystemBank stay the same. The cooling is
+recomputed with one sparse matrix-vector product whenever the fan speeds change. A coupling of 0.25 / num_fans between
+every fan and every subsystem, without heat load or ambient term, reproduces SubsystemBank."""
+class ThermalModel(SubsystemBank):
+    def __init__(self, num_subsystems, num_fans, coupling, heat_load=0.0, ambient=None, ambient_coefficient=0.0,
+                 seed=None):
+        super().__init__(num_subsystems, seed=seed)
+        if coupling.shape != (num_subsystems, num_fans):
+            raise ValueError("Coupling matrix must have one row per subsystem and one column per fan.")
+        self.num_fans = num_fans
+        self.coupling = coupling
+        self.heat_load = np.broadcast_to(np.asarray(heat_load, dtype=float), (num_subsystems,)).copy()
+        self.ambient = ambient
+        self.ambient_coefficient = ambient_coefficient
+        self.blocks = None  # Coupling blocks of the configuration, used to rebuild the matrix on resize
+        if np.any(self.heat_load):
+            self.set_cooling(-self.heat_load)
+
+    """
+    Description: Creates a thermal model from a JSON configuration file or an already loaded configuration. The file
+    holds a "coupling" list of blocks (see CouplingMatrix.from_blocks), with "cooling" in °C per step per 1000 RPM, and
+    optionally "heat_load" (°C per step, one value or one per subsystem), "ambient" (°C) with "ambient_coefficient"
+    (fraction of the difference to ambient recovered per step), "spike_probability", "spike_range" and
+    "min_temperature".
+    Parameters: config (str path or dict), num_subsystems (int), num_fans (int), seed (int or None)
+    Returns: ThermalModel
+    """
+    @classmethod
+    def from_config(cls, config, num_subsystems, num_fans, seed=None):
+        if isinstance(config, str):
+            with open(config) as file:
+                config = json.load(file)
+        coupling = CouplingMatrix.from_blocks(config.get("coupling", []), num_subsystems, num_fans)
+        model = cls(num_subsystems, num_fans, coupling, config.get("heat_load", 0.0), config.get("ambient"),
+                    config.get("ambient_coefficient", 0.0), seed)
+        model.spike_probability = config.get("spike_probability", model.spike_probability)
+        model.spike_range = tuple(config.get("spike_range", model.spike_range))
+        model.min_temperature = config.get("min_temperature", model.min_temperature)
+        model.blocks = config.get("coupling", [])
+        return model
+
+    """
+    Description: Changes the number of subsystems and fans in place. A model created from a configuration rebuilds its
+    coupling matrix from the configured blocks, so "all" and ranges follow the new counts; otherwise the couplings of
+    the remaining fans and subsystems are kept. Added subsystems get the heat load of the last one. The new coupling is
+    built before anything is changed, so a configuration that no longer fits raises ValueError and leaves the model as
+    it was.
+    Parameters: num_subsystems (int), num_fans (int or None)
+    """
+    def resize(self, num_subsystems, num_fans=None):
+        num_fans = self.num_fans if num_fans is None else num_fans
+        if self.blocks is not None:
+            coupling = CouplingMatrix.from_blocks(self.blocks, num_subsystems, num_fans)
+        else:
+            kept = (self.coupling.rows < num_subsystems) & (self.coupling.columns < num_fans)
+            coupling = CouplingMatrix(num_subsystems, num_fans, self.coupling.rows[kept], self.coupling.columns[kept],
+                                      self.coupling.values[kept])
+        added = np.full(max(num_subsystems - self.num_subsystems, 0), self.heat_load[-1])
+        self.heat_load = np.concatenate([self.heat_load[:num_subsystems], added])
+        super().resize(num_subsystems, num_fans)
+        self.num_fans = num_fans
+        self.coupling = coupling
+
+    """
+    Description: Sets the fan speeds and recomputes every subsystem's net cooling per step.
+    Parameters: fan_speeds (list of floats)
+    """
+    def set_fan_speeds(self, fan_speeds):
+        self.fan_speeds = fan_speeds
+        self.set_cooling(self.coupling.dot(np.asarray(fan_speeds, dtype=float) / 1000) - self.heat_load)
+
+    """
+    Description: Advances every subsystem by one simulation step.
+    Returns: numpy array of floats
+    """
+    def output_temperatures(self):
+        if self.ambient is not None and self.ambient_coefficient:
+            self.temperatures += self.ambient_coefficient * (self.ambient - self.temperatures)
+        return super().output_temperatures()
@@ -0,0 +1,138 @@
+import argparse
+import sys
+import time
+import numpy as np
+from backend import Backend
+from control_engine import ControlEngine
+from control_loop import TICK_INTERVAL
+from headless import SimulatedClock
+from sensor_trace import Trace
+
+"""Description: Drives a fresh Backend from a trace. Each recorded sample is fed to the backend at its recorded time on
+a SimulatedClock, so the control engine sees the same inputs and time steps as during the recording and, with the same
+control configuration, reproduces the recorded fan speeds exactly. run() replays headless at a multiple of real time or
+as fast as possible; tick() gives the replayer the interface of a ControlLoop, so a SimulationWorker can drive it behind
+the GUI."""
+class TraceReplayer:
+    def __init__(self, path, control_engine=None, speed=1.0, instrumentation=None):
+        self.trace = Trace(path)
+        metadata = self.trace.metadata
+        if control_engine is None and metadata.get("control_config") is not None:
+            control_engine = ControlEngine.from_config(metadata["control_config"], self.trace.num_fans,
+                                                       self.trace.num_subsystems)
+        self.clock = SimulatedClock()
+        self.backend = Backend(self.trace.num_fans, self.trace.num_subsystems, metadata["max_rpms"], clock=self.clock,
+                               control_engine=control_engine)
+        self.speed = speed
+        self.position = 0
+        self.tick_count = 0
+        self.instrumentation = instrumentation
+        self.backend.instrumentation = instrumentation
+        self.max_deviation = 0.0
+
+    """
+    Description: Returns whether every sample of the trace has been replayed.
+    Returns: bool
+    """
+    def finished(self):
+        return self.position >= len(self.trace)
+
+    """
+    Description: Feeds the next recorded sample to the backend and tracks how far the fan speeds deviate from the
+    recorded ones.
+    """
+    def step(self):
+        record = self.trace.records[self.position]
+        self.position += 1
+        self.clock.now = float(record["time"])
+        self.backend.sample_temperatures(record["temp"])
+        self.backend.update_fan_speeds()
+        deviation = float(np.max(np.abs(self.backend.fan_speeds.astype(np.float32) - record["speed"]), initial=0.0))
+        if deviation > self.max_deviation:
+            self.max_deviation = deviation
+
+    """
+    Description: Advances the replay by one tick of TICK_INTERVAL seconds of real time, feeding every sample whose
+    recorded time falls into the corresponding `speed` times longer stretch of trace time.
+    Returns: bool (True if the backend was updated during this tick)
+    """
+    def tick(self):
+        if self.finished():
+            return False
+        self.tick_count += 1
+        until = self.trace.records["time"][0] + self.tick_count * TICK_INTERVAL * self.speed
+        updated = False
+        while not self.finished() and self.trace.records["time"][self.position] <= until:
+            self.step()
+            updated = True
+        return updated
+
+    """
+    Description: Replays the whole trace without a GUI.
+    Parameters: speed (float or None, multiple of real time; None runs as fast as possible), on_control (callable or None,
+    called with the backend after every sample)
+    Returns: dict with the number of samples, the simulated and wall-clock durations and the largest fan speed deviation
+    from the recording (in RPM)
+    """
+    def run(self, speed=None, on_control=None):
+        times = self.trace.records["time"]
+        wall_start = time.perf_counter()
+        while not self.finished():
+            if speed:
+                delay = wall_start + (times[self.position] - times[0]) / speed - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            self.step()
+            if on_control is not None:
+                on_control(self.backend)
+        wall_time = time.perf_counter() - wall_start
+        return {
+            "samples": len(self.trace),
+            "simulated_time": self.trace.duration(),
+            "wall_time": wall_time,
+            "speedup": self.trace.duration() / wall_time if wall_time > 0 else float("inf"),
+            "max_deviation": self.max_deviation,
+        }
+
+
+"""
+Description: Entry point of the trace tool.
+Parameters: argv (list of str or None)
+Returns: int (exit code)
+"""
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Inspect or replay a recorded sensor trace.")
+    parser.add_argument("command", choices=["info", "replay"])
+    parser.add_argument("trace", help="trace file")
+    parser.add_argument("--speed", type=float, default=0,
+                        help="multiple of real time to replay at (0 replays as fast as possible)")
+    parser.add_argument("--control-config", default=None,
+                        help="JSON file with the fan control zones to replay with instead of the recorded ones")
+    parser.add_argument("--csv", action="store_true", help="export the replayed data to CSV when the replay finishes")
+    args = parser.parse_args(argv)
+
+    if args.command == "info":
+        trace = Trace(args.trace)
+        print(f"Samples: {len(trace)} over {trace.duration():.1f} s")
+        print(f"Subsystems: {trace.num_subsystems}, fans: {trace.num_fans}, seed: {trace.metadata.get('seed')}")
+        return 0
+
+    control_engine = None
+    if args.control_config is not None:
+        trace = Trace(args.trace)
+        control_engine = ControlEngine.from_config(args.control_config, trace.num_fans, trace.num_subsystems)
+    replayer = TraceReplayer(args.trace, control_engine)
+    result = replayer.run(speed=args.speed or None)
+    temperatures, fan_speeds = replayer.backend.get_current_data()
+    print(f"Replayed {result['samples']} samples ({result['simulated_time']:.1f} s) in {result['wall_time']:.2f} s "
+          f"({result['speedup']:.0f}x real time)")
+    print(f"Max temperature: {np.max(temperatures):.3f} °C, mean fan speed: {np.mean(fan_speeds):.3f} RPM")
+    print(f"Largest fan speed deviation from the recording: {result['max_deviation']:.3f} RPM")
+    if args.csv:
+        filenames = replayer.backend.request_csv(background=False)
+        print(f"CSV file created: {', '.join(filenames)}" if filenames else "No data to write.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,25 +1,84 @@
 from PyQt6.QtWidgets import (
-    QApplication, QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QLabel, QSpinBox, QTableWidget,
-    QTableWidgetItem, QHeaderView, QScrollArea
+    QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QLabel, QSpinBox, QTableWidget,
+    QTableWidgetItem, QTableView, QHeaderView, QScrollArea
 )
-from PyQt6.QtCore import Qt
-from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
-from matplotlib.figure import Figure
-
-
-# This class is used to create a widget that displays a log plot of a specific data series.
+from PyQt6.QtCore import Qt, QObject, QEvent, QAbstractTableModel, QModelIndex
+from PyQt6.QtGui import QColor
+from backend import STATS_WINDOW
+import numpy as np
+import threading
+import time
+
+
+# Maximum number of fans and subsystems that can be configured
+MAX_CHANNELS = 1000
+# Maximum number of robots that can be simulated as a fleet
+MAX_ROBOTS = 10000
+# Height of a table row holding a plot (in pixels)
+PLOT_ROW_HEIGHT = 400
+# Channel statistics shown in the data tables, as (column header, ChannelStats key)
+STATS_COLUMNS = [("Min", "min"), ("Mean", "mean"), ("Max", "max"), ("Std Dev", "std"), ("p50", "p50"), ("p95", "p95")]
+# Number of active alarms listed by name above the data tables
+MAX_LISTED_ALARMS = 5
+# Background of the current value of a channel with an active alarm
+ALARM_COLOR = QColor(248, 215, 218)
+
+# Seconds of empty headroom kept to the right of the newest sample, so the axes only need a full redraw once the data
+# has scrolled past it
+SCROLL_MARGIN = 30
+
+# matplotlib is the slowest import of the application and only the data tracking screen uses it, so it is not imported
+# before the configuration menu is shown. load_matplotlib() imports it when the first plot is created, and
+# preload_matplotlib() can warm it up on a background thread while the menu is open.
+Figure = None
+FigureCanvas = None
+
+
+# This function imports matplotlib's figure and Qt canvas classes the first time they are needed.
+def load_matplotlib():
+    global Figure, FigureCanvas
+    if FigureCanvas is None:
+        from matplotlib.figure import Figure as figure_class
+        from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg
+        Figure = figure_class
+        FigureCanvas = FigureCanvasQTAgg
+
+
+# This function imports the Qt-independent part of matplotlib on a background thread, so the first plot only has to
+# import the Qt canvas. An import that is still running when the first plot needs it is simply waited for.
+def preload_matplotlib():
+    def preload():
+        import matplotlib.figure
+        import matplotlib.backends.backend_agg
+    threading.Thread(target=preload, name="MatplotlibPreload", daemon=True).start()
+
+
+# This class is used to create a widget that displays a log plot of one channel of the backend's telemetry history.
+# The history is read through the backend's min/max decimation pyramid, which returns about as many points as the canvas
+# is wide, so the plot cost depends on the widget width rather than on the history length. The axes are drawn once and
+# cached as a background; each update only moves the data line and blits it on top, and a full redraw only happens when
+# the data scrolls out of the current x-window.
 class LogPlotWidget(QWidget):
-    def __init__(self, log_data, index, y_min, y_max, y_label, parent=None):
+    def __init__(self, history, group, index, y_min, y_max, y_label, parent=None):
         super().__init__(parent)
-        self.log_data = log_data
+        self.history = history
+        self.group = group
         self.index = index
         self.y_min = y_min
         self.y_max = y_max
         self.y_label = y_label
 
+        load_matplotlib()
         self.figure = Figure()
         self.canvas = FigureCanvas(self.figure)
         self.ax = self.figure.add_subplot(111)
+        self.ax.set_ylim(self.y_min, self.y_max)
+        self.ax.set_xlabel("Elapsed Time (s)")
+        self.ax.set_ylabel(self.y_label)
+        self.line, = self.ax.plot([], [], animated=True)
+        self.x_limits = None
+        self.background = None
+        self.canvas.mpl_connect("draw_event", self.on_draw)
 
         layout = QVBoxLayout()
         layout.addWidget(self.canvas)
@@ -27,34 +86,272 @@ class LogPlotWidget(QWidget):
 
         self.update_plot()
 
-    # This method updates the log data that the plot is based on.
-    def update_log_data(self, log_data):
-        self.log_data = log_data
+    # This method updates the history that the plot is based on.
+    def update_log_data(self, history):
+        self.history = history
+        self.x_limits = None
+
+    # This method points a (possibly pooled) plot at another channel and resets its axes.
+    def bind(self, history, group, index, y_min, y_max, y_label):
+        self.history = history
+        self.group = group
+        self.index = index
+        self.y_min = y_min
+        self.y_max = y_max
+        self.y_label = y_label
+        self.ax.set_ylim(self.y_min, self.y_max)
+        self.ax.set_ylabel(self.y_label)
+        self.x_limits = None
+        self.background = None
+
+    # This method caches the freshly drawn axes as the blitting background and draws the data line on top of it.
+    def on_draw(self, event):
+        self.background = self.canvas.copy_from_bbox(self.ax.bbox)
+        self.ax.draw_artist(self.line)
 
     # This method updates the plot with the latest data from the log.
     def update_plot(self):
-        self.ax.clear()
-
-        # Extract time and data values from the log
-        times = [log[0] for log in self.log_data]
-        values = [log[1][self.index] for log in self.log_data]
+        # Get at most about one point per horizontal pixel of this plot's channel
+        times, values = self.history.query(self.group, self.index, max(self.canvas.width(), 100))
+        self.line.set_data(times, values)
 
-        # Set the x-axis range
-        if times:
+        # Only rescale the x-axis once the data has scrolled out of the current window
+        if len(times):
             x_min = times[0] - 5
             x_max = times[-1] + 5
-            self.ax.set_xlim(x_min, x_max)
-
-        # Set the y-axis range
-        self.ax.set_ylim(self.y_min, self.y_max)
-
-        # Plot the data
-        self.ax.plot(times, values)
-        self.ax.set_xlabel("Elapsed Time (s)")
-        self.ax.set_ylabel(self.y_label)
-
-        # Redraw the canvas
-        self.canvas.draw()
+            if self.x_limits is None or x_max > self.x_limits[1] or x_min > self.x_limits[0] + SCROLL_MARGIN:
+                self.x_limits = (x_min, x_max + SCROLL_MARGIN)
+                self.ax.set_xlim(*self.x_limits)
+                self.background = None
+
+        # Redraw the whole canvas if the axes changed, otherwise blit the line over the cached background
+        if self.background is None:
+            self.canvas.draw()
+        else:
+            self.canvas.restore_region(self.background)
+            self.ax.draw_artist(self.line)
+            self.canvas.blit(self.ax.bbox)
+
+
+# This class attaches pooled LogPlotWidgets to the rows of a table that are visible in its viewport. Plots are only
+# created for visible rows, and a plot whose row scrolls out of view is detached and reused for the next row that
+# scrolls in, so the number of canvases stays bounded by the viewport size rather than the number of rows.
+class PlotRowPool(QObject):
+    def __init__(self, table, column, history, plot_args):
+        super().__init__(table)
+        self.table = table
+        self.column = column
+        self.history = history
+        self.plot_args = plot_args  # Maps a row to (group, index, y_min, y_max, y_label)
+        self.active = {}
+        self.free = []
+        self.holder = QWidget(table)  # Hidden parent of the detached plots
+        self.holder.hide()
+        table.verticalScrollBar().valueChanged.connect(self.refresh_visible)
+        table.viewport().installEventFilter(self)
+
+    # This method refreshes the visible rows whenever the table's viewport is resized or shown.
+    def eventFilter(self, obj, event):
+        if event.type() in (QEvent.Type.Resize, QEvent.Type.Show):
+            self.refresh_visible()
+        return False
+
+    # This method returns the range of rows that are currently visible in the table's viewport.
+    def visible_rows(self):
+        first = self.table.rowAt(0)
+        if first == -1:
+            return range(0)
+        last = self.table.rowAt(self.table.viewport().height() - 1)
+        if last == -1:
+            last = self.table.model().rowCount() - 1
+        return range(first, last + 1)
+
+    # This method attaches plots to the rows that became visible and detaches them from rows that scrolled away.
+    def refresh_visible(self):
+        visible = self.visible_rows()
+        for row in [row for row in self.active if row not in visible]:
+            self.release(row)
+        for row in visible:
+            if row not in self.active:
+                self.acquire(row)
+
+    # This method attaches a plot to a row, reusing a detached plot when one is available.
+    def acquire(self, row):
+        group, index, y_min, y_max, y_label = self.plot_args(row)
+        if self.free:
+            plot = self.free.pop()
+            plot.bind(self.history, group, index, y_min, y_max, y_label)
+        else:
+            plot = LogPlotWidget(self.history, group, index, y_min, y_max, y_label)
+
+        # The table deletes an index widget when it is removed, so each plot sits in a disposable container
+        container = QWidget()
+        container_layout = QVBoxLayout(container)
+        container_layout.setContentsMargins(0, 0, 0, 0)
+        container_layout.addWidget(plot)
+        self.table.setIndexWidget(self.table.model().index(row, self.column), container)
+        plot.show()
+        plot.update_plot()  # Catch up with the history straight away
+        self.active[row] = plot
+
+    # This method detaches the plot from a row and keeps it for reuse.
+    def release(self, row):
+        plot = self.active.pop(row)
+        plot.setParent(self.holder)
+        self.table.setIndexWidget(self.table.model().index(row, self.column), None)
+        self.free.append(plot)
+
+    # This method changes the number of rows of the table. The plots of removed rows are detached first, so the table
+    # does not delete them along with their rows, and the rows that remain keep their plots.
+    def set_row_count(self, count):
+        for row in [row for row in self.active if row >= count]:
+            self.release(row)
+        self.table.model().set_row_count(count)
+        self.refresh_visible()
+
+    # This method rebinds the attached plots whose channel settings changed (e.g. a fan's maximum RPM).
+    def rebind_changed(self):
+        for row, plot in self.active.items():
+            group, index, y_min, y_max, y_label = self.plot_args(row)
+            if (plot.group, plot.index, plot.y_min, plot.y_max, plot.y_label) != (group, index, y_min, y_max, y_label):
+                plot.bind(self.history, group, index, y_min, y_max, y_label)
+
+    # This method redraws the plots of the visible rows, recording each plot's render time when instrumentation is given.
+    def update_plots(self, instrumentation=None):
+        for plot in self.active.values():
+            started = time.perf_counter()
+            plot.update_plot()
+            if instrumentation is not None:
+                instrumentation.record("plot", time.perf_counter() - started)
+
+
+# This class is the table model of the data tables, with one row per channel (fan, subsystem or robot). The first column
+# holds the channel's name, the value columns are kept in one NumPy array that each refresh copies the backend's arrays
+# into, and an optional last column stays empty for the row's plot. Values are rounded to the decimals they are shown
+# with, so a refresh can tell which cells would display something new; it only stages those, and commit() then emits a
+# single ranged dataChanged covering them. Cells are only formatted when the view paints them, so a refresh never
+# allocates per cell and its cost hardly grows with the number of rows.
+class ChannelTableModel(QAbstractTableModel):
+    def __init__(self, label, headers, rows, decimals, editable=None, highlight_column=None, graph_column=False,
+                 parent=None):
+        super().__init__(parent)
+        self.label = label  # Name of a row, followed by its 1-based number
+        self.headers = list(headers)
+        self.decimals = list(decimals)  # Decimals shown in each value column
+        self.editable = dict(editable or {})  # Maps an editable column to the (minimum, maximum) value it accepts
+        self.highlight_column = highlight_column  # Column painted with ALARM_COLOR on highlighted rows
+        self.graph_column = graph_column
+        self.values = np.full((rows, len(self.decimals)), np.nan)
+        self.highlighted = np.zeros(rows, dtype=bool)
+        self._dirty = None  # Bounding box (first row, last row, first column, last column) of the staged changes
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.values)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else 1 + len(self.decimals) + int(self.graph_column)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        row, column = index.row(), index.column()
+        if role == Qt.ItemDataRole.DisplayRole:
+            if column == 0:
+                return f"{self.label} {row + 1}"
+            if column <= len(self.decimals):
+                value = self.values[row, column - 1]
+                return "" if value != value else f"{value:.{self.decimals[column - 1]}f}"
+        elif role == Qt.ItemDataRole.EditRole and column in self.editable:
+            value = self.values[row, column - 1]
+            return int(value) if self.decimals[column - 1] == 0 else float(value)
+        elif role == Qt.ItemDataRole.BackgroundRole and column == self.highlight_column and self.highlighted[row]:
+            return ALARM_COLOR
+        return None
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role != Qt.ItemDataRole.DisplayRole:
+            return None
+        if orientation == Qt.Orientation.Horizontal:
+            return self.headers[section] if section < len(self.headers) else None
+        return str(section + 1)
+
+    def flags(self, index):
+        flags = Qt.ItemFlag.ItemIsEnabled | Qt.ItemFlag.ItemIsSelectable
+        if index.column() in self.editable:
+            flags |= Qt.ItemFlag.ItemIsEditable
+        return flags
+
+    def setData(self, index, value, role=Qt.ItemDataRole.EditRole):
+        column = index.column()
+        if role != Qt.ItemDataRole.EditRole or column not in self.editable:
+            return False
+        try:
+            value = round(float(value), self.decimals[column - 1])
+        except (TypeError, ValueError):
+            return False
+        minimum, maximum = self.editable[column]
+        if not minimum <= value <= maximum:
+            return False
+        self.values[index.row(), column - 1] = value
+        self.dataChanged.emit(index, index)
+        return True
+
+    # This method replaces the column headers.
+    def set_headers(self, headers):
+        self.headers = list(headers)
+        self.headerDataChanged.emit(Qt.Orientation.Horizontal, 0, len(self.headers) - 1)
+
+    # This method adds or removes rows at the end of the table. Added rows start without values.
+    def set_row_count(self, rows):
+        old = len(self.values)
+        if rows > old:
+            self.beginInsertRows(QModelIndex(), old, rows - 1)
+            self.values = np.vstack([self.values, np.full((rows - old, len(self.decimals)), np.nan)])
+            self.highlighted = np.concatenate([self.highlighted, np.zeros(rows - old, dtype=bool)])
+            self.endInsertRows()
+        elif rows < old:
+            self.beginRemoveRows(QModelIndex(), rows, old - 1)
+            self.values = self.values[:rows].copy()
+            self.highlighted = self.highlighted[:rows].copy()
+            self.endRemoveRows()
+
+    # This method stages new values for a value column, either for every row or for a range of rows, and returns the
+    # number of cells whose displayed value changed.
+    def set_column(self, column, values, rows=None):
+        first = 0 if rows is None else rows.start
+        stop = min(len(self.values) if rows is None else rows.stop, len(self.values), first + len(values))
+        values = np.round(np.asarray(values[:stop - first], dtype=float), self.decimals[column - 1])
+        current = self.values[first:stop, column - 1]
+        changed = np.flatnonzero((values != current) & ~(np.isnan(values) & np.isnan(current)))
+        if len(changed):
+            current[changed] = values[changed]
+            self._stage(first + changed[0], first + changed[-1], column, column)
+        return len(changed)
+
+    # This method stages which rows have their highlight column painted, from a mask of the first rows.
+    def set_highlighted(self, mask):
+        count = min(len(mask), len(self.highlighted))
+        changed = np.flatnonzero(self.highlighted[:count] != mask[:count])
+        if len(changed):
+            self.highlighted[changed] = mask[changed]
+            self._stage(changed[0], changed[-1], self.highlight_column, self.highlight_column)
+
+    # This method grows the bounding box of the staged changes.
+    def _stage(self, first_row, last_row, first_column, last_column):
+        if self._dirty is None:
+            self._dirty = (first_row, last_row, first_column, last_column)
+        else:
+            rows_first, rows_last, columns_first, columns_last = self._dirty
+            self._dirty = (min(rows_first, first_row), max(rows_last, last_row), min(columns_first, first_column),
+                           max(columns_last, last_column))
+
+    # This method tells the views about every staged change with one ranged dataChanged.
+    def commit(self):
+        if self._dirty is None:
+            return
+        first_row, last_row, first_column, last_column = self._dirty
+        self._dirty = None
+        last_row = min(last_row, len(self.values) - 1)
+        if first_row <= last_row:
+            self.dataChanged.emit(self.index(int(first_row), first_column), self.index(int(last_row), last_column))
 
 
 # This is the main UI class that controls the application's user interface.
@@ -85,7 +382,7 @@ class UI(QWidget):
                 border-radius: 10px;
                 padding: 5px;
             }
-            QTableWidget {
+            QTableView {
                 background-color: white;
                 border-radius: 10px;
             }
@@ -118,18 +415,24 @@ class UI(QWidget):
         input_layout = QHBoxLayout()
 
         self.fan_spinbox = QSpinBox()
-        self.fan_spinbox.setRange(1, 20)
+        self.fan_spinbox.setRange(1, MAX_CHANNELS)
         self.fan_spinbox.setPrefix("# of fans: ")
         self.fan_spinbox.setStyleSheet("font-size: 14px;")
         self.fan_spinbox.valueChanged.connect(self.update_fan_list)
         input_layout.addWidget(self.fan_spinbox)
 
         self.subsystem_spinbox = QSpinBox()
-        self.subsystem_spinbox.setRange(1, 20)
+        self.subsystem_spinbox.setRange(1, MAX_CHANNELS)
         self.subsystem_spinbox.setPrefix("# of subsystems: ")
         self.subsystem_spinbox.setStyleSheet("font-size: 14px;")
         input_layout.addWidget(self.subsystem_spinbox)
 
+        self.robot_spinbox = QSpinBox()
+        self.robot_spinbox.setRange(1, MAX_ROBOTS)
+        self.robot_spinbox.setPrefix("# of robots: ")
+        self.robot_spinbox.setStyleSheet("font-size: 14px;")
+        input_layout.addWidget(self.robot_spinbox)
+
         layout.addLayout(input_layout)
 
         # Fan RPM input table
@@ -179,16 +482,18 @@ class UI(QWidget):
         try:
             num_fans = self.fan_spinbox.value()
             num_subsystems = self.subsystem_spinbox.value()
+            num_robots = self.robot_spinbox.value()
             max_rpms = [int(self.fan_table.cellWidget(i, 1).text()) for i in range(num_fans)]
-            print(f"Loading configuration: num_fans={num_fans}, num_subsystems={num_subsystems}, max_rpms={max_rpms}")
-            self.main_app.initialize(num_fans, num_subsystems, max_rpms)
+            print(f"Loading configuration: num_fans={num_fans}, num_subsystems={num_subsystems}, max_rpms={max_rpms}, "
+                  f"num_robots={num_robots}")
+            self.main_app.initialize(num_fans, num_subsystems, max_rpms, num_robots)
             self.backend = self.main_app.backend  # Update the backend reference
         except Exception as e:
             print(f"Error loading configuration: {e}")
 
     # This method quits the application.
     def quit_application(self):
-        QApplication.quit()
+        self.main_app.quit_application()
 
     # This method sets up the UI for the data tracking state.
     def setup_data_tracking_ui(self):
@@ -203,7 +508,9 @@ class UI(QWidget):
         new_layout = QVBoxLayout()
 
         # Title
-        title = QLabel('Temperature/Fan Speed Data')
+        fleet = self.main_app.fleet
+        title = QLabel('Temperature/Fan Speed Data' if fleet is None else
+                       f'Temperature/Fan Speed Data of Robot {fleet.selected_robot + 1}')
         title.setStyleSheet("font-size: 24px; font-weight: bold;")
         title.setAlignment(Qt.AlignmentFlag.AlignCenter)
         new_layout.addWidget(title, alignment=Qt.AlignmentFlag.AlignCenter)
@@ -222,8 +529,8 @@ class UI(QWidget):
         new_layout.addWidget(description_part2, alignment=Qt.AlignmentFlag.AlignCenter)
 
         description_part3 = QLabel('Press "Export to CSV" to export the data to the same directory as the application '
-                                   'location (which will replace an exisiting CSV), or press "Return to Configuration" to '
-                                   'go back.')
+                                   'location (which will replace an exisiting CSV), "Start Continuous Log" to log the whole '
+                                   'run to new CSV files, or "Return to Configuration" to go back.')
         description_part3.setStyleSheet("font-size: 14px;")
         description_part3.setAlignment(Qt.AlignmentFlag.AlignCenter)
         new_layout.addWidget(description_part3, alignment=Qt.AlignmentFlag.AlignCenter)
@@ -242,6 +549,10 @@ class UI(QWidget):
         self.elapsed_time_label.setStyleSheet("font-size: 14px;")
         info_layout.addWidget(self.elapsed_time_label, alignment=Qt.AlignmentFlag.AlignLeft)
 
+        self.alarm_label = QLabel("Active alarms: none")
+        self.alarm_label.setStyleSheet("font-size: 14px; color: #dc3545;")
+        info_layout.addWidget(self.alarm_label, alignment=Qt.AlignmentFlag.AlignLeft)
+
         new_layout.addLayout(info_layout)
 
         # Data tables
@@ -253,12 +564,15 @@ class UI(QWidget):
         fan_speed_title.setStyleSheet("font-size: 18px; font-weight: bold;")
         fan_speed_layout.addWidget(fan_speed_title)
 
-        self.fan_speed_table = QTableWidget()
-        self.fan_speed_table.setColumnCount(4)
-        self.fan_speed_table.setHorizontalHeaderLabels(["Fan", "Max RPM", "Current RPM", "Graph"])
+        self.fan_speed_model = ChannelTableModel(
+            "Fan", [], self.backend.num_fans, [0, 3] + [3] * len(STATS_COLUMNS), editable={1: (1, 10000)},
+            highlight_column=2, graph_column=True)
+        self.fan_speed_table = QTableView()
+        self.fan_speed_table.setModel(self.fan_speed_model)
         self.fan_speed_table.horizontalHeader().setSectionResizeMode(0, QHeaderView.ResizeMode.ResizeToContents)
         self.fan_speed_table.horizontalHeader().resizeSection(0, self.fan_speed_table.columnWidth(0) + 20)  # Add buffer
-        self.fan_speed_table.horizontalHeader().setSectionResizeMode(3, QHeaderView.ResizeMode.Stretch)
+        self.fan_speed_table.horizontalHeader().setSectionResizeMode(3 + len(STATS_COLUMNS),
+                                                                     QHeaderView.ResizeMode.Stretch)
 
         scroll_area_fan = QScrollArea()
         scroll_area_fan.setWidgetResizable(True)
@@ -267,15 +581,12 @@ class UI(QWidget):
 
         data_layout.addLayout(fan_speed_layout)
 
-        # put the fan speeds and graphs into the table
-        self.fan_speed_table.setRowCount(self.backend.num_fans)
-        for i in range(self.backend.num_fans):
-            self.fan_speed_table.setItem(i, 0, QTableWidgetItem(f"Fan {i + 1}"))
-            self.fan_speed_table.setItem(i, 1, QTableWidgetItem(str(self.backend.max_rpms[i])))
-            self.fan_speed_table.setItem(i, 2, QTableWidgetItem("0.000"))
-            log_plot_widget = LogPlotWidget(self.backend.speed_log, i, 0, self.backend.max_rpms[i], "Fan Speed (RPM)")
-            self.fan_speed_table.setCellWidget(i, 3, log_plot_widget)
-            self.fan_speed_table.setRowHeight(i, 400)  # Set row height to 400 pixels
+        # put the fan speeds into the table; graphs are only attached to the visible rows
+        self.fan_speed_table.verticalHeader().setDefaultSectionSize(PLOT_ROW_HEIGHT)
+        self.fan_speed_model.set_column(1, self.backend.max_rpms)
+        self.fan_plot_pool = PlotRowPool(
+            self.fan_speed_table, 3 + len(STATS_COLUMNS), self.backend.decimation,
+            lambda row: ("speed", row, 0, self.backend.max_rpms[row], "Fan Speed (RPM)"))
 
         # Temperature data
         temp_layout = QVBoxLayout()
@@ -283,12 +594,13 @@ class UI(QWidget):
         temp_title.setStyleSheet("font-size: 18px; font-weight: bold;")
         temp_layout.addWidget(temp_title)
 
-        self.temp_table = QTableWidget()
-        self.temp_table.setColumnCount(3)
-        self.temp_table.setHorizontalHeaderLabels(["Subsystem", "Current Temp", "Graph"])
+        self.temp_model = ChannelTableModel("Subsystem", [], self.backend.num_subsystems, [3] + [3] * len(STATS_COLUMNS),
+                                            highlight_column=1, graph_column=True)
+        self.temp_table = QTableView()
+        self.temp_table.setModel(self.temp_model)
         self.temp_table.horizontalHeader().setSectionResizeMode(0, QHeaderView.ResizeMode.ResizeToContents)
         self.temp_table.horizontalHeader().resizeSection(0, self.temp_table.columnWidth(0) + 20)  # Add buffer
-        self.temp_table.horizontalHeader().setSectionResizeMode(2, QHeaderView.ResizeMode.Stretch)
+        self.temp_table.horizontalHeader().setSectionResizeMode(2 + len(STATS_COLUMNS), QHeaderView.ResizeMode.Stretch)
 
         scroll_area_temp = QScrollArea()
         scroll_area_temp.setWidgetResizable(True)
@@ -297,17 +609,44 @@ class UI(QWidget):
 
         data_layout.addLayout(temp_layout)
 
-        # put the temperatures and graphs into the table
-        self.temp_table.setRowCount(self.backend.num_subsystems)
-        for i in range(self.backend.num_subsystems):
-            self.temp_table.setItem(i, 0, QTableWidgetItem(f"Subsystem {i + 1}"))
-            self.temp_table.setItem(i, 1, QTableWidgetItem("0.000"))
-            log_plot_widget = LogPlotWidget(self.backend.temp_log, i, 25, 85, "Temperature (°C)")
-            self.temp_table.setCellWidget(i, 2, log_plot_widget)
-            self.temp_table.setRowHeight(i, 400)  # Set row height to 400 pixels
+        # put the temperatures into the table; graphs are only attached to the visible rows
+        self.temp_table.verticalHeader().setDefaultSectionSize(PLOT_ROW_HEIGHT)
+        self.temp_plot_pool = PlotRowPool(
+            self.temp_table, 2 + len(STATS_COLUMNS), self.backend.decimation,
+            lambda row: ("temp", row, 25, 85, "Temperature (°C)"))
+        self.lifetime_stats = False
+        self.update_stats_headers()
 
         new_layout.addLayout(data_layout)
 
+        # Live reconfiguration of a running simulation; the maximum RPMs are edited in the fan table
+        if fleet is None and self.main_app.subsystems is not None:
+            reconfigure_layout = QHBoxLayout()
+            reconfigure_label = QLabel('Edit the Max RPM column or the counts and press "Apply Configuration" to '
+                                       'reconfigure without losing the history:')
+            reconfigure_label.setStyleSheet("font-size: 14px;")
+            reconfigure_layout.addWidget(reconfigure_label)
+
+            self.reconfigure_fan_spinbox = QSpinBox()
+            self.reconfigure_fan_spinbox.setRange(1, MAX_CHANNELS)
+            self.reconfigure_fan_spinbox.setValue(self.backend.num_fans)
+            self.reconfigure_fan_spinbox.setPrefix("# of fans: ")
+            self.reconfigure_fan_spinbox.setStyleSheet("font-size: 14px;")
+            reconfigure_layout.addWidget(self.reconfigure_fan_spinbox)
+
+            self.reconfigure_subsystem_spinbox = QSpinBox()
+            self.reconfigure_subsystem_spinbox.setRange(1, MAX_CHANNELS)
+            self.reconfigure_subsystem_spinbox.setValue(self.backend.num_subsystems)
+            self.reconfigure_subsystem_spinbox.setPrefix("# of subsystems: ")
+            self.reconfigure_subsystem_spinbox.setStyleSheet("font-size: 14px;")
+            reconfigure_layout.addWidget(self.reconfigure_subsystem_spinbox)
+
+            self.apply_button = QPushButton('Apply Configuration')
+            self.apply_button.setStyleSheet("background-color: #fd7e14; color: white; font-size: 14px;")
+            self.apply_button.clicked.connect(self.apply_configuration)
+            reconfigure_layout.addWidget(self.apply_button)
+            new_layout.addLayout(reconfigure_layout)
+
         # Buttons
         button_layout = QHBoxLayout()
         self.export_button = QPushButton('Export to CSV')
@@ -315,6 +654,165 @@ class UI(QWidget):
         self.export_button.clicked.connect(self.export_csv)
         button_layout.addWidget(self.export_button)
 
+        if self.backend.alarm_engine is not None:
+            self.export_events_button = QPushButton('Export Events to CSV')
+            self.export_events_button.setStyleSheet("background-color: #dc3545; color: white; font-size: 14px;")
+            self.export_events_button.clicked.connect(self.export_events)
+            button_layout.addWidget(self.export_events_button)
+
+        self.log_button = QPushButton('Start Continuous Log')
+        self.log_button.setStyleSheet("background-color: #6f42c1; color: white; font-size: 14px;")
+        self.log_button.clicked.connect(self.toggle_continuous_log)
+        button_layout.addWidget(self.log_button)
+
+        if fleet is not None:
+            self.fleet_button = QPushButton('Back to Fleet')
+            self.fleet_button.setStyleSheet("background-color: #17a2b8; color: white; font-size: 14px;")
+            self.fleet_button.clicked.connect(self.main_app.show_fleet)
+            button_layout.addWidget(self.fleet_button)
+
+        self.return_button = QPushButton('Return to Configuration')
+        self.return_button.setStyleSheet("background-color: #28a745; color: white; font-size: 14px;")  # Green color
+        self.return_button.clicked.connect(self.return_to_configuration)
+        button_layout.addWidget(self.return_button)
+
+        self.stats_button = QPushButton('Show Lifetime Stats')
+        self.stats_button.setStyleSheet("background-color: #20c997; color: white; font-size: 14px;")
+        self.stats_button.clicked.connect(self.toggle_stats_window)
+        button_layout.addWidget(self.stats_button)
+
+        self.timing_button = QPushButton('Show Timing')
+        self.timing_button.setStyleSheet("background-color: #6c757d; color: white; font-size: 14px;")
+        self.timing_button.clicked.connect(self.toggle_timing_panel)
+        button_layout.addWidget(self.timing_button)
+
+        self.quit_button = QPushButton('Quit')
+        self.quit_button.setStyleSheet("background-color: #dc3545; color: white; font-size: 14px;")
+        self.quit_button.clicked.connect(self.quit_application)
+        button_layout.addWidget(self.quit_button)
+
+        new_layout.addLayout(button_layout)
+
+        # Timing panel, hidden until "Show Timing" is pressed
+        self.timing_panel = QWidget()
+        timing_layout = QHBoxLayout()
+        self.timing_label = QLabel()
+        self.timing_label.setStyleSheet("font-family: monospace; font-size: 12px;")
+        self.timing_label.setTextInteractionFlags(Qt.TextInteractionFlag.TextSelectableByMouse)
+        timing_layout.addWidget(self.timing_label)
+        self.save_timing_button = QPushButton('Save Timing to JSON')
+        self.save_timing_button.setStyleSheet("background-color: #6c757d; color: white; font-size: 14px;")
+        self.save_timing_button.clicked.connect(self.save_timing)
+        timing_layout.addWidget(self.save_timing_button, alignment=Qt.AlignmentFlag.AlignTop)
+        self.timing_panel.setLayout(timing_layout)
+        self.timing_panel.hide()
+        new_layout.addWidget(self.timing_panel)
+
+        self.setLayout(new_layout)
+
+    # This method reconfigures the running simulation with the counts of the reconfiguration spin boxes and the maximum
+    # RPMs of the fan table. Fans added get the maximum RPM of the last fan.
+    def apply_configuration(self):
+        try:
+            num_fans = self.reconfigure_fan_spinbox.value()
+            num_subsystems = self.reconfigure_subsystem_spinbox.value()
+            rows = min(num_fans, self.fan_speed_model.rowCount())
+            max_rpms = [int(max_rpm) for max_rpm in self.fan_speed_model.values[:rows, 0]]
+            if any(not 1 <= max_rpm <= 10000 for max_rpm in max_rpms):
+                raise ValueError("Maximum RPMs must be between 1 and 10000.")
+            max_rpms += [max_rpms[-1]] * (num_fans - rows)
+            self.main_app.reconfigure(num_fans, num_subsystems, max_rpms)
+        except Exception as e:
+            print(f"Error applying configuration: {e}")
+
+    # This method updates the data tracking screen in place after the simulation was reconfigured: only the rows that
+    # were added or removed and the maximum RPMs that changed are touched, and the pooled plots are kept.
+    def update_data_tracking_ui(self):
+        self.num_fans_label.setText(f"# of fans: {self.backend.num_fans}")
+        self.num_subsystems_label.setText(f"# of subsystems: {self.backend.num_subsystems}")
+
+        self.fan_plot_pool.set_row_count(self.backend.num_fans)
+        self.fan_speed_model.set_column(1, self.backend.max_rpms)
+        self.fan_speed_model.commit()
+        self.fan_plot_pool.rebind_changed()
+
+        self.temp_plot_pool.set_row_count(self.backend.num_subsystems)
+
+    # This method sets up the UI for the fleet overview: fleet-wide figures and graphs, and a table of every robot from
+    # which a robot can be opened in the data tracking view.
+    def setup_fleet_ui(self):
+        print("Setting up UI for the fleet overview")
+        fleet = self.main_app.fleet
+        self.setWindowTitle('Fleet Overview')
+
+        # Clear the existing layout
+        old_layout = self.layout()
+        if old_layout is not None:
+            QWidget().setLayout(old_layout)  # Detach the old layout from the widget
+
+        new_layout = QVBoxLayout()
+
+        # Title
+        title = QLabel('Fleet Overview')
+        title.setStyleSheet("font-size: 24px; font-weight: bold;")
+        title.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        new_layout.addWidget(title, alignment=Qt.AlignmentFlag.AlignCenter)
+
+        description = QLabel('Every robot is simulated in lockstep. Double-click a robot, or choose it below and press '
+                             '"Show Robot", to see its subsystems and fans.')
+        description.setStyleSheet("font-size: 14px;")
+        description.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        new_layout.addWidget(description, alignment=Qt.AlignmentFlag.AlignCenter)
+
+        # Info labels
+        info_layout = QVBoxLayout()
+        robots_label = QLabel(f"# of robots: {fleet.num_robots} ({fleet.num_subsystems} subsystems and "
+                              f"{fleet.num_fans} fans each)")
+        robots_label.setStyleSheet("font-size: 14px;")
+        info_layout.addWidget(robots_label, alignment=Qt.AlignmentFlag.AlignLeft)
+
+        self.elapsed_time_label = QLabel("Elapsed time: 00:00:00")
+        self.elapsed_time_label.setStyleSheet("font-size: 14px;")
+        info_layout.addWidget(self.elapsed_time_label, alignment=Qt.AlignmentFlag.AlignLeft)
+
+        self.fleet_summary_label = QLabel()
+        self.fleet_summary_label.setStyleSheet("font-size: 14px;")
+        info_layout.addWidget(self.fleet_summary_label, alignment=Qt.AlignmentFlag.AlignLeft)
+        new_layout.addLayout(info_layout)
+
+        # Fleet-wide graphs
+        graph_layout = QHBoxLayout()
+        self.fleet_plots = [
+            LogPlotWidget(fleet.decimation, "temp", 0, 25, 85, "Hottest Subsystem (°C)"),
+            LogPlotWidget(fleet.decimation, "speed", 0, 0, max(fleet.max_rpms), "Mean Fan Speed (RPM)"),
+        ]
+        for plot in self.fleet_plots:
+            plot.setMinimumHeight(PLOT_ROW_HEIGHT // 2)
+            graph_layout.addWidget(plot)
+        new_layout.addLayout(graph_layout)
+
+        # Robot table
+        self.robot_model = ChannelTableModel("Robot", ["Robot", "Hottest Subsystem", "Mean Fan RPM"], fleet.num_robots,
+                                             [3, 3])
+        self.robot_table = QTableView()
+        self.robot_table.setModel(self.robot_model)
+        self.robot_table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
+        self.robot_table.doubleClicked.connect(lambda index: self.main_app.show_robot(index.row()))
+        new_layout.addWidget(self.robot_table)
+
+        # Buttons
+        button_layout = QHBoxLayout()
+        self.robot_select_spinbox = QSpinBox()
+        self.robot_select_spinbox.setRange(1, fleet.num_robots)
+        self.robot_select_spinbox.setPrefix("Robot ")
+        self.robot_select_spinbox.setStyleSheet("font-size: 14px;")
+        button_layout.addWidget(self.robot_select_spinbox)
+
+        self.show_robot_button = QPushButton('Show Robot')
+        self.show_robot_button.setStyleSheet("background-color: #17a2b8; color: white; font-size: 14px;")
+        self.show_robot_button.clicked.connect(self.show_selected_robot)
+        button_layout.addWidget(self.show_robot_button)
+
         self.return_button = QPushButton('Return to Configuration')
         self.return_button.setStyleSheet("background-color: #28a745; color: white; font-size: 14px;")  # Green color
         self.return_button.clicked.connect(self.return_to_configuration)
@@ -328,44 +826,183 @@ class UI(QWidget):
         new_layout.addLayout(button_layout)
         self.setLayout(new_layout)
 
+    # This method opens the robot chosen in the fleet overview's spin box in the data tracking view.
+    def show_selected_robot(self):
+        self.main_app.show_robot(self.robot_select_spinbox.value() - 1)
+
+    # This method updates the fleet overview with the latest aggregates of the fleet.
+    def update_fleet_ui(self):
+        try:
+            fleet = self.main_app.fleet
+            summary = fleet.summary
+            self.fleet_summary_label.setText(
+                f"Hottest subsystem: {summary['max_temperature']:.3f} °C (robot {summary['hottest_robot'] + 1}), "
+                f"mean temperature: {summary['mean_temperature']:.3f} °C, "
+                f"mean fan speed: {summary['mean_fan_speed']:.3f} RPM")
+            for plot in self.fleet_plots:
+                plot.update_plot()
+
+            max_temperatures = fleet.robot_max_temperatures
+            mean_fan_speeds = fleet.robot_mean_fan_speeds
+            self.robot_model.set_column(1, max_temperatures)
+            self.robot_model.set_column(2, mean_fan_speeds)
+            self.robot_model.commit()
+
+            elapsed_time = self.main_app.get_elapsed_time()
+            self.elapsed_time_label.setText(f"Elapsed time: {elapsed_time}")
+        except Exception as e:
+            print(f"Error updating fleet UI: {e}")
+
     # This method returns the application to the configuration state.
     def return_to_configuration(self):
         self.main_app.change_state("menu")
 
-    # This method exports the temperature and fan speed data to a CSV file.
+    # This method exports the temperature and fan speed data to CSV files. They are written in the background, so the
+    # export is only reported as queued.
     def export_csv(self):
         if self.backend:
-            filename = self.backend.request_csv()
-            print(f"CSV file created: {filename}")
-
-    # This method updates the UI with the latest data from the backend.
-    def update_ui(self):
+            filenames = self.backend.request_csv()
+            print(f"CSV export queued: {', '.join(filenames)}" if filenames else "No data to write.")
+
+    # This method exports the alarm event log to 'alarm_events.csv' in the application directory.
+    def export_events(self):
+        if self.backend and self.backend.alarm_engine is not None:
+            with self.backend.lock:
+                filename = self.backend.alarm_engine.log.write_csv("alarm_events.csv")
+                count = len(self.backend.alarm_engine.log)
+            print(f"Alarm events written: {filename} ({count} events)")
+
+    # This method lists the active alarms above the data tables.
+    def update_alarm_label(self):
+        with self.backend.lock:
+            alarm_engine = self.backend.alarm_engine
+            alarms = [] if alarm_engine is None else alarm_engine.active_alarms()
+        if not alarms:
+            self.alarm_label.setText("Active alarms: none")
+            return
+        names = []
+        for alarm in alarms[:MAX_LISTED_ALARMS]:
+            channel = f"{'Fan' if alarm['group'] == 'speed' else 'Subsystem'} {alarm['channel'] + 1}"
+            names.append(f"{alarm['rule']} on {channel} since {alarm['since']:.1f} s ({alarm['value']:.3f})")
+        more = f", and {len(alarms) - MAX_LISTED_ALARMS} more" if len(alarms) > MAX_LISTED_ALARMS else ""
+        self.alarm_label.setText(f"Active alarms ({len(alarms)}): {'; '.join(names)}{more}")
+
+    # This method starts or stops continuous logging of every control tick to CSV files.
+    def toggle_continuous_log(self):
+        if self.backend is None:
+            return
+        if self.backend.csv_logger is None:
+            self.backend.start_csv_logging()
+            self.log_button.setText('Stop Continuous Log')
+            print("Continuous logging started")
+        else:
+            filenames = self.backend.stop_csv_logging()
+            self.log_button.setText('Start Continuous Log')
+            print(f"Continuous logging stopped, files written: {', '.join(filenames)}")
+
+    # This method sets the headers of the data tables, naming the period the statistics columns cover.
+    def update_stats_headers(self):
+        if self.backend.stats is None:
+            period = ""
+        elif self.lifetime_stats:
+            period = " (lifetime)"
+        else:
+            period = f" ({STATS_WINDOW} s)"
+        stats_headers = [f"{header}{period}" for header, _ in STATS_COLUMNS]
+        self.fan_speed_model.set_headers(["Fan", "Max RPM", "Current RPM"] + stats_headers + ["Graph"])
+        self.temp_model.set_headers(["Subsystem", "Current Temp"] + stats_headers + ["Graph"])
+
+    # This method switches the statistics columns between the rolling window and the whole run.
+    def toggle_stats_window(self):
+        self.lifetime_stats = not self.lifetime_stats
+        self.stats_button.setText('Show Window Stats' if self.lifetime_stats else 'Show Lifetime Stats')
+        self.update_stats_headers()
+
+    # This method stages the statistics columns of the rows of a table that are visible, from the backend's incremental
+    # channel statistics, which are read under the backend's lock since the simulation worker updates them.
+    def update_stats_cells(self, model, group, first_column, rows):
+        if self.backend.stats is None:
+            return
+        with self.backend.lock:
+            stats = self.backend.stats[group]
+            rows = range(rows.start, min(rows.stop, stats.channels))
+            if not rows:
+                return
+            summary = stats.lifetime(list(rows)) if self.lifetime_stats else stats.window(list(rows))
+        for offset, (_, key) in enumerate(STATS_COLUMNS):
+            model.set_column(first_column + offset, summary[key], rows)
+
+    # This method shows or hides the timing statistics panel.
+    def toggle_timing_panel(self):
+        visible = not self.timing_panel.isVisible()
+        self.timing_panel.setVisible(visible)
+        self.timing_button.setText('Hide Timing' if visible else 'Show Timing')
+        if visible:
+            self.update_timing_panel()
+
+    # This method refreshes the timing statistics panel.
+    def update_timing_panel(self):
+        instrumentation = self.main_app.instrumentation
+        if instrumentation is not None:
+            self.timing_label.setText(instrumentation.format_table())
+
+    # This method writes the timing statistics to 'timing_stats.json' in the application directory.
+    def save_timing(self):
+        instrumentation = self.main_app.instrumentation
+        if instrumentation is not None:
+            print(f"Timing statistics written: {instrumentation.dump_json()}")
+
+    # This method tells whether any part of the window can be seen: it is shown, not minimized and, on the platforms
+    # that report it, not fully covered by other windows.
+    def is_on_screen(self):
+        handle = self.windowHandle()
+        return self.isVisible() and not self.isMinimized() and (handle is None or handle.isExposed())
+
+    # This method updates the UI with the latest data from the backend, taken from a snapshot published by the
+    # simulation worker when one is given.
+    def update_ui(self, snapshot=None):
         try:
             if self.backend is None:
                 return
-
-            # Update fan speed table
-            fan_speeds = self.backend.fan_speeds
-            for i in range(self.fan_speed_table.rowCount()):
-                if i < len(fan_speeds):
-                    self.fan_speed_table.setItem(i, 2, QTableWidgetItem(f"{fan_speeds[i]:.3f}"))
-                    log_plot_widget = self.fan_speed_table.cellWidget(i, 3)
-                    if log_plot_widget:
-                        log_plot_widget.update_log_data(self.backend.speed_log)
-                        log_plot_widget.update_plot()
-
-            # Update temperature table
-            temperatures = self.backend.subsystem_temperatures
-            for i in range(self.temp_table.rowCount()):
-                if i < len(temperatures):
-                    self.temp_table.setItem(i, 1, QTableWidgetItem(f"{temperatures[i]:.3f}"))
-                    log_plot_widget = self.temp_table.cellWidget(i, 2)
-                    if log_plot_widget:
-                        log_plot_widget.update_log_data(self.backend.temp_log)
-                        log_plot_widget.update_plot()
+            if snapshot is None:
+                temperatures, fan_speeds = self.backend.get_current_data()
+            else:
+                temperatures, fan_speeds = snapshot.temperatures, snapshot.fan_speeds
+            instrumentation = self.main_app.instrumentation
+
+            # Channels with an active alarm get a highlighted current value
+            alarmed_fans = alarmed_subsystems = None
+            with self.backend.lock:
+                alarm_engine = self.backend.alarm_engine
+                if alarm_engine is not None:
+                    alarmed_fans = alarm_engine.active_channels("speed")
+                    alarmed_subsystems = alarm_engine.active_channels("temp")
+
+            # Stage the current values and the statistics of the visible rows, then tell each table view about every
+            # changed cell at once
+            started = time.perf_counter()
+            self.fan_speed_model.set_column(2, fan_speeds)
+            self.temp_model.set_column(1, temperatures)
+            if alarmed_fans is not None:
+                self.fan_speed_model.set_highlighted(alarmed_fans)
+                self.temp_model.set_highlighted(alarmed_subsystems)
+            self.update_stats_cells(self.fan_speed_model, "speed", 3, self.fan_plot_pool.visible_rows())
+            self.update_stats_cells(self.temp_model, "temp", 2, self.temp_plot_pool.visible_rows())
+            self.fan_speed_model.commit()
+            self.temp_model.commit()
+            table_time = time.perf_counter() - started
+
+            self.fan_plot_pool.update_plots(instrumentation)
+            self.temp_plot_pool.update_plots(instrumentation)
+            if instrumentation is not None:
+                instrumentation.record("table", table_time)
 
             # Update elapsed time
             elapsed_time = self.main_app.get_elapsed_time()
             self.elapsed_time_label.setText(f"Elapsed time: {elapsed_time}")
+            self.update_alarm_label()
+
+            if self.timing_panel.isVisible():
+                self.update_timing_panel()
         except Exception as e:
             print(f"Error updating UI: {e}")